@@ -0,0 +1,89 @@
+"""
+Benchmark length-aware batching and the summary token budget in the embed stage.
+
+Embeds the same sample of perfumes under four configurations —
+arrival-order batches vs length-bucketed windows, uncapped vs token-budgeted
+summaries — and reports records/s plus padding efficiency (real tokens / padded
+tokens the model actually processes) and the truncation stats of the budget.
+
+Usage:
+    python bench_embed_batching.py --input ../../../datasets/perfumes_with_moods.jsonl
+    python bench_embed_batching.py --input ... --sample 2048 --backend onnx-int8 --max-tokens 256
+"""
+import argparse
+import itertools
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pipeline.embed import EMBED_BATCH_SIZE, LENGTH_WINDOW, embed, length_sorted
+from pipeline.extract import extract
+from pipeline.tokens import count_tokens_batch
+from pipeline.transform import SUMMARY_MAX_TOKENS, TruncationStats, transform
+from utils import EMBED_BACKEND, EMBED_BACKENDS, init_bge_embedder
+
+
+def _records(input_path: str, n: int, max_tokens: int, stats: TruncationStats | None = None) -> list[dict]:
+    items = itertools.islice(extract(input_path), n)
+    return list(transform(items, max_tokens=max_tokens, stats=stats))
+
+
+def _padding_efficiency(records: list[dict], window: int) -> float:
+    real = padded = 0
+    size = EMBED_BATCH_SIZE * window
+    for start in range(0, len(records), size):
+        for batch in length_sorted(records[start:start + size]):
+            lengths = count_tokens_batch([r["summary"] for r in batch])
+            real   += sum(lengths)
+            padded += max(lengths) * len(lengths)
+    return real / padded if padded else 1.0
+
+
+def run(embedder, records: list[dict], window: int) -> float:
+    start = time.perf_counter()
+    for _ in embed(iter(records), embedder, total=len(records), window=window):
+        pass
+    return len(records) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed-stage batching benchmark")
+    parser.add_argument("--input", required=True, help="Perfumes JSONL to sample from")
+    parser.add_argument("--sample", type=int, default=1024)
+    parser.add_argument("--backend", choices=EMBED_BACKENDS, default=EMBED_BACKEND)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--window", type=int, default=LENGTH_WINDOW if LENGTH_WINDOW > 1 else 8,
+                        help="Batches per length-sorting window for the bucketed runs")
+    parser.add_argument("--max-tokens", type=int, default=SUMMARY_MAX_TOKENS or 512,
+                        help="Summary budget for the capped runs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    embedder = init_bge_embedder(device=args.device, backend=args.backend)
+    embedder.embed_documents(["warm-up"])
+
+    truncation = TruncationStats()
+    uncapped = _records(args.input, args.sample, 0)
+    capped   = _records(args.input, args.sample, args.max_tokens, truncation)
+    configs = [
+        ("arrival, uncapped", 1, uncapped),
+        ("bucketed, uncapped", args.window, uncapped),
+        ("arrival, capped", 1, capped),
+        ("bucketed, capped", args.window, capped),
+    ]
+    print(f"{len(uncapped)} records, batch {EMBED_BATCH_SIZE}, {args.backend} on {args.device}\n")
+    print(f"{'config':<20}{'records/s':>11}{'speedup':>9}{'padding eff':>13}")
+    baseline = None
+    for name, window, records in configs:
+        efficiency = _padding_efficiency(records, window)
+        rate = run(embedder, records, window)
+        baseline = baseline or rate
+        print(f"{name:<20}{rate:>11.1f}{rate / baseline:>8.2f}x{efficiency:>13.1%}")
+
+    print(f"\nBudget {args.max_tokens} tokens: {truncation}")
+
+if __name__ == "__main__":
+    main()
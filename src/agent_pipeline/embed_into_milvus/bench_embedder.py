@@ -0,0 +1,105 @@
+"""
+Benchmark embedding backends (torch / onnx / onnx-int8) on real perfumes.
+
+For each backend reports model load time, batch throughput (summaries/s via
+embed_documents, the ingestion shape), single-query latency p50/p95 (via
+embed_query, the search-server shape) and cosine agreement with the torch
+fp32 vectors — mean, p5 and min over the sample, plus how often the top-10
+neighbours of each vector within the sample match the reference.
+
+Usage:
+    python onnx_embedder.py --export          # once, for the onnx backends
+    python bench_embedder.py --input ../../../datasets/perfumes_with_moods.jsonl
+    python bench_embedder.py --input ... --sample 512 --backends torch onnx-int8 --threads 8
+"""
+import argparse
+import itertools
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+
+from pipeline.extract import extract
+from pipeline.transform import transform
+from utils import EMBED_BACKENDS, init_bge_embedder
+
+
+def _summaries(input_path: str, n: int) -> list[str]:
+    return [r["summary"] for r in itertools.islice(transform(extract(input_path)), n)]
+
+
+def _top_k(vectors: np.ndarray, k: int) -> np.ndarray:
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def run(backend: str, summaries: list[str], batch_size: int, queries: int, threads: int | None) -> dict:
+    start = time.perf_counter()
+    embedder = init_bge_embedder(backend=backend, threads=threads)
+    load_s = time.perf_counter() - start
+
+    embedder.embed_documents(summaries[:batch_size])       # warm-up
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(summaries), batch_size):
+        vectors.extend(embedder.embed_documents(summaries[i:i + batch_size]))
+    throughput = len(summaries) / (time.perf_counter() - start)
+
+    latencies = []
+    for text in summaries[:queries]:
+        start = time.perf_counter()
+        embedder.embed_query(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    return {
+        "load_s": load_s,
+        "throughput": throughput,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "vectors": np.asarray(vectors, dtype=np.float32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BGE-M3 embedding backend benchmark")
+    parser.add_argument("--input", required=True, help="Perfumes JSONL to sample summaries from")
+    parser.add_argument("--sample", type=int, default=256, help="Summaries to embed")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50, help="Single-query latency samples")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for the onnx backends")
+    parser.add_argument("--backends", nargs="+", default=list(EMBED_BACKENDS),
+                        help=f"Backends to compare (default: {' '.join(EMBED_BACKENDS)})")
+    args = parser.parse_args()
+    unknown = set(args.backends) - set(EMBED_BACKENDS)
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(sorted(unknown))}")
+
+    summaries = _summaries(args.input, args.sample)
+    print(f"{len(summaries)} summaries, batch {args.batch_size}, {args.queries} latency queries\n")
+
+    results = {}
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:   # torch is the reference
+        results[backend] = run(backend, summaries, args.batch_size, args.queries, args.threads)
+
+    reference = results["torch"]["vectors"]
+    ref_top = _top_k(reference, 10)
+    print(f"{'backend':<11}{'load s':>8}{'rec/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'cos mean':>10}{'cos p5':>9}{'cos min':>9}{'top10':>7}")
+    for backend, r in results.items():
+        if backend not in args.backends:
+            continue
+        cos = np.sum(r["vectors"] * reference, axis=1)       # both L2-normalised
+        top = _top_k(r["vectors"], 10)
+        overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(top, ref_top)])
+        print(f"{backend:<11}{r['load_s']:>8.1f}{r['throughput']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{cos.mean():>10.5f}{np.percentile(cos, 5):>9.5f}{cos.min():>9.5f}{overlap:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark ingestion throughput under each tracing policy.
+
+Runs build_record over synthetic perfumes with every TRACING_MODE and reports
+records/s, so the per-record cost of @traceable hot paths is visible.
+By default a constant-vector embedder isolates tracing overhead from model
+time; pass --real-embedder to include BGE-M3.
+
+Usage:
+    python bench_tracing.py --records 2000
+    python bench_tracing.py --records 200 --real-embedder --sample-rate 0.05
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import tracing_policy
+from utils import build_record, init_bge_embedder
+
+
+class ConstantEmbedder:
+    """Returns a fixed 1024-dim vector — no model cost."""
+
+    def embed_query(self, text: str) -> list[float]:
+        return [0.0] * 1024
+
+
+def _synthetic_items(n: int) -> list[dict]:
+    return [
+        {
+            "name": f"Perfume {i}",
+            "brand": "Bench",
+            "url": f"https://example.com/perfume-{i}.html",
+            "gender": "unisex",
+            "description": "A synthetic perfume used for benchmarking.",
+            "notes": {"top": ["bergamot"], "middle": ["rose"], "base": ["musk"]},
+            "main_accords": ["citrus", "floral", "musky"],
+            "moods": ["serene", "warm", "romantic", "cozy", "bold"],
+        }
+        for i in range(n)
+    ]
+
+
+def run(mode: str, sample_rate: float, embedder, items: list[dict]) -> float:
+    tracing_policy.set_policy(mode, sample_rate)
+    tracing_policy.reset_stats()
+    start = time.perf_counter()
+    for item in items:
+        build_record(embedder, item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing policy ingestion benchmark")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    parser.add_argument("--real-embedder", action="store_true", help="Use BGE-M3 instead of a constant vector")
+    args = parser.parse_args()
+
+    embedder = init_bge_embedder() if args.real_embedder else ConstantEmbedder()
+    items = _synthetic_items(args.records)
+
+    print(f"{'mode':<10}{'records/s':>12}  traced/calls  dropped")
+    for mode in tracing_policy.MODES:
+        rate = run(mode, args.sample_rate, embedder, items)
+        st = tracing_policy.stats()
+        print(f"{mode:<10}{rate:>12.1f}  {st['traced']:>6}/{st['calls']:<6} {st['dropped']:>7}")
+
+
+if __name__ == "__main__":
+    main()
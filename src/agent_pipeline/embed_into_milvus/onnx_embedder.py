@@ -0,0 +1,130 @@
+"""
+ONNX Runtime backends for BGE-M3 (`onnx`, `onnx-int8`).
+
+The torch backend pulls in torch + sentence-transformers and runs the model in
+fp32; on CPU-only nodes ONNX Runtime is faster, and the dynamically quantized
+int8 graph (weights int8, activations quantized per batch) is ~4x smaller and
+faster again. Inference needs only onnxruntime, tokenizers and numpy.
+
+Export once (needs `optimum[onnxruntime]`, which brings torch for the export):
+
+    python onnx_embedder.py --export                      # fp32 + int8 (avx2 kernels)
+    python onnx_embedder.py --export --quantize avx512_vnni
+
+then select the backend with EMBED_BACKEND=onnx|onnx-int8 or
+run_pipeline.py --backend. Vectors match the torch backend: CLS pooling,
+L2-normalised (see bench_embedder.py for the measured agreement).
+
+    BGE_ONNX_DIR, BGE_MAX_LENGTH
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from utils import BGE_MODEL_NAME, embedding_model_id
+
+logger = logging.getLogger(__name__)
+
+ONNX_DIR       = Path(os.getenv(
+    "BGE_ONNX_DIR", Path(__file__).resolve().parents[3] / "models" / "bge-m3-onnx",
+))
+MAX_LENGTH     = int(os.getenv("BGE_MAX_LENGTH", "8192"))   # BGE-M3's sentence-transformers limit
+
+VARIANT_DIRS = {"onnx": "fp32", "onnx-int8": "int8"}
+QUANTIZE_TARGETS = ("avx2", "avx512", "avx512_vnni", "arm64")
+
+
+class OnnxBgeEmbedder:
+    """Drop-in for HuggingFaceEmbeddings: embed_documents / embed_query."""
+
+    def __init__(self, backend: str = "onnx-int8", device: str = "cpu",
+                 threads: int | None = None, model_dir: str | Path = ONNX_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = Path(model_dir) / VARIANT_DIRS[backend]
+        model_file = path / ("model_quantized.onnx" if backend == "onnx-int8" else "model.onnx")
+        if not model_file.exists():
+            raise FileNotFoundError(
+                f"{model_file} not found — run `python onnx_embedder.py --export` once"
+            )
+
+        self.model_name = embedding_model_id(backend)
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_LENGTH)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("<pad>"), pad_token="<pad>")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+        if device.startswith("cuda"):
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(str(model_file), options, providers=providers)
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        import numpy as np
+
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(texts)
+        feed = {
+            "input_ids":      np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+        hidden = self.session.run(["last_hidden_state"], feed)[0]   # (batch, seq, 1024)
+        cls = hidden[:, 0]
+        cls = cls / np.linalg.norm(cls, axis=1, keepdims=True)
+        return cls.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def export(out_dir: Path = ONNX_DIR, quantize: str = "avx2") -> None:
+    """Export BGE-M3 to ONNX (fp32) and write a dynamically quantized int8 copy."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    fp32_dir, int8_dir = out_dir / VARIANT_DIRS["onnx"], out_dir / VARIANT_DIRS["onnx-int8"]
+
+    logger.info("Exporting %s → %s", BGE_MODEL_NAME, fp32_dir)
+    model = ORTModelForFeatureExtraction.from_pretrained(BGE_MODEL_NAME, export=True)
+    model.save_pretrained(fp32_dir)
+    tokenizer = AutoTokenizer.from_pretrained(BGE_MODEL_NAME)
+    tokenizer.save_pretrained(fp32_dir)
+
+    logger.info("Quantizing (dynamic int8, %s) → %s", quantize, int8_dir)
+    qconfig = getattr(AutoQuantizationConfig, quantize)(is_static=False, per_channel=False)
+    ORTQuantizer.from_pretrained(fp32_dir).quantize(save_dir=int8_dir, quantization_config=qconfig)
+    tokenizer.save_pretrained(int8_dir)
+    logger.info("Export done")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BGE-M3 ONNX export")
+    parser.add_argument("--export", action="store_true", help="Export fp32 and int8 ONNX models")
+    parser.add_argument("--out", default=str(ONNX_DIR), help="Output directory (default: $BGE_ONNX_DIR)")
+    parser.add_argument("--quantize", choices=QUANTIZE_TARGETS, default="avx2",
+                        help="Kernel target for int8 quantization (default: avx2)")
+    args = parser.parse_args()
+    if not args.export:
+        parser.error("nothing to do — pass --export")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    export(Path(args.out), args.quantize)
+
+
+if __name__ == "__main__":
+    main()
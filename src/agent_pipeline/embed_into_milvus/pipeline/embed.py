@@ -2,41 +2,86 @@
 Stage 3 — Embed
 Generate BGE-M3 embeddings for the summary field in batches.
 Adds `moods_embedding` (1024-dim) to each record.
+
+Length-aware batching: records are taken LENGTH_WINDOW batches at a time,
+sorted by token length within that window and cut into batches, so each
+batch pads to a similar length. Records are yielded in input order.
+LENGTH_WINDOW=1 embeds in arrival order.
+
+With an EmbeddingCache every computed vector is stored; when the cache is
+read (--reuse-embeddings) only summaries not already in it are sent to the
+model and hits come from the memory-mapped store.
 """
 import logging
-from typing import Iterator
+import os
+from typing import TYPE_CHECKING, Iterator
 
 from tqdm import tqdm
 
+from pipeline.tokens import count_tokens_batch
+
+if TYPE_CHECKING:
+    from pipeline.embed_cache import EmbeddingCache   # numpy — imported only when the cache is on
+
 logger = logging.getLogger(__name__)
 
 EMBED_BATCH_SIZE = 64  # texts sent to the model at once
+LENGTH_WINDOW    = int(os.getenv("EMBED_LENGTH_WINDOW", "8"))   # batches sorted together by length
 
 
-def embed(records: Iterator[dict], embedder, total: int = 0) -> Iterator[dict]:
+def length_sorted(records: list[dict], batch_size: int = EMBED_BATCH_SIZE) -> list[list[dict]]:
+    """`records` cut into batches of similar summary token length."""
+    if len(records) > batch_size:
+        lengths = count_tokens_batch([r["summary"] for r in records])
+        records = [records[i] for i in sorted(range(len(records)), key=lengths.__getitem__)]
+    return [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+
+
+def embed(records: Iterator[dict], embedder, total: int = 0,
+          cache: "EmbeddingCache | None" = None, window: int = LENGTH_WINDOW) -> Iterator[dict]:
     """
     Yield records with `moods_embedding` populated.
-    Processes summaries in batches for GPU/CPU efficiency.
+    Processes summaries in length-bucketed batches for GPU/CPU efficiency.
     """
-    batch_records = []
+    window_records = []
+    window_size = EMBED_BATCH_SIZE * max(1, window)
     bar = tqdm(total=total or None, desc="Embedding", unit="perfume")
 
     for record in records:
-        batch_records.append(record)
-        if len(batch_records) == EMBED_BATCH_SIZE:
-            yield from _embed_batch(batch_records, embedder, bar)
-            batch_records = []
+        window_records.append(record)
+        if len(window_records) == window_size:
+            yield from _embed_window(window_records, embedder, bar, cache)
+            window_records = []
 
-    if batch_records:
-        yield from _embed_batch(batch_records, embedder, bar)
+    if window_records:
+        yield from _embed_window(window_records, embedder, bar, cache)
 
     bar.close()
-    logger.info("Embedding complete.")
+    if cache is not None:
+        logger.info("Embedding complete — cache %s", cache.stats())
+    else:
+        logger.info("Embedding complete.")
+
+
+def _embed_window(records: list, embedder, bar, cache: "EmbeddingCache | None") -> list:
+    for batch in length_sorted(records):
+        _embed_batch(batch, embedder, bar, cache)     # fills the shared record dicts in place
+    return records
 
 
-def _embed_batch(batch: list, embedder, bar) -> list:
+def _embed_batch(batch: list, embedder, bar, cache: "EmbeddingCache | None" = None) -> list:
     summaries = [r["summary"] for r in batch]
-    vectors = embedder.embed_documents(summaries)  # batched call
+    if cache is None:
+        vectors = embedder.embed_documents(summaries)  # batched call
+    else:
+        vectors = cache.get_many(summaries)
+        misses = [i for i, v in enumerate(vectors) if v is None]
+        if misses:
+            computed = embedder.embed_documents([summaries[i] for i in misses])
+            cache.put_many([summaries[i] for i in misses], computed)
+            for i, vector in zip(misses, computed):
+                vectors[i] = vector
+        bar.set_postfix(cache_hit=f"{cache.hit_rate:.0%}", refresh=False)
     for record, vector in zip(batch, vectors):
         record["moods_embedding"] = vector
     bar.update(len(batch))
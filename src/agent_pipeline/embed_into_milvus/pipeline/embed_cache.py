@@ -0,0 +1,149 @@
+"""
+Content-addressed embedding store for the embed stage.
+
+Embeddings are keyed by sha256(model name + summary text), so a schema change,
+collection rebuild or index experiment re-embeds only summaries it has never
+seen. The store is a directory of three files:
+
+    meta.json     {"dim": 1024, "dtype": "float32"}
+    vectors.bin   row-major dim × dtype rows, append-only, memory-mapped for reads
+    index.bin     one 16-byte key per row, same order — the commit log
+
+A row is written to vectors.bin before its key reaches index.bin, so a crash
+mid-append leaves at most an uncommitted tail, trimmed on the next open.
+float16 halves the file at ~1e-3 relative error on normalised BGE vectors.
+
+Every ingestion run writes the vectors it computes; whether it also serves
+hits from the store is the caller's choice (`read`, run_pipeline.py
+--reuse-embeddings), so a later rebuild finds what earlier runs embedded.
+
+    EMBED_CACHE_DIR, EMBED_CACHE_DTYPE (float32 | float16)
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_DIR   = Path(os.getenv(
+    "EMBED_CACHE_DIR",
+    Path(__file__).resolve().parents[4] / "datasets" / ".embedding_cache",
+))
+EMBED_CACHE_DTYPE = os.getenv("EMBED_CACHE_DTYPE", "float32")
+
+KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """Append-only, memory-mapped map of (model, text) → vector. Single writer."""
+
+    def __init__(self, model: str, path: str | Path = EMBED_CACHE_DIR,
+                 dim: int = 1024, dtype: str = EMBED_CACHE_DTYPE, read: bool = True):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"EMBED_CACHE_DTYPE must be float32 or float16, got {dtype!r}")
+        self.model  = model
+        self.path   = Path(path)
+        self.read   = read                    # False: write-only, every lookup misses
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if (meta["dim"], meta["dtype"]) != (dim, dtype):
+                raise ValueError(
+                    f"Embedding cache {self.path} holds {meta['dim']}-dim {meta['dtype']} vectors, "
+                    f"asked for {dim}-dim {dtype} — use another EMBED_CACHE_DIR"
+                )
+        else:
+            meta_path.write_text(json.dumps({"dim": dim, "dtype": dtype}), encoding="utf-8")
+
+        self.dim       = dim
+        self.dtype     = np.dtype(dtype)
+        self._row_size = dim * self.dtype.itemsize
+        self._vectors_path = self.path / "vectors.bin"
+        self._index_path   = self.path / "index.bin"
+        self._rows: dict[bytes, int] = {}
+        self._recover()
+
+        self._vectors_file = open(self._vectors_path, "ab")
+        self._index_file   = open(self._index_path, "ab")
+        self._map      = None
+        self._map_rows = 0
+        self.hits = self.misses = 0
+        logger.info("Embedding cache %s: %d vectors (%s%s)", self.path, len(self._rows), dtype,
+                    "" if read else ", write-only")
+
+    def _recover(self) -> None:
+        """Load the index and trim any tail left by an interrupted append."""
+        keys = self._index_path.read_bytes() if self._index_path.exists() else b""
+        vector_bytes = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        rows = min(len(keys) // KEY_BYTES, vector_bytes // self._row_size)
+        for row in range(rows):
+            self._rows[keys[row * KEY_BYTES:(row + 1) * KEY_BYTES]] = row
+        for path, size in ((self._index_path, rows * KEY_BYTES), (self._vectors_path, rows * self._row_size)):
+            if path.exists() and path.stat().st_size != size:
+                logger.warning("Embedding cache: trimming uncommitted tail of %s", path.name)
+                os.truncate(path, size)
+        self._count = rows
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+    def _mapped(self) -> np.ndarray:
+        if self._map_rows != self._count:      # grown since last mapped
+            self._map = np.memmap(self._vectors_path, dtype=self.dtype, mode="r",
+                                  shape=(self._count, self.dim))
+            self._map_rows = self._count
+        return self._map
+
+    def get_many(self, texts: list[str]) -> list:
+        """Per text, a float32 vector (a read-only view into the mapped file when
+        stored as float32), or None on a miss."""
+        if not self.read:
+            self.misses += len(texts)
+            return [None] * len(texts)
+        rows = [self._rows.get(self.key(t)) for t in texts]
+        found = sum(r is not None for r in rows)
+        self.hits   += found
+        self.misses += len(rows) - found
+        if not found:
+            return [None] * len(texts)
+        vectors = self._mapped()
+        if self.dtype == np.float32:
+            return [None if r is None else vectors[r] for r in rows]
+        return [None if r is None else vectors[r].astype(np.float32) for r in rows]
+
+    def put_many(self, texts: list[str], vectors) -> None:
+        new = {}
+        for text, vector in zip(texts, vectors):
+            k = self.key(text)
+            if k not in self._rows and k not in new:
+                new[k] = vector
+        if not new:
+            return
+        block = np.asarray(list(new.values()), dtype=self.dtype).reshape(len(new), self.dim)
+        self._vectors_file.write(block.tobytes())
+        self._vectors_file.flush()
+        self._index_file.write(b"".join(new))      # commit point
+        self._index_file.flush()
+        for k in new:
+            self._rows[k] = self._count
+            self._count += 1
+
+    @property
+    def hit_rate(self) -> float:
+        looked_up = self.hits + self.misses
+        return self.hits / looked_up if looked_up else 0.0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 4), "stored": self._count}
+
+    def close(self) -> None:
+        self._vectors_file.close()
+        self._index_file.close()
+        self._map = None
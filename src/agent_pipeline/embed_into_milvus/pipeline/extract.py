@@ -1,50 +1,79 @@
 """
 Stage 1 — Extract
-Read records from a JSONL file, validate required fields, skip bad rows.
+Read records from a JSONL file or a Parquet/Arrow catalog, validate required
+fields, skip bad rows.
+
+Parsing goes through src/utils/streaming_reader.py: orjson when installed,
+one pass over the file, and optionally a process pool for large inputs.
+Catalogs (src/utils/catalog.py) are memory-mapped and read a row group at a time.
+
+Progress on a JSONL input is bytes read out of os.path.getsize() (read_bar()),
+so no counting pass is needed and the bar is exact however uneven the records.
 """
-import json
 import logging
+import os
+import sys
 from pathlib import Path
-from typing import Iterator
+from typing import Callable, Iterator
+
+from tqdm import tqdm
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "utils"))  # src/utils/
+
+from streaming_reader import is_catalog, iter_jsonl, iter_records
 
 logger = logging.getLogger(__name__)
 
 REQUIRED_FIELDS = {"name", "url"}
 
 
-def extract(input_path: str) -> Iterator[dict]:
+def read_bar(input_path: str) -> tqdm | None:
+    """Byte progress bar for extract(progress=bar.update); None for catalogs,
+    whose row count is known up front (catalog.count_rows)."""
+    if is_catalog(input_path):
+        return None
+    return tqdm(total=os.path.getsize(input_path), desc="Reading", unit="B", unit_scale=True)
+
+
+def extract(
+    input_path: str,
+    workers: int = 1,
+    progress: Callable[[int], None] | None = None,
+) -> Iterator[dict]:
     """
-    Yield valid perfume dicts from a JSONL file.
+    Yield valid perfume dicts from a JSONL file or a .parquet / .arrow catalog.
     Skips blank lines and records missing required fields.
     Logs a warning for every skipped record.
+    `progress` receives bytes read; `workers` > 1 parses large files in parallel.
     """
     path = Path(input_path)
     if not path.exists():
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
     total = skipped = 0
-    with open(path, encoding="utf-8") as f:
-        for lineno, line in enumerate(f, start=1):
-            line = line.strip()
-            if not line:
-                continue
-            total += 1
-            try:
-                record = json.loads(line)
-            except json.JSONDecodeError as e:
-                logger.warning("Line %d: JSON parse error — %s", lineno, e)
-                skipped += 1
-                continue
-
-            missing = REQUIRED_FIELDS - record.keys()
-            if missing:
-                logger.warning(
-                    "Line %d: missing fields %s — skipping '%s'",
-                    lineno, missing, record.get("name", "<unknown>")
-                )
-                skipped += 1
-                continue
-
-            yield record
+
+    def parse_error(lineno: int, e: Exception) -> None:
+        nonlocal total, skipped
+        logger.warning("Line %d: JSON parse error — %s", lineno, e)
+        total += 1
+        skipped += 1
+
+    if is_catalog(path):
+        rows = enumerate(iter_records(path), start=1)
+    else:
+        rows = iter_jsonl(path, on_error=parse_error, progress=progress, workers=workers)
+
+    for lineno, record in rows:
+        total += 1
+        missing = REQUIRED_FIELDS - record.keys()
+        if missing:
+            logger.warning(
+                "Line %d: missing fields %s — skipping '%s'",
+                lineno, missing, record.get("name", "<unknown>")
+            )
+            skipped += 1
+            continue
+
+        yield record
 
     logger.info("Extract done: %d total, %d skipped, %d valid", total, skipped, total - skipped)
@@ -1,21 +1,48 @@
 """
 Stage 5 — Load
-Batch-insert embedded records into Milvus.
-Skips URLs already present in the collection (resumable).
-Failed records are written to failed.jsonl for inspection.
+Batch-write embedded records into Milvus.
+
+With a manifest (the default from run_pipeline.py) records arrive already
+filtered to new/changed ones; they are upserted and their (id, hash) appended
+to the manifest once the write succeeds. Without one, URLs already present in
+the collection are skipped (resumable) and the rest inserted.
+
+Batches are cut by estimated payload bytes (LOAD_BATCH_BYTES, at most
+LOAD_BATCH_MAX_ROWS rows) and up to LOAD_CONCURRENCY of them are written at
+once. A write failing with a transient error (unavailable, timeout, rate
+limit) is retried with exponential backoff; any other failure is bisected
+until the bad rows are isolated, so one oversized field costs one row, not
+the whole batch. Rows that still fail go to failed.jsonl with the error.
+
+Bumps the collection version stamp whenever rows were written.
 """
 import json
 import logging
-from pathlib import Path
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Iterator
 
 from pymilvus import MilvusClient
 from tqdm import tqdm
 
+from pipeline.manifest import Manifest
+from pipeline.version import bump_collection_version
+
 logger = logging.getLogger(__name__)
 
-INSERT_BATCH_SIZE = 100
-COLLECTION        = "perfume_collection"
+COLLECTION = "perfume_collection"
+
+INSERT_BATCH_BYTES    = int(os.getenv("LOAD_BATCH_BYTES", str(4 * 1024 * 1024)))
+INSERT_BATCH_MAX_ROWS = int(os.getenv("LOAD_BATCH_MAX_ROWS", "1000"))
+LOAD_CONCURRENCY      = int(os.getenv("LOAD_CONCURRENCY", "4"))
+MAX_RETRIES           = int(os.getenv("LOAD_MAX_RETRIES", "5"))
+RETRY_BASE_S          = 0.5
+
+TRANSIENT_MARKERS = ("unavailable", "deadline", "timeout", "timed out", "rate limit",
+                     "too many requests", "connection", "resource exhausted")
 
 
 def _fetch_existing_urls(client: MilvusClient) -> set:
@@ -42,49 +69,159 @@ def _fetch_existing_urls(client: MilvusClient) -> set:
     return existing
 
 
-def load(
-    records: Iterator[dict],
-    client: MilvusClient,
-    failed_path: str = "failed.jsonl",
-    total: int = 0,
-) -> None:
-    existing_urls = _fetch_existing_urls(client)
+def _row_bytes(record: dict) -> int:
+    """Approximate wire size: 4 bytes per vector component plus the strings."""
+    size = 0
+    for value in record.values():
+        if isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif hasattr(value, "__len__"):
+            size += 4 * len(value)
+        else:
+            size += 8
+    return size
+
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    message = str(e).lower()
+    return any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+class _Writer:
+    """Writes one batch: retries transient errors, bisects the rest."""
+
+    def __init__(self, client: MilvusClient, manifest: Manifest | None, failed_file, bar):
+        self.client      = client
+        self.manifest    = manifest
+        self.failed_file = failed_file
+        self.bar         = bar
+        self.lock        = threading.Lock()
+        self.written = self.failed = self.retries = self.bisections = 0
+        self.bytes_written = 0
 
-    batch        = []
-    inserted     = skipped = failed = 0
-    failed_file  = open(failed_path, "w", encoding="utf-8")
-    bar          = tqdm(total=total or None, desc="Loading", unit="perfume")
+    def _send(self, batch: list[dict]) -> None:
+        if self.manifest is None:
+            self.client.insert(collection_name=COLLECTION, data=batch)
+            return
+        self.client.upsert(collection_name=COLLECTION, data=batch)
+        with self.lock:
+            stale = self.manifest.stale_ids(batch)
+        if stale:
+            self.client.delete(collection_name=COLLECTION, ids=stale)
 
-    def flush(b: list):
-        nonlocal inserted, failed
+    def _send_with_retry(self, batch: list[dict]) -> None:
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                return self._send(batch)
+            except Exception as e:
+                if attempt == MAX_RETRIES or not _is_transient(e):
+                    raise
+                delay = RETRY_BASE_S * 2 ** (attempt - 1) * (0.5 + random.random())
+                logger.warning("Transient write error (attempt %d/%d), retrying in %.1fs: %s",
+                               attempt, MAX_RETRIES, delay, e)
+                with self.lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def write(self, batch: list[dict], nbytes: int) -> None:
         try:
-            client.insert(collection_name=COLLECTION, data=b)
-            inserted += len(b)
+            self._send_with_retry(batch)
         except Exception as e:
-            logger.error("Batch insert failed: %s — writing %d records to failed.jsonl", e, len(b))
-            for r in b:
+            if len(batch) > 1 and not _is_transient(e):
+                with self.lock:
+                    self.bisections += 1
+                mid = len(batch) // 2
+                left, right = batch[:mid], batch[mid:]
+                left_bytes = sum(_row_bytes(r) for r in left)
+                self.write(left, left_bytes)
+                self.write(right, nbytes - left_bytes)
+                return
+            self._fail(batch, e)
+            return
+
+        with self.lock:
+            if self.manifest is not None:
+                self.manifest.add(batch)
+            self.written       += len(batch)
+            self.bytes_written += nbytes
+            self.bar.update(len(batch))
+
+    def _fail(self, batch: list[dict], e: Exception) -> None:
+        if len(batch) == 1:
+            logger.error("Row %s rejected: %s", batch[0].get("url", "?"), e)
+        else:
+            logger.error("Batch of %d rows failed: %s — writing them to failed.jsonl", len(batch), e)
+        with self.lock:
+            for r in batch:
                 r.pop("moods_embedding", None)  # don't serialise the big vector
-                failed_file.write(json.dumps(r) + "\n")
-            failed += len(b)
+                self.failed_file.write(json.dumps({**r, "load_error": str(e)}) + "\n")
+            self.failed += len(batch)
+            self.bar.update(len(batch))
+
 
+def _batches(records: Iterator[dict], existing_urls: set, skipped: list, bar) -> Iterator[tuple[list, int]]:
+    """Cut the stream into (batch, payload bytes) of at most INSERT_BATCH_BYTES."""
+    batch, nbytes = [], 0
     for record in records:
-        bar.update(1)
         if record.get("url") in existing_urls:
-            skipped += 1
+            skipped[0] += 1
+            bar.update(1)
             continue
-
+        size = _row_bytes(record)
+        if batch and (nbytes + size > INSERT_BATCH_BYTES or len(batch) == INSERT_BATCH_MAX_ROWS):
+            yield batch, nbytes
+            batch, nbytes = [], 0
         batch.append(record)
-        if len(batch) == INSERT_BATCH_SIZE:
-            flush(batch)
-            batch = []
-
+        nbytes += size
     if batch:
-        flush(batch)
+        yield batch, nbytes
+
+
+def load(
+    records: Iterator[dict],
+    client: MilvusClient,
+    failed_path: str = "failed.jsonl",
+    total: int = 0,
+    manifest: Manifest | None = None,
+    concurrency: int = LOAD_CONCURRENCY,
+) -> dict:
+    """Write `records`; returns {"written", "skipped", "failed"} row counts."""
+    existing_urls = _fetch_existing_urls(client) if manifest is None else set()
+
+    skipped     = [0]
+    failed_file = open(failed_path, "w", encoding="utf-8")
+    bar         = tqdm(total=total or None, desc="Loading", unit="perfume")
+    writer      = _Writer(client, manifest, failed_file, bar)
+    start       = time.perf_counter()
 
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        pending = set()
+        for batch, nbytes in _batches(records, existing_urls, skipped, bar):
+            if len(pending) >= 2 * concurrency:      # bound the records held in memory
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    f.result()
+            pending.add(pool.submit(writer.write, batch, nbytes))
+        for f in pending:
+            f.result()
+
+    elapsed = time.perf_counter() - start
     bar.close()
     failed_file.close()
+    if manifest is not None:
+        manifest.compact()
+
+    if writer.written:
+        # invalidates recommendation result caches keyed on the old collection
+        logger.info("Collection version bumped to %s", bump_collection_version())
 
     logger.info(
-        "Load done — inserted: %d  skipped: %d  failed: %d",
-        inserted, skipped, failed,
+        "Load done — %s: %d  skipped: %d  failed: %d  (%.1f rows/s, %.2f MB/s, %d retries, %d bisections)",
+        "inserted" if manifest is None else "upserted", writer.written, skipped[0], writer.failed,
+        writer.written / elapsed if elapsed else 0.0,
+        writer.bytes_written / elapsed / 1e6 if elapsed else 0.0,
+        writer.retries, writer.bisections,
     )
+    return {"written": writer.written, "skipped": skipped[0], "failed": writer.failed}
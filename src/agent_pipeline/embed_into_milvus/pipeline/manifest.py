@@ -0,0 +1,235 @@
+"""
+Ingestion manifest — change detection without scanning Milvus.
+
+Record ids are deterministic (uuid5 of the URL) and every record carries a
+content hash of the fields stored in Milvus. The manifest is a local,
+append-only JSONL file of {"id", "hash"} pairs for rows known to be in the
+collection; later lines win. A rerun consults it before embedding:
+
+    select_changed()   keeps only records that are new or whose hash changed
+    load(manifest=…)   upserts them and appends their (id, hash) on success
+
+Rows inserted before ids were deterministic (uuid4) are migrated once: when
+the manifest file doesn't exist yet, `bootstrap()` scans the collection for
+(id, url) and records the legacy rows in the manifest; those URLs are
+re-embedded under their new id and the old rows deleted after the upsert
+lands. A run interrupted mid-migration resumes from the manifest.
+
+The manifest is stamped with the Milvus collection id it describes
+({"collection": …}); if the collection has since been dropped and recreated,
+bootstrap() discards the manifest and rescans, so a rebuild reloads everything.
+
+It also records how summaries are built ({"summary": …}, see
+transform.summary_spec). The summary is hashed, so a different token cap
+would re-embed every long record; check_summary() refuses that unless the run
+asks for it.
+
+A sharded worker (run_pipeline.py --shard i/N) keeps its own manifest holding
+only the URLs of its shard; see pipeline/shards.py for merging them.
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from pymilvus import MilvusClient
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = Path(os.getenv(
+    "INGEST_MANIFEST_PATH",
+    Path(__file__).resolve().parents[4] / "datasets" / ".perfume_collection.manifest.jsonl",
+))
+
+# fields whose change should trigger a re-embed / upsert
+HASHED_FIELDS = (
+    "name", "description", "url", "brand", "gender",
+    "top_notes", "middle_notes", "base_notes", "main_accords", "moods", "summary",
+)
+
+COLLECTION = "perfume_collection"
+
+SUMMARY_UNCAPPED = "uncapped"     # also what manifests written before the stamp describe
+
+
+def record_id(url: str, fallback: str = "") -> str:
+    """Deterministic 36-char id — same URL, same Milvus primary key."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, url or fallback))
+
+
+def shard_of(url: str, shards: int) -> int:
+    """Stable shard index of a URL — the same on every machine and Python process."""
+    return int.from_bytes(hashlib.sha256(url.encode("utf-8")).digest()[:8], "big") % shards
+
+
+def content_hash(record: dict) -> str:
+    payload = json.dumps([record.get(f, "") for f in HASHED_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _is_empty(client: "MilvusClient") -> bool:
+    return int(client.get_collection_stats(COLLECTION).get("row_count", 0)) == 0
+
+
+class Manifest:
+    """In-memory view of the manifest file plus an append handle."""
+
+    def __init__(self, path: str | Path = MANIFEST_PATH, shard: tuple[int, int] | None = None):
+        self.path    = Path(path)
+        self.shard   = shard                  # (index, count): bootstrap keeps only this shard's rows
+        self.exists  = self.path.exists()
+        self.hashes: dict[str, str] = {}
+        self.legacy: dict[str, str] = {}      # url -> pre-uuid5 id still in Milvus
+        self.collection: str | None = None    # Milvus collection id the rows live in
+        self.summary: str | None = None       # summary_spec the hashes were computed with
+        if self.exists:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+        self._file = None
+        logger.info("Manifest %s: %d known rows, %d legacy", self.path, len(self.hashes), len(self.legacy))
+
+    def _apply(self, entry: dict) -> None:
+        if "collection" in entry:
+            self.collection = entry["collection"]
+        elif "summary" in entry:
+            self.summary = entry["summary"]
+        elif "legacy" not in entry:
+            self.hashes[entry["id"]] = entry["hash"]
+        elif entry["legacy"]:
+            self.legacy[entry["url"]] = entry["id"]
+        else:                                  # legacy row deleted
+            self.legacy.pop(entry["url"], None)
+
+    def _append(self, entries: list[dict]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        for entry in entries:
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def bootstrap(self, client: "MilvusClient") -> None:
+        """One-time scan of an existing collection when there is no manifest yet
+        (or it describes a collection that has since been recreated).
+
+        Rows already under their deterministic id go straight into the manifest
+        (with an empty hash, so they are re-checked once); uuid4-era rows are
+        remembered so load() can delete them after their replacement lands.
+        """
+        collection = str(client.describe_collection(COLLECTION).get("collection_id", ""))
+        if self.exists:
+            if self.collection == collection:
+                return
+            if self.collection is None and not (self.hashes and _is_empty(client)):
+                self.collection = collection      # written before manifests were stamped
+                self._append([{"collection": collection}])
+                return
+            logger.warning("Collection %s was recreated (id %s → %s) — discarding manifest %s",
+                           COLLECTION, self.collection, collection, self.path)
+            self.reset()
+        iterator = client.query_iterator(
+            collection_name=COLLECTION,
+            filter="url != ''",
+            output_fields=["id", "url"],
+            batch_size=1000,
+        )
+        entries = []
+        try:
+            while rows := iterator.next():
+                for row in rows:
+                    if self.shard is not None and shard_of(row["url"], self.shard[1]) != self.shard[0]:
+                        continue
+                    if row["id"] == record_id(row["url"]):
+                        entries.append({"id": row["id"], "hash": ""})
+                    else:
+                        entries.append({"id": row["id"], "url": row["url"], "legacy": True})
+        finally:
+            iterator.close()
+        entries.insert(0, {"collection": collection})
+        if self.summary is not None:
+            entries.insert(1, {"summary": self.summary})
+        for entry in entries:
+            self._apply(entry)
+        self._append(entries)                  # the file now exists — no second scan
+        self.exists = True
+        logger.info("Manifest bootstrap: %d rows scanned, %d legacy ids to migrate",
+                    len(entries), len(self.legacy))
+
+    def reset(self) -> None:
+        """Forget every row and delete the file (the summary stamp is kept: it describes this run)."""
+        self.close()
+        self.hashes.clear()
+        self.legacy.clear()
+        self.collection = None
+        self.path.unlink(missing_ok=True)
+        self.exists = False
+
+    def check_summary(self, spec: str, rebuild: bool = False) -> None:
+        """Stamp the summary spec of this run; a change from the recorded one
+        raises ValueError unless `rebuild` (it re-embeds every long record)."""
+        recorded = self.summary or (SUMMARY_UNCAPPED if self.exists else spec)
+        if recorded != spec:
+            if not rebuild:
+                raise ValueError(f"manifest {self.path} was built with summaries '{recorded}' but this run "
+                                 f"uses '{spec}' — that re-embeds every long record; pass --resummarize to do it")
+            logger.warning("Summary spec changed (%s → %s) — changed records will be re-embedded", recorded, spec)
+        if self.summary != spec:
+            self.summary = spec
+            self._append([{"summary": spec}])
+
+    def is_current(self, record: dict) -> bool:
+        return self.hashes.get(record["id"]) == record["content_hash"]
+
+    def stale_ids(self, records: list[dict]) -> list[str]:
+        """Legacy ids superseded by these records, to delete once they are upserted."""
+        return [self.legacy[r["url"]] for r in records if r["url"] in self.legacy]
+
+    def add(self, records: list[dict]) -> None:
+        """Record rows (and the deletion of any legacy rows they replace) as written."""
+        entries = []
+        for r in records:
+            if self.legacy.pop(r["url"], None) is not None:
+                entries.append({"url": r["url"], "legacy": False})
+            self.hashes[r["id"]] = r["content_hash"]
+            entries.append({"id": r["id"], "hash": r["content_hash"]})
+        self._append(entries)
+
+    def compact(self) -> None:
+        """Rewrite the file with one line per row."""
+        self.close()
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            if self.collection is not None:
+                f.write(json.dumps({"collection": self.collection}) + "\n")
+            if self.summary is not None:
+                f.write(json.dumps({"summary": self.summary}) + "\n")
+            for rid, h in self.hashes.items():
+                f.write(json.dumps({"id": rid, "hash": h}) + "\n")
+            for url, rid in self.legacy.items():
+                f.write(json.dumps({"id": rid, "url": url, "legacy": True}) + "\n")
+        os.replace(tmp, self.path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def select_changed(records: Iterator[dict], manifest: Manifest, stats: dict | None = None) -> Iterator[dict]:
+    """Yield only records that are new or changed since the last successful load."""
+    stats = stats if stats is not None else {}
+    stats.setdefault("unchanged", 0)
+    stats.setdefault("changed", 0)
+    for record in records:
+        if manifest.is_current(record):
+            stats["unchanged"] += 1
+            continue
+        stats["changed"] += 1
+        yield record
+    logger.info("Change detection — changed/new: %d  unchanged: %d", stats["changed"], stats["unchanged"])
@@ -0,0 +1,333 @@
+"""
+Concurrent ("overlapped") pipeline mode.
+
+The default pipeline chains generators, so embedding stalls while Milvus
+inserts run and vice versa. Here every stage runs in its own worker and hands
+batches to the next through a bounded queue (capping memory at
+`queue_size` batches per hop):
+
+    reader thread      extract → transform (→ change filter), length-bucketed embed batches
+        │  embed_q
+    embed dispatcher   fans batches out to a process pool of model replicas
+        │  load_q
+    loader thread      pipeline.load.load() over the queue
+
+Each replica process loads its own BGE-M3 (any backend) and gets
+cpu_count // replicas intra-op threads (inter-op 1), so N replicas don't
+oversubscribe the cores.
+Per-stage throughput and queue occupancy are logged while running and at the end.
+
+If any stage fails it sets a shared `failed` event: queue puts and gets poll
+it (QUEUE_POLL_S), so the other stages stop instead of blocking on a full or
+empty queue, and run_overlapped() re-raises the first error.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from pipeline.embed import EMBED_BATCH_SIZE, LENGTH_WINDOW, length_sorted
+from pipeline.extract import extract
+from pipeline.load import load
+from pipeline.manifest import Manifest, select_changed
+from pipeline.shards import in_shard
+from pipeline.transform import SUMMARY_MAX_TOKENS, transform
+
+if TYPE_CHECKING:
+    from pipeline.embed_cache import EmbeddingCache   # numpy — imported only when the cache is on
+
+logger = logging.getLogger(__name__)
+
+REPORT_INTERVAL_S = 10.0
+SAMPLE_INTERVAL_S = 0.25
+QUEUE_POLL_S      = 0.5
+
+_DONE = object()
+
+
+# ── Embed replica processes ───────────────────────────────────────────────────
+
+_replica = None
+
+
+def _init_replica(device: str, threads: int, backend: str | None) -> None:
+    # must be set before torch / onnxruntime spin up their thread pools
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from utils import EMBED_BACKEND, init_bge_embedder
+    if (backend or EMBED_BACKEND) == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+
+    global _replica
+    _replica = init_bge_embedder(device=device, backend=backend, threads=threads)
+
+
+def _embed_in_replica(summaries: list[str]):
+    import numpy as np
+    start = time.perf_counter()
+    vectors = _replica.embed_documents(summaries)
+    # float32 array pickles ~3x smaller than a list of Python floats
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+
+# ── Stats ─────────────────────────────────────────────────────────────────────
+
+class StageStats:
+    """Records processed and time spent working (not waiting on queues)."""
+
+    def __init__(self, name: str):
+        self.name    = name
+        self.records = 0
+        self.busy_s  = 0.0
+        self._lock   = threading.Lock()
+
+    def add(self, records: int, seconds: float) -> None:
+        with self._lock:
+            self.records += records
+            self.busy_s  += seconds
+
+    def line(self, wall_s: float) -> str:
+        busy_rate = self.records / self.busy_s if self.busy_s else 0.0
+        wall_rate = self.records / wall_s if wall_s else 0.0
+        return (f"{self.name:<10} {self.records:>8} rec  {wall_rate:>8.1f} rec/s  "
+                f"busy {self.busy_s:>7.1f}s ({busy_rate:.1f} rec/s per worker)")
+
+
+class QueueStats:
+    """Sampled occupancy of a bounded queue."""
+
+    def __init__(self, name: str, q: queue.Queue):
+        self.name    = name
+        self.q       = q
+        self.samples = 0
+        self.total   = 0
+        self.peak    = 0
+
+    def sample(self) -> None:
+        size = self.q.qsize()
+        self.samples += 1
+        self.total   += size
+        self.peak     = max(self.peak, size)
+
+    def line(self) -> str:
+        mean = self.total / self.samples if self.samples else 0.0
+        return f"{self.name:<10} occupancy mean {mean:>5.1f} / peak {self.peak:>3} of {self.q.maxsize}"
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+
+class _Stage(threading.Thread):
+    def __init__(self, name: str, target, errors: list, failed: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self._errors = errors
+        self._failed = failed
+
+    def run(self) -> None:
+        try:
+            self._target_fn()
+        except BaseException as e:
+            logger.exception("Stage %s failed", self.name)
+            self._errors.append(e)
+            self._failed.set()
+
+
+def _put(q: queue.Queue, item, failed: threading.Event) -> bool:
+    """Blocking put that gives up (returns False) once another stage has failed."""
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=QUEUE_POLL_S)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, failed: threading.Event):
+    """Blocking get; _DONE once another stage has failed."""
+    while True:
+        try:
+            return q.get(timeout=QUEUE_POLL_S)
+        except queue.Empty:
+            if failed.is_set():
+                return _DONE
+
+
+def _discard(q: queue.Queue) -> None:
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _read(input_path: str, embed_q: queue.Queue, stats: StageStats, batch_size: int,
+          manifest: Manifest | None, summary_max_tokens: int, window: int, read_workers: int,
+          shard: tuple[int, int] | None, failed: threading.Event,
+          progress: Callable[[int], None] | None) -> None:
+    # batches leave in length order within each window; load() doesn't care about order
+    def put_window(records: list, start: float) -> bool:
+        batches = length_sorted(records, batch_size)
+        stats.add(len(records), time.perf_counter() - start)
+        return all(_put(embed_q, batch, failed) for batch in batches)
+
+    try:
+        records = extract(input_path, workers=read_workers, progress=progress)
+        if shard is not None:
+            records = in_shard(records, shard)
+        records = transform(records, max_tokens=summary_max_tokens)
+        if manifest is not None:
+            records = select_changed(records, manifest)
+        window_size = batch_size * max(1, window)
+        pending, start = [], time.perf_counter()
+        for record in records:
+            pending.append(record)
+            if len(pending) == window_size:
+                if not put_window(pending, start):
+                    return                          # a later stage failed
+                pending, start = [], time.perf_counter()
+        if pending:
+            put_window(pending, start)
+    finally:
+        _put(embed_q, _DONE, failed)
+
+
+def _embed(embed_q: queue.Queue, load_q: queue.Queue, stats: StageStats, pool: ProcessPoolExecutor,
+           max_in_flight: int, cache: "EmbeddingCache | None", failed: threading.Event) -> None:
+    # (future | None, batch, vectors, miss indices), FIFO — keeps input order
+    in_flight: queue.Queue = queue.Queue()
+
+    def drain_one() -> None:
+        future, batch, vectors, misses = in_flight.get()
+        seconds = 0.0
+        if future is not None:
+            computed, seconds = future.result()     # busy time = model time inside the replica
+            if cache is not None:
+                cache.put_many([batch[i]["summary"] for i in misses], computed)
+            for i, vector in zip(misses, computed):
+                vectors[i] = vector
+        for record, vector in zip(batch, vectors):
+            record["moods_embedding"] = vector.tolist()
+        stats.add(len(batch), seconds)
+        _put(load_q, batch, failed)
+
+    try:
+        while (batch := _get(embed_q, failed)) is not _DONE:
+            if in_flight.qsize() >= max_in_flight:
+                drain_one()
+            summaries = [r["summary"] for r in batch]
+            vectors = cache.get_many(summaries) if cache is not None else [None] * len(batch)
+            misses = [i for i, v in enumerate(vectors) if v is None]
+            future = pool.submit(_embed_in_replica, [summaries[i] for i in misses]) if misses else None
+            in_flight.put((future, batch, vectors, misses))
+        while not in_flight.empty():
+            drain_one()
+    except BaseException:
+        failed.set()
+        _discard(embed_q)                          # unblock the reader's pending put
+        raise
+    finally:
+        _put(load_q, _DONE, failed)
+
+
+def _drain(load_q: queue.Queue, stats: StageStats, failed: threading.Event) -> Iterator[dict]:
+    while (batch := _get(load_q, failed)) is not _DONE:
+        start = time.perf_counter()
+        yield from batch
+        stats.add(len(batch), time.perf_counter() - start)   # time load() spent on this batch
+
+
+def run_overlapped(
+    input_path: str,
+    client,
+    device: str = "cpu",
+    failed_path: str = "failed.jsonl",
+    total: int = 0,
+    embed_workers: int = 1,
+    queue_size: int = 8,
+    batch_size: int = EMBED_BATCH_SIZE,
+    manifest: Manifest | None = None,
+    cache: "EmbeddingCache | None" = None,
+    backend: str | None = None,
+    summary_max_tokens: int = SUMMARY_MAX_TOKENS,
+    length_window: int = LENGTH_WINDOW,
+    read_workers: int = 1,
+    shard: tuple[int, int] | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> dict:
+    """Run extract/transform, embed and load concurrently; returns per-stage stats
+    (the "load" entry also carries load()'s written / skipped / failed counts).
+    `progress` receives input bytes read (see extract.read_bar)."""
+    threads = max(1, (os.cpu_count() or 1) // embed_workers)
+    logger.info("Concurrent mode: %d embed replica(s) × %d thread(s), queues of %d batches",
+                embed_workers, threads, queue_size)
+
+    embed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    load_q:  queue.Queue = queue.Queue(maxsize=queue_size)
+    stages  = {name: StageStats(name) for name in ("read", "embed", "load")}
+    queues  = [QueueStats("embed_q", embed_q), QueueStats("load_q", load_q)]
+    errors: list = []
+    failed  = threading.Event()
+    stop    = threading.Event()
+    start   = time.perf_counter()
+
+    def report() -> None:
+        wall = time.perf_counter() - start
+        for s in stages.values():
+            logger.info("  %s", s.line(wall))
+        for q in queues:
+            logger.info("  %s", q.line())
+
+    def monitor() -> None:
+        next_report = time.monotonic() + REPORT_INTERVAL_S
+        while not stop.wait(SAMPLE_INTERVAL_S):
+            for q in queues:
+                q.sample()
+            if time.monotonic() >= next_report:
+                report()
+                next_report += REPORT_INTERVAL_S
+
+    pool = ProcessPoolExecutor(
+        max_workers=embed_workers,
+        mp_context=multiprocessing.get_context("spawn"),   # torch is not fork-safe
+        initializer=_init_replica,
+        initargs=(device, threads, backend),
+    )
+    workers = [
+        _Stage("read", lambda: _read(input_path, embed_q, stages["read"], batch_size, manifest,
+                                     summary_max_tokens, length_window, read_workers, shard, failed, progress),
+               errors, failed),
+        _Stage("embed", lambda: _embed(embed_q, load_q, stages["embed"], pool, 2 * embed_workers, cache, failed),
+               errors, failed),
+        threading.Thread(target=monitor, name="monitor", daemon=True),
+    ]
+    try:
+        for w in workers:
+            w.start()
+        loaded = load(_drain(load_q, stages["load"], failed), client, failed_path=failed_path, total=total,
+                      manifest=manifest)
+        for w in workers[:2]:
+            w.join()
+    except BaseException:
+        failed.set()                               # let the reader / embed threads wind down
+        raise
+    finally:
+        stop.set()
+        pool.shutdown(cancel_futures=True)
+
+    logger.info("Concurrent pipeline finished in %.1fs:", time.perf_counter() - start)
+    report()
+    if cache is not None:
+        logger.info("  embedding cache %s", cache.stats())
+    if errors:
+        raise errors[0]
+    result = {name: {"records": s.records, "busy_s": s.busy_s} for name, s in stages.items()}
+    result["load"].update(loaded)
+    return result
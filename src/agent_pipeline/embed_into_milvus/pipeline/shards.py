@@ -0,0 +1,155 @@
+"""
+Sharded ingestion — disjoint slices of the input for independent workers.
+
+`run_pipeline.py --shard i/N` keeps only records whose URL hashes to shard i
+(manifest.shard_of) and tracks them in a per-shard manifest; every worker
+writes to the same collection, so N machines (or N local processes) split a
+full rebuild. Each worker leaves three files in the shard directory:
+
+    shard-<i>-of-<N>.manifest.jsonl   (id, hash) of the rows it loaded
+    shard-<i>-of-<N>.status.json      running → done, with row counts and its argv
+    shard-<i>-of-<N>.failed.jsonl     rows the loader rejected
+
+verify() reports shards that are missing, crashed (still "running"), have
+failed rows, or — given the input — don't cover every record at its current
+content hash. merge_manifests() folds the shard manifests into the main one,
+so later single-machine runs stay incremental. See run_shards.py for the CLI.
+
+    INGEST_SHARD_DIR
+"""
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+from pipeline.manifest import MANIFEST_PATH, Manifest, shard_of
+
+logger = logging.getLogger(__name__)
+
+SHARD_DIR = Path(os.getenv("INGEST_SHARD_DIR", MANIFEST_PATH.parent / ".ingest_shards"))
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """'i/N' → (i, N), with 0 <= i < N."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be in [0, {count}), got {spec!r}")
+    return index, count
+
+
+def in_shard(records: Iterator[dict], shard: tuple[int, int], stats: dict | None = None) -> Iterator[dict]:
+    """Yield only the records of this shard, partitioned by URL hash."""
+    index, count = shard
+    stats = stats if stats is not None else {}
+    stats.setdefault("in_shard", 0)
+    stats.setdefault("other_shards", 0)
+    for record in records:
+        if shard_of(record.get("url", ""), count) != index:
+            stats["other_shards"] += 1
+            continue
+        stats["in_shard"] += 1
+        yield record
+    logger.info("Shard %d/%d: %d records, %d left to other shards",
+                index, count, stats["in_shard"], stats["other_shards"])
+
+
+def _path(shard_dir: str | Path, shard: tuple[int, int], kind: str) -> Path:
+    index, count = shard
+    return Path(shard_dir) / f"shard-{index}-of-{count}.{kind}"
+
+
+def manifest_path(shard_dir: str | Path, shard: tuple[int, int]) -> Path:
+    return _path(shard_dir, shard, "manifest.jsonl")
+
+
+def failed_path(shard_dir: str | Path, shard: tuple[int, int]) -> Path:
+    return _path(shard_dir, shard, "failed.jsonl")
+
+
+def status_path(shard_dir: str | Path, shard: tuple[int, int]) -> Path:
+    return _path(shard_dir, shard, "status.json")
+
+
+def write_status(shard_dir: str | Path, shard: tuple[int, int], state: str, **fields) -> None:
+    """Atomically record a worker's state ("running" | "done") and whatever counts it has."""
+    path = status_path(shard_dir, shard)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    status = {
+        "shard": list(shard), "state": state, "host": socket.gethostname(), "pid": os.getpid(),
+        "argv": [str(Path(sys.argv[0]).resolve()), *sys.argv[1:]], "cwd": os.getcwd(),
+        "updated": time.time(), **fields,
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(status), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_status(shard_dir: str | Path, shard: tuple[int, int]) -> dict | None:
+    path = status_path(shard_dir, shard)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def verify(shard_dir: str | Path, count: int, records: Iterator[dict] | None = None) -> dict[int, list[str]]:
+    """Problems per shard index (empty list = complete).
+
+    `records` — the transformed input — additionally checks that every record
+    is in its shard's manifest at its current content hash.
+    """
+    problems: dict[int, list[str]] = {}
+    manifests: dict[int, Manifest] = {}
+    for index in range(count):
+        shard = (index, count)
+        found = problems[index] = []
+        status = read_status(shard_dir, shard)
+        if status is None:
+            found.append("never ran")
+            continue
+        if status["state"] != "done":
+            found.append(f"stopped while {status['state']} (pid {status.get('pid')} on {status.get('host')})")
+        elif status.get("failed"):
+            found.append(f"{status['failed']} failed rows in {failed_path(shard_dir, shard).name}")
+        if manifest_path(shard_dir, shard).exists():
+            manifests[index] = Manifest(manifest_path(shard_dir, shard))
+        elif status["state"] == "done" and status.get("written"):
+            found.append("manifest missing")
+
+    if records is not None:
+        missing = {index: 0 for index in range(count)}
+        for record in records:
+            index = shard_of(record.get("url", ""), count)
+            manifest = manifests.get(index)
+            if manifest is None or not manifest.is_current(record):
+                missing[index] += 1
+        for index, n in missing.items():
+            if n and index in manifests:
+                problems[index].append(f"{n} input records not loaded at their current hash")
+    return problems
+
+
+def merge_manifests(shard_dir: str | Path, count: int, dest: str | Path = MANIFEST_PATH) -> int:
+    """Fold every shard manifest into `dest` (shard entries win); returns the row count."""
+    merged = Manifest(dest)
+    merged.legacy = {url: rid for url, rid in merged.legacy.items()
+                     if not manifest_path(shard_dir, (shard_of(url, count), count)).exists()}
+    for index in range(count):
+        path = manifest_path(shard_dir, (index, count))
+        if not path.exists():
+            continue
+        shard = Manifest(path)
+        merged.collection = shard.collection or merged.collection
+        merged.summary = shard.summary or merged.summary
+        merged.hashes.update(shard.hashes)
+        merged.legacy.update(shard.legacy)
+    merged.compact()
+    logger.info("Merged %d shard manifests into %s: %d rows, %d legacy",
+                count, dest, len(merged.hashes), len(merged.legacy))
+    return len(merged.hashes)
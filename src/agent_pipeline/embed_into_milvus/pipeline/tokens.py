@@ -0,0 +1,75 @@
+"""
+BGE-M3 token counting for summary budgets and length bucketing.
+
+Uses the model's own tokenizer (the `tokenizers` package, no torch) when it
+can be loaded. Counting falls back to an estimate of ~4 bytes per token,
+which is close enough for length bucketing. Truncation never does: the
+summary feeds content hashes and embedding-cache keys, so where it is cut
+must not depend on whether the tokenizer happened to load on this host.
+Counts exclude the <s> / </s> special tokens the model adds.
+"""
+import functools
+import logging
+
+from utils import BGE_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_TOKEN = 4
+
+
+@functools.cache
+def get_tokenizer():
+    try:
+        from tokenizers import Tokenizer
+        return Tokenizer.from_pretrained(BGE_MODEL_NAME)
+    except Exception as e:
+        logger.warning("BGE-M3 tokenizer unavailable (%s) — estimating token counts", e)
+        return None
+
+
+def require_tokenizer():
+    """The BGE-M3 tokenizer, or RuntimeError when it can't be loaded."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        raise RuntimeError(f"{BGE_MODEL_NAME} tokenizer could not be loaded — it is needed to cap "
+                           "summaries (fetch it into the HF cache, or set --summary-max-tokens 0)")
+    return tokenizer
+
+
+def _estimate(text: str) -> int:
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return _estimate(text)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def count_tokens_batch(texts: list[str]) -> list[int]:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [_estimate(t) for t in texts]
+    return [len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def truncate_to_tokens(text: str, budget: int) -> tuple[str, int]:
+    """`text` cut to at most `budget` tokens at a word boundary; returns (text, tokens dropped)."""
+    if budget <= 0:
+        return "", count_tokens(text)
+    if len(text) <= budget:                  # every token covers at least one character
+        return text, 0
+
+    encoding = require_tokenizer().encode(text, add_special_tokens=False)
+    total = len(encoding.ids)
+    if total <= budget:
+        return text, 0
+    cut = encoding.offsets[budget - 1][1]
+
+    head = text[:cut]
+    if cut < len(text) and not text[cut].isspace() and " " in head:
+        head = head.rsplit(" ", 1)[0]        # don't end on half a word
+    head = head.rstrip()
+    return head, total - count_tokens(head)
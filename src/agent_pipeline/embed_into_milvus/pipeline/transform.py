@@ -5,45 +5,95 @@ Clean fields and build the summary text that will be embedded.
 Summary = "Moods: {moods}. Scent accords: {accords}. {description}"
 
 All three are also stored as separate fields on the record.
+
+`id` is derived from the URL (stable across runs) and `content_hash` covers
+the stored fields, so reruns can skip unchanged records — see manifest.py.
+
+The summary can be capped at SUMMARY_MAX_TOKENS BGE-M3 tokens (default 0 =
+no cap): moods and accords are always kept, the description is cut at a word
+boundary. The stored `description` field stays complete. A cap needs the real
+tokenizer, and changing it changes every long record's hash, so the setting
+is stamped in the manifest (`summary_spec`) and a change must be asked for.
 """
-import uuid
+import logging
+import os
 from typing import Iterator
 
+from pipeline.manifest import SUMMARY_UNCAPPED, content_hash, record_id
+from pipeline.tokens import count_tokens, require_tokenizer, truncate_to_tokens
+from utils import BGE_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "0"))
+
+
+def summary_spec(max_tokens: int) -> str:
+    """How summaries are built, as stamped in the manifest."""
+    return f"{BGE_MODEL_NAME}:{max_tokens}" if max_tokens else SUMMARY_UNCAPPED
+
+
+class TruncationStats:
+    def __init__(self):
+        self.records = self.truncated = self.tokens_dropped = 0
+
+    def __str__(self) -> str:
+        share = self.truncated / self.records if self.records else 0.0
+        return (f"{self.truncated}/{self.records} summaries truncated ({share:.1%}), "
+                f"{self.tokens_dropped} tokens dropped")
+
 
 def _join(lst: list) -> str:
     return ", ".join(str(x).strip() for x in lst if x)
 
 
-def _build_summary(moods_str: str, accords_str: str, description: str) -> str:
+def _build_summary(moods_str: str, accords_str: str, description: str,
+                   max_tokens: int = 0, stats: TruncationStats | None = None) -> str:
     parts = []
     if moods_str:
         parts.append(f"Moods: {moods_str}")
     if accords_str:
         parts.append(f"Scent accords: {accords_str}")
+    description = description.strip()
+    head = ". ".join(parts + [""])
+    if description and max_tokens and len(head) + len(description) > max_tokens:   # else can't exceed
+        description, dropped = truncate_to_tokens(description, max_tokens - count_tokens(head))
+        if dropped and stats is not None:
+            stats.truncated += 1
+            stats.tokens_dropped += dropped
     if description:
-        parts.append(description.strip())
+        parts.append(description)
     return ". ".join(parts)
 
 
-def transform(records: Iterator[dict]) -> Iterator[dict]:
+def transform(records: Iterator[dict], max_tokens: int = SUMMARY_MAX_TOKENS,
+              stats: TruncationStats | None = None) -> Iterator[dict]:
     """
     Yield Milvus-ready dicts (without embedding — added in Stage 3).
     Each dict has a `summary` field ready to be embedded.
     """
+    stats = stats if stats is not None else TruncationStats()
+    if max_tokens:
+        require_tokenizer()              # fail before the first record, not halfway through
     for item in records:
         notes = item.get("notes", {})
 
         moods_str   = _join(item.get("moods", []))
         accords_str = _join(item.get("main_accords", []))
         description = item.get("description", "") or ""
-        summary     = _build_summary(moods_str, accords_str, description)
+        summary     = _build_summary(moods_str, accords_str, description, max_tokens, stats)
+        stats.records += 1
+
+        name  = item.get("name", "").strip()
+        url   = item.get("url", "").strip()
+        brand = (item.get("brand") or "").strip()
 
-        yield {
-            "id":           str(uuid.uuid4()),
-            "name":         item.get("name", "").strip(),
+        record = {
+            "id":           record_id(url, fallback=f"{brand}/{name}"),
+            "name":         name,
             "description":  description,
-            "url":          item.get("url", "").strip(),
-            "brand":        (item.get("brand") or "").strip(),
+            "url":          url,
+            "brand":        brand,
             "gender":       (item.get("gender") or "").strip(),
             "top_notes":    _join(notes.get("top", [])),
             "middle_notes": _join(notes.get("middle", [])),
@@ -53,3 +103,8 @@ def transform(records: Iterator[dict]) -> Iterator[dict]:
             "summary":      summary,
             # embedding added in Stage 3
         }
+        record["content_hash"] = content_hash(record)
+        yield record
+
+    if max_tokens:
+        logger.info("Transform done — summary budget %d tokens: %s", max_tokens, stats)
@@ -0,0 +1,33 @@
+"""
+Collection version stamp.
+
+A tiny file holding an opaque token that changes whenever the load stage
+writes to perfume_collection. Readers (the recommendation result cache) tag
+entries with the token they saw and treat any change as invalidation.
+"""
+import os
+import uuid
+from pathlib import Path
+
+VERSION_PATH = Path(os.getenv(
+    "COLLECTION_VERSION_PATH",
+    Path(__file__).resolve().parents[4] / "datasets" / ".perfume_collection.version",
+))
+
+
+def read_collection_version() -> str:
+    """Current version token ("" if the collection was never stamped)."""
+    try:
+        return VERSION_PATH.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_collection_version() -> str:
+    """Write a fresh version token atomically and return it."""
+    token = uuid.uuid4().hex
+    VERSION_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = VERSION_PATH.with_suffix(".tmp")
+    tmp.write_text(token, encoding="utf-8")
+    os.replace(tmp, VERSION_PATH)
+    return token
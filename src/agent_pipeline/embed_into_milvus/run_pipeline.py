@@ -4,6 +4,28 @@ Data ingestion pipeline entry point.
 Usage:
     python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl
     python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl --device cuda
+    python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl --backend onnx-int8
+    python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl --concurrent --embed-workers 4
+    python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl --no-manifest
+    python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl --no-manifest --reuse-embeddings
+    python run_pipeline.py --input ../../datasets/perfumes_with_moods.parquet
+    python run_pipeline.py --input ../../datasets/perfumes_with_moods.jsonl --shard 2/8
+
+Reruns embed and upsert only new or changed records, tracked in a local
+manifest (see pipeline/manifest.py); --no-manifest falls back to skipping
+URLs found by scanning the collection. Every run stores the vectors it
+computes in an on-disk cache (pipeline/embed_cache.py); --reuse-embeddings
+also reads previously embedded summaries from it instead of recomputing them,
+e.g. when rebuilding the collection. --no-embed-cache turns the cache off.
+
+--summary-max-tokens caps the embedded summary (off by default). The setting
+is stamped in the manifest; changing it re-embeds every long record, so a
+run with a different cap stops unless --resummarize is given.
+
+--shard i/N processes only the records whose URL hashes to shard i, with a
+per-shard manifest, failed file and status in --shard-dir, so N workers can
+split a rebuild; run_shards.py launches them locally and verifies / merges
+the result (see pipeline/shards.py).
 """
 import argparse
 import logging
@@ -12,13 +34,20 @@ from pathlib import Path
 
 # Make utils importable
 sys.path.insert(0, str(Path(__file__).resolve().parent))
-
-from utils import init_bge_embedder
-from pipeline.extract  import extract
-from pipeline.transform import transform
-from pipeline.embed    import embed
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "utils"))  # src/utils/
+
+import tracing_policy
+from streaming_reader import is_catalog
+from utils import EMBED_BACKEND, EMBED_BACKENDS, embedding_model_id, init_bge_embedder
+from pipeline.extract  import extract, read_bar
+from pipeline.transform import SUMMARY_MAX_TOKENS, summary_spec, transform
+from pipeline.tokens import require_tokenizer
+from pipeline.embed    import LENGTH_WINDOW, embed
 from pipeline.db_setup import setup
 from pipeline.load     import load
+from pipeline.manifest import MANIFEST_PATH, Manifest, select_changed
+from pipeline.overlapped import run_overlapped
+from pipeline import shards
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,48 +57,170 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def count_lines(path: str) -> int:
-    with open(path, encoding="utf-8") as f:
-        return sum(1 for line in f if line.strip())
-
-
 def main():
     parser = argparse.ArgumentParser(description="Perfume data ingestion pipeline")
-    parser.add_argument("--input",  required=True, help="Path to perfumes JSONL file")
+    parser.add_argument("--input",  required=True, help="Path to perfumes JSONL file or .parquet / .arrow catalog")
     parser.add_argument("--device", default="cpu",  help="Embedding device: cpu | cuda (default: cpu)")
-    parser.add_argument("--failed", default="failed.jsonl", help="Output path for failed records")
+    parser.add_argument("--backend", choices=EMBED_BACKENDS, default=EMBED_BACKEND,
+                        help="Embedding backend: torch | onnx | onnx-int8 (default: $EMBED_BACKEND or torch)")
+    parser.add_argument("--read-workers", type=int, default=1,
+                        help="Processes parsing the input JSONL (used for files >= 64 MiB)")
+    parser.add_argument("--failed", default=None,
+                        help="Output path for failed records (default: failed.jsonl, or the shard's own file)")
+    parser.add_argument("--tracing", choices=tracing_policy.MODES, default=None,
+                        help="langsmith tracing for hot paths: off | sampled | full (default: $TRACING_MODE)")
+    parser.add_argument("--trace-sample-rate", type=float, default=None,
+                        help="Fraction of hot-path calls traced in 'sampled' mode")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="Run stages in parallel workers connected by bounded queues")
+    parser.add_argument("--embed-workers", type=int, default=1,
+                        help="Embedding model replicas (processes) in --concurrent mode")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Batches buffered between stages in --concurrent mode")
+    parser.add_argument("--manifest", default=str(MANIFEST_PATH),
+                        help="Local (id, content hash) manifest used to skip unchanged records")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="Ignore the manifest: insert URLs not already in the collection")
+    parser.add_argument("--summary-max-tokens", type=int, default=SUMMARY_MAX_TOKENS,
+                        help="Token budget for the embedded summary, 0 = no cap (default: $SUMMARY_MAX_TOKENS or 0)")
+    parser.add_argument("--resummarize", action="store_true",
+                        help="Accept a --summary-max-tokens different from the manifest's (re-embeds long records)")
+    parser.add_argument("--length-window", type=int, default=LENGTH_WINDOW,
+                        help="Embed batches sorted together by token length, 1 = arrival order")
+    parser.add_argument("--reuse-embeddings", action="store_true",
+                        help="Serve embeddings of already-seen summaries from the on-disk cache "
+                             "(new ones are stored there on every run; $EMBED_CACHE_DIR)")
+    parser.add_argument("--no-embed-cache", action="store_true",
+                        help="Neither read nor write the on-disk embedding cache")
+    parser.add_argument("--shard", default=None, metavar="i/N",
+                        help="Process only shard i of N (records partitioned by URL hash)")
+    parser.add_argument("--shard-dir", default=str(shards.SHARD_DIR),
+                        help="Where --shard workers keep their manifests, failed rows and status ($INGEST_SHARD_DIR)")
     args = parser.parse_args()
 
+    shard = None
+    if args.shard:
+        try:
+            shard = shards.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.no_manifest:
+            parser.error("--shard tracks its rows in a shard manifest; drop --no-manifest")
+        args.manifest = str(shards.manifest_path(args.shard_dir, shard))
+        args.failed = args.failed or str(shards.failed_path(args.shard_dir, shard))
+    args.failed = args.failed or "failed.jsonl"
+
+    if args.tracing:
+        tracing_policy.set_policy(args.tracing, args.trace_sample_rate)
+
     logger.info("=== Perfume Ingestion Pipeline ===")
     logger.info("Input : %s", args.input)
-    logger.info("Device: %s", args.device)
-
-    # Count for progress bars
-    total = count_lines(args.input)
-    logger.info("Records in file: %d", total)
+    logger.info("Device: %s (%s backend)", args.device, args.backend)
+    if shard is not None:
+        logger.info("Shard : %d of %d (%s)", shard[0], shard[1], args.shard_dir)
+
+    # No counting pass: a JSONL input gets a byte bar (read_bar), a catalog's row count is
+    # in its metadata. How many rows fall in a shard isn't known until they are read.
+    total = 0
+    if is_catalog(args.input):
+        from catalog import count_rows
+        rows = count_rows(args.input)
+        logger.info("Records in catalog: %d", rows)
+        if shard is None:
+            total = rows
+
+    if args.summary_max_tokens:
+        try:
+            require_tokenizer()
+        except RuntimeError as e:
+            parser.error(str(e))
+    manifest = None if args.no_manifest else Manifest(args.manifest, shard=shard)
+    if manifest is not None:
+        try:
+            manifest.check_summary(summary_spec(args.summary_max_tokens), rebuild=args.resummarize)
+        except ValueError as e:
+            parser.error(str(e))
+    cache    = None
+    if args.reuse_embeddings and args.no_embed_cache:
+        parser.error("--reuse-embeddings reads the embedding cache; drop --no-embed-cache")
+    if not args.no_embed_cache:
+        from pipeline.embed_cache import EMBED_CACHE_DIR, EmbeddingCache
+        # the cache is single-writer: concurrent shard workers each get their own
+        cache_dir = EMBED_CACHE_DIR if shard is None else EMBED_CACHE_DIR / f"shard-{shard[0]}-of-{shard[1]}"
+        cache = EmbeddingCache(embedding_model_id(args.backend), path=cache_dir, read=args.reuse_embeddings)
+
+    if shard is None:
+        _run(args, total, manifest, cache)
+        return
+    shards.write_status(args.shard_dir, shard, "running", input=args.input)
+    try:
+        counts = _run(args, total, manifest, cache, shard)
+    except BaseException as e:
+        shards.write_status(args.shard_dir, shard, "error", input=args.input, error=repr(e))
+        raise
+    shards.write_status(args.shard_dir, shard, "done", input=args.input, **counts)
+
+
+def _run(args, total: int, manifest: Manifest | None, cache, shard: tuple[int, int] | None = None) -> dict:
+    """Run the stages; returns load()'s written / skipped / failed counts."""
+    bar = read_bar(args.input)
+    try:
+        return _run_stages(args, total, manifest, cache, shard, bar.update if bar is not None else None)
+    finally:
+        if bar is not None:
+            bar.close()
+
+
+def _run_stages(args, total: int, manifest: Manifest | None, cache, shard: tuple[int, int] | None,
+                progress) -> dict:
+    if args.concurrent:
+        logger.info("--- DB Setup ---")
+        client = setup()
+        if manifest is not None:
+            manifest.bootstrap(client)
+        logger.info("--- Extract → Transform → Embed → Load (concurrent) ---")
+        stats = run_overlapped(
+            args.input, client,
+            device=args.device, failed_path=args.failed, total=total,
+            embed_workers=args.embed_workers, queue_size=args.queue_size,
+            manifest=manifest, cache=cache, backend=args.backend,
+            summary_max_tokens=args.summary_max_tokens, length_window=args.length_window,
+            read_workers=args.read_workers, shard=shard, progress=progress,
+        )
+        logger.info("Tracing: %s", tracing_policy.stats())
+        logger.info("=== Pipeline complete ===")
+        return {k: stats["load"][k] for k in ("written", "skipped", "failed")}
 
     # Stage 1 — Extract
     logger.info("--- Stage 1: Extract ---")
-    records = extract(args.input)
+    records = extract(args.input, workers=args.read_workers, progress=progress)
+    if shard is not None:
+        records = shards.in_shard(records, shard)
 
     # Stage 2 — Transform
     logger.info("--- Stage 2: Transform ---")
-    records = transform(records)
+    records = transform(records, max_tokens=args.summary_max_tokens)
+    if manifest is not None:
+        records = select_changed(records, manifest)   # only new/changed records get embedded
 
     # Stage 3 — Embed  (load model once here)
-    logger.info("--- Stage 3: Embed (loading BGE-M3 on %s) ---", args.device)
-    embedder = init_bge_embedder(device=args.device)
-    records = embed(records, embedder, total=total)
+    logger.info("--- Stage 3: Embed (loading BGE-M3 [%s] on %s) ---", args.backend, args.device)
+    embedder = init_bge_embedder(device=args.device, backend=args.backend)
+    records = embed(records, embedder, total=total, cache=cache, window=args.length_window)
 
     # Stage 4 — DB Setup
     logger.info("--- Stage 4: DB Setup ---")
     client = setup()
+    if manifest is not None:
+        manifest.bootstrap(client)   # rescans only for a new or recreated collection; runs before records are pulled
 
     # Stage 5 — Load
     logger.info("--- Stage 5: Load ---")
-    load(records, client, failed_path=args.failed, total=total)
+    counts = load(records, client, failed_path=args.failed, total=total, manifest=manifest)
 
+    logger.info("Tracing: %s", tracing_policy.stats())
     logger.info("=== Pipeline complete ===")
+    return counts
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""
+Run, verify and merge a sharded ingestion (run_pipeline.py --shard i/N).
+
+`launch` starts the N shard workers as local processes (at most --parallel
+at a time, logs next to the shard files) — on several machines, run
+`run_pipeline.py --shard i/N --shard-dir <shared dir>` on each instead.
+`merge` verifies that every shard finished without failed rows (and, with
+--input, that every input record was loaded at its current content hash),
+re-runs the shards that did not with --requeue, and folds the shard
+manifests into the main manifest once all are complete.
+
+Usage:
+    python run_shards.py launch --input ../../datasets/perfumes_with_moods.jsonl --shards 4 --parallel 2
+    python run_shards.py launch --input ... --shards 4 -- --concurrent --backend onnx-int8
+    python run_shards.py merge --shards 4
+    python run_shards.py merge --shards 4 --input ../../datasets/perfumes_with_moods.jsonl --requeue
+"""
+import argparse
+import logging
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "utils"))  # src/utils/
+
+from pipeline import shards
+from pipeline.manifest import MANIFEST_PATH
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)s | %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+RUN_PIPELINE = str(Path(__file__).resolve().parent / "run_pipeline.py")
+POLL_S       = 1.0
+
+
+def _command(shard: tuple[int, int], shard_dir: str, input_path: str | None, extra: list[str],
+             rerun: bool = False) -> tuple[list[str], str | None]:
+    """(argv, cwd) for a shard worker; `rerun` repeats the command line the worker last recorded."""
+    status = shards.read_status(shard_dir, shard) if rerun else None
+    if status and status.get("argv"):
+        return [sys.executable, *status["argv"]], status.get("cwd")
+    if input_path is None:
+        raise SystemExit(f"shard {shard[0]}/{shard[1]} never ran — pass --input to start it")
+    return [sys.executable, RUN_PIPELINE, "--input", str(Path(input_path).resolve()),
+            "--shard", f"{shard[0]}/{shard[1]}", "--shard-dir", str(Path(shard_dir).resolve()), *extra], None
+
+
+def launch(commands: dict[int, tuple[list[str], str | None]], shard_dir: str, count: int,
+           parallel: int) -> dict[int, int]:
+    """Run the shard commands as local processes; returns exit codes by shard index."""
+    Path(shard_dir).mkdir(parents=True, exist_ok=True)
+    queued  = sorted(commands)
+    running: dict[int, tuple[subprocess.Popen, object]] = {}
+    codes:   dict[int, int] = {}
+    while queued or running:
+        while queued and len(running) < parallel:
+            index = queued.pop(0)
+            log = open(Path(shard_dir) / f"shard-{index}-of-{count}.log", "a", encoding="utf-8")
+            argv, cwd = commands[index]
+            running[index] = (subprocess.Popen(argv, cwd=cwd, stdout=log, stderr=subprocess.STDOUT), log)
+            logger.info("Shard %d/%d started (pid %d)", index, count, running[index][0].pid)
+        time.sleep(POLL_S)
+        for index, (proc, log) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            log.close()
+            codes[index] = proc.returncode
+            del running[index]
+            logger.info("Shard %d/%d exited with %d", index, count, proc.returncode)
+    return codes
+
+
+def _verify(args) -> dict[int, list[str]]:
+    records = bar = None
+    if args.input:
+        from pipeline.extract import extract, read_bar
+        from pipeline.transform import transform
+        bar = read_bar(args.input)
+        records = extract(args.input, progress=bar.update if bar is not None else None)
+        records = transform(records, max_tokens=args.summary_max_tokens)
+    problems = shards.verify(args.shard_dir, args.shards, records)
+    if bar is not None:
+        bar.close()
+    for index, found in problems.items():
+        logger.info("Shard %d/%d: %s", index, args.shards, "; ".join(found) if found else "complete")
+    return {index: found for index, found in problems.items() if found}
+
+
+def main():
+    from pipeline.transform import SUMMARY_MAX_TOKENS
+
+    parser = argparse.ArgumentParser(description="Sharded ingestion: launch workers, verify and merge")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("launch", "merge"):
+        p = sub.add_parser(name)
+        p.add_argument("--shards", type=int, required=True, help="Number of shards N")
+        p.add_argument("--shard-dir", default=str(shards.SHARD_DIR))
+        p.add_argument("--parallel", type=int, default=1, help="Shard workers running at once")
+        p.add_argument("--summary-max-tokens", type=int, default=SUMMARY_MAX_TOKENS,
+                       help="Must match the workers' setting for the --input check")
+        p.add_argument("extra", nargs=argparse.REMAINDER, help="-- arguments passed on to run_pipeline.py")
+    sub.choices["launch"].add_argument("--input", required=True)
+    merge = sub.choices["merge"]
+    merge.add_argument("--input", default=None,
+                       help="Also check that every input record was loaded at its current hash")
+    merge.add_argument("--requeue", action="store_true", help="Re-run incomplete shards locally, then verify again")
+    merge.add_argument("--manifest", default=str(MANIFEST_PATH), help="Main manifest to merge into")
+    args = parser.parse_args()
+    extra = args.extra[1:] if args.extra[:1] == ["--"] else args.extra
+
+    if args.command == "launch":
+        from pipeline.db_setup import setup
+        setup()              # create the collection once, before the workers race to
+        commands = {i: _command((i, args.shards), args.shard_dir, args.input, extra) for i in range(args.shards)}
+        launch(commands, args.shard_dir, args.shards, args.parallel)
+        incomplete = _verify(args)
+    else:
+        incomplete = _verify(args)
+        if incomplete and args.requeue:
+            commands = {i: _command((i, args.shards), args.shard_dir, args.input, extra, rerun=True)
+                        for i in incomplete}
+            logger.info("Re-queueing shards %s", sorted(commands))
+            launch(commands, args.shard_dir, args.shards, args.parallel)
+            incomplete = _verify(args)
+        if not incomplete:
+            shards.merge_manifests(args.shard_dir, args.shards, args.manifest)
+
+    if incomplete:
+        logger.error("Incomplete shards: %s — rerun with: python run_shards.py merge --shards %d --requeue",
+                     sorted(incomplete), args.shards)
+        sys.exit(1)
+    logger.info("All %d shards complete", args.shards)
+
+
+if __name__ == "__main__":
+    main()
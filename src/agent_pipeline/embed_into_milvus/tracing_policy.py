@@ -0,0 +1,132 @@
+"""
+Tracing policy for langsmith @traceable hot paths.
+
+Per-record functions (embed_text_bge, build_record, ...) used to be wrapped in
+@traceable directly, so every call paid tracing overhead and — with no network —
+runs piled up in the langsmith background queue without bound.
+`hot_path_traceable` replaces @traceable on those paths and decides per call:
+
+    TRACING_MODE=off       never trace, call the plain function
+    TRACING_MODE=sampled   trace TRACING_SAMPLE_RATE of calls (0.0 - 1.0)
+    TRACING_MODE=full      trace every call (previous behaviour, default)
+
+Buffers stay bounded in both directions:
+  - a call is not traced (counted as dropped) while the langsmith client's
+    pending queue holds TRACING_MAX_QUEUE runs or more
+  - the policy's own per-call records live in a deque of TRACING_BUFFER_SIZE
+"""
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "sampled", "full")
+
+_mode        = os.getenv("TRACING_MODE", "full")
+_sample_rate = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))
+_max_queue   = int(os.getenv("TRACING_MAX_QUEUE", "1000"))
+
+_recent  = deque(maxlen=int(os.getenv("TRACING_BUFFER_SIZE", "1000")))   # (name, seconds, traced)
+_counts  = {"calls": 0, "traced": 0, "dropped": 0}
+_lock    = threading.Lock()
+_client  = None
+
+
+def set_policy(mode: str, sample_rate: float | None = None) -> None:
+    """Switch tracing mode at runtime (CLI flags, benchmarks)."""
+    global _mode, _sample_rate
+    if mode not in MODES:
+        raise ValueError(f"Unknown tracing mode {mode!r}; expected one of {MODES}")
+    _mode = mode
+    if sample_rate is not None:
+        _sample_rate = max(0.0, min(1.0, sample_rate))
+    logger.info("Tracing policy: mode=%s sample_rate=%.3f", _mode, _sample_rate)
+
+
+def _get_client():
+    """Shared langsmith client, created on first traced call."""
+    global _client
+    if _client is None:
+        from langsmith import Client
+        _client = Client()
+    return _client
+
+
+def _langsmith_enabled() -> bool:
+    try:
+        from langsmith.utils import tracing_is_enabled
+        return bool(tracing_is_enabled())
+    except Exception:
+        return False
+
+
+def _queue_full() -> bool:
+    queue = getattr(_get_client(), "tracing_queue", None)
+    return queue is not None and queue.qsize() >= _max_queue
+
+
+def sample() -> bool:
+    """Policy decision for one hot-path call; usable by any future span producer."""
+    if _mode == "off":
+        return False
+    if _mode == "sampled" and random.random() >= _sample_rate:
+        return False
+    if not _langsmith_enabled():
+        return False
+    if _queue_full():
+        with _lock:
+            _counts["dropped"] += 1
+        return False
+    return True
+
+
+def stats() -> dict:
+    """Counters plus the mean duration of buffered calls, split by traced/untraced."""
+    with _lock:
+        recent = list(_recent)
+        counts = dict(_counts)
+    for traced in (True, False):
+        durations = [s for _, s, t in recent if t == traced]
+        key = "traced_mean_ms" if traced else "untraced_mean_ms"
+        counts[key] = round(1000 * sum(durations) / len(durations), 3) if durations else None
+    return {"mode": _mode, "sample_rate": _sample_rate, **counts}
+
+
+def reset_stats() -> None:
+    with _lock:
+        _recent.clear()
+        for key in _counts:
+            _counts[key] = 0
+
+
+def hot_path_traceable(run_type: str = "chain", name: str | None = None):
+    """Drop-in replacement for langsmith's @traceable that honours the policy."""
+    def decorator(fn):
+        run_name  = name or fn.__name__
+        traced_fn = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal traced_fn
+            traced = sample()
+            start  = time.perf_counter()
+            try:
+                if not traced:
+                    return fn(*args, **kwargs)
+                if traced_fn is None:
+                    from langsmith import traceable
+                    traced_fn = traceable(run_type=run_type, name=run_name, client=_get_client())(fn)
+                return traced_fn(*args, **kwargs)
+            finally:
+                with _lock:
+                    _recent.append((run_name, time.perf_counter() - start, traced))
+                    _counts["calls"] += 1
+                    _counts["traced"] += int(traced)
+
+        return wrapper
+    return decorator
@@ -1,13 +1,42 @@
 
-from typing import List
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, List
 import uuid
-from langchain_huggingface import HuggingFaceEmbeddings
-from langsmith import traceable
 
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
 
-@traceable(run_type="embedding", name="init_bge_embedder")
-def init_bge_embedder(device: str = "cpu"):
-    model_name = "BAAI/bge-m3"
+sys.path.insert(0, str(Path(__file__).resolve().parent))  # embed_into_milvus/
+
+from tracing_policy import hot_path_traceable
+
+BGE_MODEL_NAME = "BAAI/bge-m3"
+
+# torch: HuggingFaceEmbeddings (fp32). onnx / onnx-int8: ONNX Runtime, see onnx_embedder.py
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND  = os.getenv("EMBED_BACKEND", "torch")
+
+
+def embedding_model_id(backend: str | None = None) -> str:
+    """Identifies the vectors a backend produces (embedding cache key)."""
+    backend = backend or EMBED_BACKEND
+    return BGE_MODEL_NAME if backend == "torch" else f"{BGE_MODEL_NAME}@{backend}"
+
+
+@hot_path_traceable(run_type="embedding", name="init_bge_embedder")
+def init_bge_embedder(device: str = "cpu", backend: str | None = None, threads: int | None = None):
+    backend = backend or EMBED_BACKEND
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r} — expected one of {EMBED_BACKENDS}")
+    if backend != "torch":
+        from onnx_embedder import OnnxBgeEmbedder
+        return OnnxBgeEmbedder(backend, device=device, threads=threads)
+
+    from langchain_huggingface import HuggingFaceEmbeddings   # pulls in torch — import only when a model is built
+
+    model_name = BGE_MODEL_NAME
     model_kwargs = {
         "device": device,
         "trust_remote_code": True
@@ -23,9 +52,9 @@ def init_bge_embedder(device: str = "cpu"):
     )
 
 
-@traceable(run_type="embedding", name="embed_text_bge")
+@hot_path_traceable(run_type="embedding", name="embed_text_bge")
 def embed_text_bge(
-    embedder: HuggingFaceEmbeddings,
+    embedder: "HuggingFaceEmbeddings",
     mood_list: List[str],
 ) -> List[float]:
     """
@@ -49,12 +78,12 @@ def embed_text_bge(
     return embeddings
 
 
-@traceable(run_type="chain", name="build_record")
+@hot_path_traceable(run_type="chain", name="build_record")
 def build_record(embedder, item: dict) -> dict:
     notes = item.get("notes", {})
     
     return {
-        "id": str(uuid.uuid4()),
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, (item.get("url") or "").strip())),
 
         "name": item.get("name", ""),
         "description": item.get("description", ""),
@@ -1,5 +1,11 @@
 import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "utils"))  # src/utils/
+
 from graph import build_graph
+from streaming_reader import iter_records
 
 def run_perfume_mood_graph(perfumes: list[dict]):
     graph = build_graph()
@@ -12,9 +18,13 @@ def run_perfume_mood_graph(perfumes: list[dict]):
     app.invoke(input_state)
 
 if __name__=="__main__":
-    DATA_PATH = "../../../datasets/fragrantica_perfumes.json"
+    # a .json array, .jsonl or .parquet / .arrow catalog
+    DATA_PATH = sys.argv[1] if len(sys.argv) > 1 else "../../../datasets/fragrantica_perfumes.json"
 
-    with open(DATA_PATH, "r", encoding="utf-8") as json_file:
-        perfumes = json.load(json_file)
+    if DATA_PATH.endswith(".json"):
+        with open(DATA_PATH, "r", encoding="utf-8") as json_file:
+            perfumes = json.load(json_file)
+    else:
+        perfumes = list(iter_records(DATA_PATH))
 
     run_perfume_mood_graph(perfumes)
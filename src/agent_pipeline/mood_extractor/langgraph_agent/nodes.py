@@ -1,12 +1,14 @@
 import json
 import sys
+from pathlib import Path
 sys.path.insert(0, "../")
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "utils"))  # src/utils/
 from ..mood_model_agent import (
     create_mood_extraction_chain,
     extract_moods as extract_moods_from_chain,
 )
 from states import PerfumeInputState, PerfumeWorkingState
-from pathlib import Path
+from streaming_reader import iter_jsonl
 import logging
 
 MOOD_CHAIN = create_mood_extraction_chain()
@@ -28,17 +30,10 @@ def load_existing_perfume_urls(output_path: Path) -> set[str]:
     if not output_path.exists():
         return existing
 
-    with open(output_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                record = json.loads(line)
-                url = record.get("url")
-                if url:
-                    existing.add(url)
-            except json.JSONDecodeError:
-                continue
+    for _, record in iter_jsonl(output_path, on_error=lambda lineno, e: None):   # skip partial lines
+        url = record.get("url")
+        if url:
+            existing.add(url)
 
     return existing
 
@@ -7,13 +7,17 @@ Uses llama3.1:8b for agent reasoning, smollm2 for mood extraction.
 
 import json
 import logging
+import sys
 from pathlib import Path
 
 from langchain_core.tools import tool
 from langchain_ollama import ChatOllama
 from langgraph.prebuilt import create_react_agent
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "utils"))  # src/utils/
+
 from mood_model_agent import create_mood_extraction_chain, extract_moods
+from streaming_reader import iter_jsonl, iter_records
 
 logging.basicConfig(
     level=logging.INFO,
@@ -54,14 +58,17 @@ def _form_input_content(data_item: dict) -> str:
 
 @tool
 def read_input_perfumes(file_path: str) -> str:
-    """Read perfume data from a JSON file. Returns a summary of loaded perfumes."""
+    """Read perfume data from a JSON, JSONL or Parquet/Arrow catalog file. Returns a summary of loaded perfumes."""
     global _perfumes
     path = Path(file_path)
     if not path.exists():
         return f"Error: file not found at {file_path}"
 
-    with open(path, "r", encoding="utf-8") as f:
-        _perfumes = json.load(f)
+    if path.suffix == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            _perfumes = json.load(f)   # the whole list is kept anyway; json.load is the fastest way to it
+    else:
+        _perfumes = list(iter_records(path))
 
     return f"Loaded {len(_perfumes)} perfumes from {file_path}."
 
@@ -74,17 +81,10 @@ def read_processed_urls(file_path: str) -> str:
 
     _processed_urls = set()
     if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                try:
-                    record = json.loads(line)
-                    url = record.get("url")
-                    if url:
-                        _processed_urls.add(url)
-                except json.JSONDecodeError:
-                    continue
+        for _, record in iter_jsonl(path, on_error=lambda lineno, e: None):   # skip partial lines
+            url = record.get("url")
+            if url:
+                _processed_urls.add(url)
 
     _unprocessed = [
         p for p in _perfumes
@@ -0,0 +1,219 @@
+"""
+Admission control for /recommend.
+
+Each expensive stage gets a StageLimiter: at most `concurrency` calls run at
+once, up to `max_queue` more wait (their queue time is recorded), and anything
+beyond that is rejected immediately with `Overloaded`. A call abandoned at
+the request deadline (deadline.call_within) keeps its slot until it actually
+finishes, so abandoned work still counts against the stage. The API also
+caps the number of requests in flight and checks stage queues before it
+starts streaming, so an overload turns into a fast 503 + Retry-After instead
+of a pile of timeouts.
+
+    stage       graph nodes                     env prefix
+    llm         extract_mood, extract_accord    ADMISSION_LLM_*
+    search      search                          ADMISSION_SEARCH_*
+    evaluator   evaluator                       ADMISSION_EVALUATOR_*
+
+    ADMISSION_<STAGE>_CONCURRENCY, ADMISSION_<STAGE>_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_S, ADMISSION_RETRY_AFTER_S, ADMISSION_MAX_REQUESTS
+"""
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from deadline import on_abandon, remaining
+from metrics import REGISTRY
+
+QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+RETRY_AFTER_S   = int(os.getenv("ADMISSION_RETRY_AFTER_S", "2"))
+MAX_REQUESTS    = int(os.getenv("ADMISSION_MAX_REQUESTS", "64"))
+
+QUEUE_TIME = REGISTRY.histogram(
+    "recommend_admission_queue_seconds", "Time spent waiting for a stage slot.", ["stage"])
+REJECTED = REGISTRY.counter(
+    "recommend_admission_rejected_total", "Calls rejected because a stage queue was full.", ["stage"])
+IN_FLIGHT = REGISTRY.gauge(
+    "recommend_admission_in_flight", "Calls currently holding a stage slot.", ["stage"])
+WAITING = REGISTRY.gauge(
+    "recommend_admission_waiting", "Calls currently queued for a stage slot.", ["stage"])
+
+
+class Overloaded(Exception):
+    """A stage (or the request gate) is at capacity — retry after `retry_after` seconds."""
+
+    def __init__(self, stage: str, retry_after: int = RETRY_AFTER_S):
+        super().__init__(f"'{stage}' is overloaded — retry after {retry_after}s")
+        self.stage       = stage
+        self.retry_after = retry_after
+
+
+class _Hold:
+    """Acquired slot(s): released when the holder is done and every call
+    abandoned under them (deadline.call_within) has finished."""
+
+    def __init__(self, limiter: "StageLimiter", weight: int = 1):
+        self._limiter = limiter
+        self._weight  = weight
+        self._pending = 1
+        self._lock    = threading.Lock()
+
+    def keep_until(self, future) -> None:
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self.done)
+
+    def done(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+            last = self._pending == 0
+        if last:
+            self._limiter.release(self._weight)
+
+
+class StageLimiter:
+    """Bounded-concurrency slot pool with a bounded wait queue. A caller that
+    fans out to several calls at once takes `weight` slots, one per call."""
+
+    def __init__(self, stage: str, concurrency: int, max_queue: int, queue_timeout_s: float = QUEUE_TIMEOUT_S):
+        self.stage           = stage
+        self.concurrency     = concurrency
+        self.max_queue       = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.in_flight = 0
+        self.waiting   = 0
+        self._cond = threading.Condition()
+
+    def saturated(self) -> bool:
+        """True when a new call would be rejected right now."""
+        with self._cond:
+            return self.in_flight >= self.concurrency and self.waiting >= self.max_queue
+
+    def _publish(self) -> None:
+        IN_FLIGHT.set(self.in_flight, stage=self.stage)
+        WAITING.set(self.waiting, stage=self.stage)
+
+    def acquire(self, timeout_s: float | None = None, weight: int = 1) -> None:
+        if not 1 <= weight <= self.concurrency:
+            raise ValueError(f"'{self.stage}' has {self.concurrency} slots, asked for {weight}")
+        timeout_s = self.queue_timeout_s if timeout_s is None else min(timeout_s, self.queue_timeout_s)
+        start = time.monotonic()
+        with self._cond:
+            if self.in_flight + weight > self.concurrency:
+                if self.waiting >= self.max_queue:
+                    REJECTED.inc(stage=self.stage)
+                    raise Overloaded(self.stage)
+                self.waiting += 1
+                self._publish()
+                try:
+                    while self.in_flight + weight > self.concurrency:
+                        left = timeout_s - (time.monotonic() - start)
+                        if left <= 0:
+                            REJECTED.inc(stage=self.stage)
+                            raise Overloaded(self.stage)
+                        self._cond.wait(left)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += weight
+            self._publish()
+        QUEUE_TIME.observe(time.monotonic() - start, stage=self.stage)
+
+    def release(self, weight: int = 1) -> None:
+        with self._cond:
+            self.in_flight -= weight
+            self._publish()
+            self._cond.notify_all()         # a weighted waiter may need more than one freed slot
+
+    def _release_if_acquired(self, weight: int, waiter: asyncio.Future) -> None:
+        if not waiter.cancelled() and waiter.exception() is None:
+            self.release(weight)
+
+    def try_acquire(self) -> bool:
+        """Non-blocking acquire (no queueing)."""
+        with self._cond:
+            if self.in_flight >= self.concurrency:
+                REJECTED.inc(stage=self.stage)
+                return False
+            self.in_flight += 1
+            self._publish()
+            return True
+
+    @contextmanager
+    def slot(self, timeout_s: float | None = None, weight: int = 1):
+        self.acquire(timeout_s, weight)
+        hold  = _Hold(self, weight)
+        token = on_abandon.set(hold.keep_until)
+        try:
+            yield
+        finally:
+            on_abandon.reset(token)
+            hold.done()
+
+    @asynccontextmanager
+    async def aslot(self, timeout_s: float | None = None, weight: int = 1):
+        # wait in a worker thread so the event loop never blocks on the condition
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire, timeout_s, weight))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # the thread keeps waiting after we're cancelled — hand back the slot if it gets one
+            waiter.add_done_callback(functools.partial(self._release_if_acquired, weight))
+            raise
+        hold  = _Hold(self, weight)
+        token = on_abandon.set(hold.keep_until)
+        try:
+            yield
+        finally:
+            on_abandon.reset(token)
+            hold.done()
+
+
+def _limiter(stage: str, concurrency: int, queue: int) -> StageLimiter:
+    prefix = f"ADMISSION_{stage.upper()}"
+    return StageLimiter(
+        stage,
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", queue)),
+    )
+
+
+STAGES = {
+    "llm":       _limiter("llm",       concurrency=8, queue=16),
+    "search":    _limiter("search",    concurrency=4, queue=32),
+    "evaluator": _limiter("evaluator", concurrency=4, queue=16),
+}
+
+REQUESTS = StageLimiter("request", concurrency=MAX_REQUESTS, max_queue=0)
+
+
+def check_capacity() -> None:
+    """Raise Overloaded if any stage queue is already full (call before streaming)."""
+    for limiter in STAGES.values():
+        if limiter.saturated():
+            REJECTED.inc(stage=limiter.stage)
+            raise Overloaded(limiter.stage)
+
+
+def admitted(stage: str):
+    """Decorator: run a (sync or async) graph node inside a slot of `stage`.
+    Queue waits never outlast the request deadline."""
+    limiter = STAGES[stage]
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(state, *args, **kwargs):
+                async with limiter.aslot(remaining(state)):
+                    return await fn(state, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            with limiter.slot(remaining(state)):
+                return fn(state, *args, **kwargs)
+        return wrapper
+    return decorator
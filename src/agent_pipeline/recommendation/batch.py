@@ -0,0 +1,151 @@
+"""
+Batch recommendations for offline jobs (POST /recommend/batch).
+
+Inputs are handled in chunks of BATCH_CHUNK_SIZE. For each chunk:
+    1. moods and accords are extracted with one batched LLM call each
+    2. signatures already in the result cache are emitted straight away
+    3. the rest are embedded in one call and searched in one multi-vector
+       Milvus request per gender filter (nq > 1)
+    4. each input is evaluated on its own, at most `concurrency` at a time,
+       and emitted the moment its evaluation finishes
+The next chunk's extraction overlaps the previous chunk's evaluations. Every
+stage call holds a slot of its admission stage — the batched extraction one
+slot per concurrent LLM call — so a batch job queues behind (and cannot
+starve) interactive traffic.
+"""
+import asyncio
+import logging
+import os
+from typing import AsyncIterator
+
+from admission import STAGES, Overloaded
+from graph import cache_store
+from nodes.accord_extractor import extract_accords_batch
+from nodes.evaluator import evaluate_node
+from nodes.mood_extractor import extract_moods_batch
+from nodes.search import search_batch
+from result_cache import RESULT_CACHE, signature
+
+logger = logging.getLogger(__name__)
+
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "16"))
+
+
+def _line(index: int, item: dict, **fields) -> dict:
+    line = {
+        "index": index,
+        "id": item.get("id"),
+        "moods": [],
+        "accords": [],
+        "recommendations": [],
+        "degradations": [],
+        "cached": False,
+    }
+    line.update(fields)
+    return line
+
+
+def _error_line(index: int, item: dict, e: Exception) -> dict:
+    retry_after = e.retry_after if isinstance(e, Overloaded) else None
+    return _line(index, item, error=str(e), retry_after=retry_after)
+
+
+async def _evaluate(index: int, item: dict, state: dict, limit: asyncio.Semaphore, emit) -> None:
+    try:
+        async with limit, STAGES["evaluator"].aslot():
+            result = await asyncio.to_thread(evaluate_node, state)
+        state["recommendations"] = result.get("recommendations", [])
+        state["degradations"] = state["degradations"] + result.get("degradations", [])
+        cache_store(state)
+        await emit(_line(
+            index, item,
+            moods=state["extracted_moods"], accords=state["extracted_accords"],
+            recommendations=state["recommendations"], degradations=state["degradations"],
+        ))
+    except Exception as e:
+        await emit(_error_line(index, item, e))
+
+
+async def _run_chunk(items: list[dict], indices: list[int], concurrency: int,
+                     limit: asyncio.Semaphore, emit, evaluations: list) -> None:
+    texts = [items[i]["text"] for i in indices]
+    llm = STAGES["llm"]
+    slots = min(2 * concurrency, llm.concurrency)    # one per LLM call in flight, both batches together
+    per_batch = max(1, slots // 2)
+    async with llm.aslot(weight=slots):
+        if slots > 1:
+            moods, accords = await asyncio.gather(
+                asyncio.to_thread(extract_moods_batch, texts, per_batch),
+                asyncio.to_thread(extract_accords_batch, texts, per_batch),
+            )
+        else:
+            moods = await asyncio.to_thread(extract_moods_batch, texts, 1)
+            accords = await asyncio.to_thread(extract_accords_batch, texts, 1)
+
+    by_gender: dict[str, list] = {}
+    for i, (m, m_deg), (a, a_deg) in zip(indices, moods, accords):
+        gender = items[i].get("preferred_gender", "")
+        cached = RESULT_CACHE.get(signature(m, a, gender)) if (m or a) else None
+        if cached is not None:
+            await emit(_line(i, items[i], moods=m, accords=a, recommendations=cached,
+                             degradations=m_deg + a_deg, cached=True))
+            continue
+        by_gender.setdefault(gender, []).append({
+            "index": i,
+            "extracted_moods": m,
+            "extracted_accords": a,
+            "preferred_gender": gender,
+            "degradations": m_deg + a_deg,
+        })
+
+    for gender, states in by_gender.items():
+        try:
+            async with STAGES["search"].aslot():
+                candidates = await search_batch(
+                    [(s["extracted_moods"], s["extracted_accords"]) for s in states], gender,
+                )
+        except Exception as e:
+            for s in states:
+                await emit(_error_line(s["index"], items[s["index"]], e))
+            continue
+        for s, c in zip(states, candidates):
+            s["candidates"] = c
+            i = s.pop("index")
+            evaluations.append(asyncio.create_task(_evaluate(i, items[i], s, limit, emit)))
+
+
+async def recommend_batch(items: list[dict], concurrency: int = 4) -> AsyncIterator[dict]:
+    """Yield one result dict per input — in completion order, tagged with its index."""
+    queue: asyncio.Queue = asyncio.Queue()
+    emitted: set[int] = set()
+    limit = asyncio.Semaphore(concurrency)
+    evaluations: list[asyncio.Task] = []
+
+    async def emit(line: dict) -> None:
+        emitted.add(line["index"])
+        await queue.put(line)
+
+    async def produce() -> None:
+        try:
+            for start in range(0, len(items), BATCH_CHUNK_SIZE):
+                indices = list(range(start, min(len(items), start + BATCH_CHUNK_SIZE)))
+                try:
+                    await _run_chunk(items, indices, concurrency, limit, emit, evaluations)
+                except Exception as e:
+                    logger.warning("[batch] chunk %d-%d failed: %s", indices[0], indices[-1], e)
+                    for i in indices:
+                        if i not in emitted:
+                            await emit(_error_line(i, items[i], e))
+            await asyncio.gather(*evaluations)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (line := await queue.get()) is not None:
+            yield line
+    finally:
+        if not producer.done():             # client went away — stop the work
+            producer.cancel()
+            for task in evaluations:
+                task.cancel()
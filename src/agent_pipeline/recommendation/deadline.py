@@ -0,0 +1,77 @@
+"""
+Per-request latency budget shared by every graph node.
+
+The API stamps an absolute `deadline_at` (time.monotonic() seconds) on the
+graph input. Nodes call `remaining(state)` before doing expensive work and
+degrade — fewer retries, smaller searches, skipped evaluation — when the
+budget is short. Every degradation is reported back via the `degradations`
+state key so the caller can see what was traded away.
+
+Checking the budget up front does not bound a call that then runs for the
+client's full timeout, so LLM calls go through `call_within(state, ...)`,
+which stops waiting at the deadline and raises DeadlineExceeded. The call
+itself is abandoned, not killed: it finishes in the background, and the
+admission slot it ran under stays taken until it does (`on_abandon`).
+"""
+import contextvars
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+DEFAULT_BUDGET_S = float(os.getenv("RECOMMEND_BUDGET_S", "30"))
+
+# Degradation labels surfaced in the response
+EXTRACT_CACHED      = "extract_cached"        # extraction served from the in-process cache
+EXTRACT_FAST_PATH   = "extract_fast_path"     # extraction used the local keyword path, no LLM
+EXTRACT_NO_RETRY    = "extract_no_retry"      # LLM retries skipped for lack of time
+EXTRACT_TIMED_OUT   = "extract_timed_out"     # LLM call outlived the deadline and was abandoned
+SEARCH_REDUCED      = "search_reduced"        # smaller top_k / nprobe
+EVALUATOR_SKIPPED   = "evaluator_skipped"     # rerank_score ordering instead of LLM scoring
+
+DEADLINE_WORKERS = int(os.getenv("RECOMMEND_DEADLINE_WORKERS", "32"))
+
+_pool = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix="deadline")
+
+
+# Set by admission.StageLimiter slots: receives the future of a call abandoned
+# at the deadline, so the slot is only released once that call really ends.
+on_abandon: contextvars.ContextVar = contextvars.ContextVar("on_abandon", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request deadline passed before a call returned."""
+
+
+def deadline_from_budget(budget_s: float | None = None) -> float:
+    """Return an absolute monotonic deadline `budget_s` seconds from now."""
+    if budget_s is None:
+        budget_s = DEFAULT_BUDGET_S
+    return time.monotonic() + max(0.0, float(budget_s))
+
+
+def remaining(state: dict) -> float:
+    """Seconds left before the request deadline (inf when no deadline is set)."""
+    deadline_at = state.get("deadline_at")
+    if not deadline_at:
+        return math.inf
+    return deadline_at - time.monotonic()
+
+
+def call_within(state: dict, fn, *args, **kwargs):
+    """fn(*args, **kwargs), but give up waiting once the request deadline passes."""
+    left = remaining(state)
+    if left == math.inf:
+        return fn(*args, **kwargs)
+    if left <= 0:
+        raise DeadlineExceeded("no budget left")
+    ctx = contextvars.copy_context()   # keep the caller's trace span / tracing policy
+    future = _pool.submit(ctx.run, fn, *args, **kwargs)
+    try:
+        return future.result(timeout=left)
+    except FuturesTimeout:
+        future.cancel()
+        hook = on_abandon.get()
+        if hook is not None:
+            hook(future)
+        raise DeadlineExceeded(f"call still running after {left:.1f}s") from None
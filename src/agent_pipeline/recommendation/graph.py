@@ -15,6 +15,11 @@ from nodes.accord_extractor import accord_extracting_agent
 from nodes.mood_extractor import mood_extracting_agent
 from nodes.search import search_node
 from nodes.evaluator import evaluate_node
+from admission import admitted
+from deadline import SEARCH_REDUCED, EVALUATOR_SKIPPED
+from metrics import timed_node
+from result_cache import RESULT_CACHE, signature
+from tracing import traced
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,13 +32,49 @@ def extract_mood(merged: dict):
     input_state = {k: merged[k] for k in RecommendationInputState.__annotations__ if k in merged}
     state = {k: merged[k] for k in RecommendationWorkingState.__annotations__ if k in merged}
     result = mood_extracting_agent(input_state, state)
-    return {"extracted_moods": result["extracted_moods"]}
+    return {"extracted_moods": result["extracted_moods"], "degradations": result.get("degradations", [])}
 
 def extract_accord(merged: dict):
     input_state = {k: merged[k] for k in RecommendationInputState.__annotations__ if k in merged}
     state = {k: merged[k] for k in RecommendationWorkingState.__annotations__ if k in merged}
     result = accord_extracting_agent(input_state, state)
-    return {"extracted_accords": result["extracted_accords"]}
+    return {"extracted_accords": result["extracted_accords"], "degradations": result.get("degradations", [])}
+
+
+def _signature(state: dict) -> tuple:
+    return signature(
+        state.get("extracted_moods", []),
+        state.get("extracted_accords", []),
+        state.get("preferred_gender", ""),
+    )
+
+
+def cache_lookup(state: dict):
+    """Serve the final recommendations for a known mood/accord signature."""
+    if not (state.get("extracted_moods") or state.get("extracted_accords")):
+        return {"cache_hit": False}
+    cached = RESULT_CACHE.get(_signature(state))
+    if cached is None:
+        return {"cache_hit": False}
+    logger.info("[cache] hit for %s", _signature(state))
+    return {"cache_hit": True, "recommendations": cached}
+
+
+def cache_store(state: dict):
+    """Remember full-quality results; degraded ones would poison the cache."""
+    degraded = {SEARCH_REDUCED, EVALUATOR_SKIPPED} & set(state.get("degradations", []))
+    if not degraded and (state.get("extracted_moods") or state.get("extracted_accords")):
+        RESULT_CACHE.put(_signature(state), state.get("recommendations", []))
+    return {}
+
+
+def _after_cache_lookup(state: dict) -> str:
+    return "hit" if state.get("cache_hit") else "miss"
+
+
+def _instrument(name: str, node, stage: str):
+    """Wrap a node with latency metrics, a trace span and its admission-control stage."""
+    return timed_node(name)(traced(name)(admitted(stage)(node)))
 
 
 def build_graph():
@@ -43,16 +84,25 @@ def build_graph():
         output=RecommendationOutputState,
     )
 
-    graph.add_node("extract_mood", extract_mood)
-    graph.add_node("extract_accord", extract_accord)
-    graph.add_node("search", search_node)
-    graph.add_node("evaluator", evaluate_node)
+    graph.add_node("extract_mood", _instrument("extract_mood", extract_mood, "llm"))
+    graph.add_node("extract_accord", _instrument("extract_accord", extract_accord, "llm"))
+    graph.add_node("search", _instrument("search", search_node, "search"))
+    graph.add_node("evaluator", _instrument("evaluator", evaluate_node, "evaluator"))
+
+    graph.add_node("cache_lookup", cache_lookup)
+    graph.add_node("cache_store", cache_store)
 
     graph.add_edge(START, "extract_mood")
     graph.add_edge(START, "extract_accord")
-    graph.add_edge("extract_mood", "search")
-    graph.add_edge("extract_accord", "search")
+    graph.add_edge("extract_mood", "cache_lookup")
+    graph.add_edge("extract_accord", "cache_lookup")
+    graph.add_conditional_edges(
+        "cache_lookup",
+        _after_cache_lookup,
+        {"hit": END, "miss": "search"},
+    )
     graph.add_edge("search", "evaluator")
-    graph.add_edge("evaluator", END)
+    graph.add_edge("evaluator", "cache_store")
+    graph.add_edge("cache_store", END)
 
     return graph.compile()
@@ -0,0 +1,276 @@
+"""
+Latency and LLM token instrumentation for the recommendation pipeline.
+
+Two sinks are fed from the same measurements:
+  - process-wide Prometheus-style histograms (rendered by REGISTRY.render())
+  - a per-request RequestTimings collector, bound to a ContextVar, which the
+    API turns into the optional `timings` SSE event
+
+Graph nodes are wrapped with `timed_node(name)`, MCP tool calls with
+`mcp_timer(tool)`, and LLM responses are passed to `record_llm_usage`.
+"""
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+TOKEN_BUCKETS   = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+# ── Metric types ──────────────────────────────────────────────────────────────
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed label set."""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name    = name
+        self.help    = help
+        self.labels  = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {count}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, inf)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with a fixed label set."""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name   = name
+        self.help   = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value with a fixed label set."""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name   = name
+        self.help   = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "recommend_request_duration_seconds", "End-to-end /recommend latency.")
+NODE_LATENCY = REGISTRY.histogram(
+    "recommend_node_duration_seconds", "Latency of each recommendation graph node.", ["node"])
+MCP_TOOL_LATENCY = REGISTRY.histogram(
+    "recommend_mcp_tool_duration_seconds", "Latency of each MCP search-server tool call.", ["tool"])
+LLM_TOKENS = REGISTRY.histogram(
+    "recommend_llm_tokens", "LLM tokens per call, by node and direction.", ["node", "kind"],
+    buckets=TOKEN_BUCKETS)
+LLM_TOKENS_TOTAL = REGISTRY.counter(
+    "recommend_llm_tokens_total", "Total LLM tokens, by node and direction.", ["node", "kind"])
+
+
+# ── Per-request collector ─────────────────────────────────────────────────────
+
+class RequestTimings:
+    """Timings and token counts for a single /recommend request."""
+
+    def __init__(self):
+        self.started   = time.perf_counter()
+        self.nodes:     dict[str, float] = {}
+        self.mcp_tools: dict[str, float] = {}
+        self.tokens:    dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add_node(self, node: str, seconds: float) -> None:
+        with self._lock:
+            self.nodes[node] = self.nodes.get(node, 0.0) + seconds
+
+    def add_mcp_tool(self, tool: str, seconds: float) -> None:
+        with self._lock:
+            self.mcp_tools[tool] = self.mcp_tools.get(tool, 0.0) + seconds
+
+    def add_tokens(self, node: str, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            counts = self.tokens.setdefault(node, {"input": 0, "output": 0})
+            counts["input"]  += input_tokens
+            counts["output"] += output_tokens
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "total_s":   round(self.elapsed(), 4),
+                "nodes":     {k: round(v, 4) for k, v in self.nodes.items()},
+                "mcp_tools": {k: round(v, 4) for k, v in self.mcp_tools.items()},
+                "tokens":    {k: dict(v) for k, v in self.tokens.items()},
+            }
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    """Bind a fresh collector to the current context (call once per request)."""
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def finish_request(timings: RequestTimings) -> None:
+    REQUEST_LATENCY.observe(timings.elapsed())
+
+
+def current_request() -> RequestTimings | None:
+    return _current.get()
+
+
+# ── Instrumentation helpers ───────────────────────────────────────────────────
+
+def _observe_node(node: str, seconds: float) -> None:
+    NODE_LATENCY.observe(seconds, node=node)
+    timings = _current.get()
+    if timings is not None:
+        timings.add_node(node, seconds)
+
+
+def timed_node(node: str):
+    """Decorator recording the latency of a (sync or async) graph node."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _observe_node(node, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _observe_node(node, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def mcp_timer(tool: str):
+    """Time an MCP tool call: `with mcp_timer("embed_query"): await tool.ainvoke(...)`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        MCP_TOOL_LATENCY.observe(seconds, tool=tool)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_mcp_tool(tool, seconds)
+
+
+def record_llm_usage(node: str, messages) -> None:
+    """Account the `usage_metadata` of one LLM message or a list of agent messages."""
+    if not isinstance(messages, (list, tuple)):
+        messages = [messages]
+    input_tokens = output_tokens = 0
+    for msg in messages:
+        usage = getattr(msg, "usage_metadata", None) or {}
+        input_tokens  += usage.get("input_tokens", 0) or 0
+        output_tokens += usage.get("output_tokens", 0) or 0
+    if not (input_tokens or output_tokens):
+        return
+
+    for kind, value in (("input", input_tokens), ("output", output_tokens)):
+        LLM_TOKENS.observe(value, node=node, kind=kind)
+        LLM_TOKENS_TOTAL.inc(value, node=node, kind=kind)
+    timings = _current.get()
+    if timings is not None:
+        timings.add_tokens(node, input_tokens, output_tokens)
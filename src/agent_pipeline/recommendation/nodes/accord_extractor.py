@@ -1,25 +1,34 @@
-import base64
+import functools
 import json
 import logging
-from io import BytesIO
 from pathlib import Path
 
 from dotenv import load_dotenv
 from langchain.agents import create_agent
 from langchain_core.messages import HumanMessage
 from langchain_openrouter import ChatOpenRouter
-from PIL import Image
 
 from states import RecommendationWorkingState
 from schemas import ExtractedList
+from deadline import (remaining, call_within, DeadlineExceeded,
+                      EXTRACT_CACHED, EXTRACT_FAST_PATH, EXTRACT_NO_RETRY, EXTRACT_TIMED_OUT)
+from metrics import record_llm_usage
+from nodes.batch_extract import extract_batch
+from nodes.fast_extract import ExtractionCache, cache_key, fast_extract_accords
 
 load_dotenv(Path(__file__).resolve().parents[4] / ".env")
 
 logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
+MIN_LLM_BUDGET_S = 6.0   # below this, prefer the cache / local fast path over the VLM
 
-llm = ChatOpenRouter(model="qwen/qwen3-vl-235b-a22b-thinking", temperature=0.5)
+_cache = ExtractionCache()
+
+@functools.cache
+def get_llm() -> ChatOpenRouter:
+    """Client is built on first use, not at import (keeps API cold start short)."""
+    return ChatOpenRouter(model="qwen/qwen3-vl-235b-a22b-thinking", temperature=0.5)
 
 SYSTEM_PROMPT = """You are a perfume mood extractor. Your job is to analyze the user's mood description or image and return a list of scent accords.
 Rules:
@@ -30,22 +39,6 @@ Rules:
 """
 
 
-def convert_to_base64(pil_image_path):
-    """
-    Convert PIL images to Base64 encoded strings
-
-    :param pil_image: PIL image
-    :return: Re-sized Base64 string
-    """
-    pil_image = Image.open(pil_image_path)
-    if pil_image.mode in ("RGBA", "P"):
-        pil_image = pil_image.convert("RGB")
-    buffered = BytesIO()
-    pil_image.save(buffered, format="JPEG")
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return img_str
-
-
 def form_user_content(data):
     def prompt_func(data):
         text = data.get("text")
@@ -63,6 +56,22 @@ def form_user_content(data):
 
 
 def accord_extracting_agent(input_state, state: RecommendationWorkingState):
+    degradations = []
+    state["degradations"] = degradations
+    key = cache_key(input_state)
+
+    if remaining(input_state) < MIN_LLM_BUDGET_S:
+        cached = _cache.get(key)
+        if cached is not None:
+            state["extracted_accords"] = cached
+            degradations.append(EXTRACT_CACHED)
+            return state
+        if input_state["input_type"] == "text":
+            state["extracted_accords"] = fast_extract_accords(input_state["mood_input"])
+            degradations.append(EXTRACT_FAST_PATH)
+            logger.info("Accord extraction: budget short — local fast path: %s", state["extracted_accords"])
+            return state
+
     data = {}
     if input_state["input_type"] == "text":
         data["text"] = input_state["mood_input"]
@@ -71,23 +80,48 @@ def accord_extracting_agent(input_state, state: RecommendationWorkingState):
 
 
     agent = create_agent(
-        llm,
+        get_llm(),
         tools=[],
         system_prompt=SYSTEM_PROMPT
     )
 
     messages = form_user_content(data)
     for attempt in range(1, MAX_RETRIES + 1):
-        response = agent.invoke({"messages": messages})
+        try:
+            response = call_within(input_state, agent.invoke, {"messages": messages})
+        except DeadlineExceeded as e:
+            logger.warning("Accord extraction: %s — giving up on the LLM", e)
+            degradations.append(EXTRACT_TIMED_OUT)
+            if input_state["input_type"] == "text":
+                state["extracted_accords"] = fast_extract_accords(input_state["mood_input"])
+                degradations.append(EXTRACT_FAST_PATH)
+            else:
+                state["extracted_accords"] = []
+            break
+        record_llm_usage("extract_accord", response["messages"])
         try:
             validated = ExtractedList(items=response["messages"][-1].content)
             state["extracted_accords"] = validated.items
+            _cache.put(key, validated.items)
             break
         except Exception as e:
             logger.info("Accord extraction attempt %d/%d failed validation: %s", attempt, MAX_RETRIES, e)
+            if attempt < MAX_RETRIES and remaining(input_state) < MIN_LLM_BUDGET_S:
+                logger.warning("Accord extraction: budget short — skipping retries")
+                degradations.append(EXTRACT_NO_RETRY)
+                if input_state["input_type"] == "text":
+                    state["extracted_accords"] = fast_extract_accords(input_state["mood_input"])
+                    degradations.append(EXTRACT_FAST_PATH)
+                else:
+                    state["extracted_accords"] = []
+                break
             if attempt == MAX_RETRIES:
                 logger.error("All accord extraction attempts failed — defaulting to []")
                 state["extracted_accords"] = []
 
     return state
 
+
+def extract_accords_batch(texts: list[str], max_concurrency: int = 8) -> list[tuple[list[str], list[str]]]:
+    """Accords for many text inputs in one batched LLM call — (items, degradations) per text."""
+    return extract_batch("extract_accord", get_llm(), SYSTEM_PROMPT, texts, _cache, fast_extract_accords, max_concurrency)
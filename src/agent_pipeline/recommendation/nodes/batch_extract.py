@@ -0,0 +1,70 @@
+"""
+Batched text extraction for the batch endpoint.
+
+Instead of one agent run per input, all cache misses of a chunk go to the
+model in one `llm.batch(...)` call (the client runs them concurrently).
+Inputs whose output fails validation are re-batched up to MAX_RETRIES times,
+then fall back to the local keyword path.
+"""
+import logging
+from typing import Callable
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from schemas import ExtractedList
+from deadline import EXTRACT_FAST_PATH
+from metrics import record_llm_usage
+from nodes.fast_extract import ExtractionCache
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+
+
+def extract_batch(
+    node: str,
+    llm,
+    system_prompt: str,
+    texts: list[str],
+    cache: ExtractionCache,
+    fallback: Callable[[str], list[str]],
+    max_concurrency: int = 8,
+) -> list[tuple[list[str], list[str]]]:
+    """(items, degradations) for each text, in input order."""
+    results: list = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        cached = cache.get(("text", text))
+        if cached is not None:
+            results[i] = (cached, [])
+        else:
+            pending.append(i)
+
+    system = SystemMessage(content=system_prompt)
+    for attempt in range(1, MAX_RETRIES + 1):
+        if not pending:
+            break
+        responses = llm.batch(
+            [[system, HumanMessage(content=[{"type": "text", "text": texts[i]}])] for i in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        failed = []
+        for i, response in zip(pending, responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                record_llm_usage(node, response)
+                items = ExtractedList(items=response.content).items
+            except Exception as e:
+                logger.info("%s batch attempt %d/%d failed for input %d: %s", node, attempt, MAX_RETRIES, i, e)
+                failed.append(i)
+                continue
+            cache.put(("text", texts[i]), items)
+            results[i] = (items, [])
+        pending = failed
+
+    for i in pending:
+        logger.warning("%s: all batch attempts failed for input %d — local fast path", node, i)
+        results[i] = (fallback(texts[i]), [EXTRACT_FAST_PATH])
+    return results
@@ -6,6 +6,7 @@ The agent uses three tools in sequence:
   2. normalize_scores     — normalise both llm_score and rerank_score to [0,1]
   3. rerank_candidates    — combine 70% LLM + 30% rerank, return top-5
 """
+import functools
 import json
 import logging
 import re
@@ -18,48 +19,64 @@ from langchain_core.messages import HumanMessage
 from langchain_openrouter import ChatOpenRouter
 
 from schemas import RecommendedPerfume, ScoredPerfume
+from deadline import remaining, call_within, DeadlineExceeded, EVALUATOR_SKIPPED
+from metrics import record_llm_usage
 
 load_dotenv(Path(__file__).resolve().parents[4] / ".env")
 
 logger = logging.getLogger(__name__)
 
-llm = ChatOpenRouter(model="google/gemma-3-4b-it:free", temperature=0)
+@functools.cache
+def get_llm() -> ChatOpenRouter:
+    """Client is built on first use, not at import (keeps API cold start short)."""
+    return ChatOpenRouter(model="google/gemma-3-4b-it:free", temperature=0)
+
+MIN_EVALUATOR_BUDGET_S = 5.0   # below this, skip the LLM and order by rerank_score
+TOP_N = 5
 
 SCORER_SYSTEM = """\
 You are a perfume expert. Score each candidate 0-10 on how well its accords match \
 the user's mood. Return ONLY a JSON array of numbers in the same order. No extra text."""
 
 
-# ── Tools ──────────────────────────────────────────────────────────────────────
+# ── Scoring ────────────────────────────────────────────────────────────────────
 
-@tool
-def score_perfumes(candidates_json: str, moods: str, accords: str) -> str:
-    """
-    Ask the LLM to score each perfume candidate 0-10 based on mood/accord alignment.
-    candidates_json: JSON array of candidate dicts (must have 'name','brand','main_accords').
-    moods:   comma-separated extracted moods.
-    accords: comma-separated extracted accords.
-    Returns a JSON array of float scores in the same order.
-    """
-    candidates = json.loads(candidates_json)
+def score_candidates(candidates: list, moods: str, accords: str) -> list[float]:
+    """LLM score 0-10 per candidate for mood/accord alignment, in input order
+    (5.0 for every candidate if the reply can't be parsed)."""
     lines = [f"User mood: {moods}", f"Scent accords: {accords}", "", "Perfume candidates:"]
     for i, c in enumerate(candidates, 1):
         acc = ", ".join(c.get("main_accords", [])) or "unknown"
         lines.append(f"{i}. \"{c['name']}\" by {c.get('brand','?')} — accords: {acc}")
     lines += ["", f"Return a JSON array of {len(candidates)} scores (0-10)."]
 
-    response = llm.invoke([
+    response = get_llm().invoke([
         HumanMessage(content=SCORER_SYSTEM + "\n\n" + "\n".join(lines))
     ])
+    record_llm_usage("evaluator", response)
     text = response.content
     match = re.search(r"\[[\d\s.,]+\]", text)
     if match:
         scores = json.loads(match.group())
         if len(scores) == len(candidates):
-            return json.dumps([float(s) for s in scores])
+            return [float(s) for s in scores]
 
     logger.warning("[evaluator] score parse failed, defaulting to 5.0")
-    return json.dumps([5.0] * len(candidates))
+    return [5.0] * len(candidates)
+
+
+# ── Tools ──────────────────────────────────────────────────────────────────────
+
+@tool
+def score_perfumes(candidates_json: str, moods: str, accords: str) -> str:
+    """
+    Ask the LLM to score each perfume candidate 0-10 based on mood/accord alignment.
+    candidates_json: JSON array of candidate dicts (must have 'name','brand','main_accords').
+    moods:   comma-separated extracted moods.
+    accords: comma-separated extracted accords.
+    Returns a JSON array of float scores in the same order.
+    """
+    return json.dumps(score_candidates(json.loads(candidates_json), moods, accords))
 
 
 @tool
@@ -112,6 +129,20 @@ def rerank_candidates(normalized_json: str, candidates_json: str) -> str:
 
 # ── Node ───────────────────────────────────────────────────────────────────────
 
+def _top_by_rerank_score(candidates: list) -> list:
+    """Top-N validated recommendations ordered by the search-stage rerank_score."""
+    ranked = sorted(candidates, key=lambda c: c.get("rerank_score", 0.0), reverse=True)
+    recommendations = []
+    for c in ranked:
+        try:
+            recommendations.append(RecommendedPerfume.model_validate(c).model_dump())
+        except Exception as e:
+            logger.warning("[evaluator] skipping invalid perfume %s: %s", c.get("name", "?"), e)
+        if len(recommendations) == TOP_N:
+            break
+    return recommendations
+
+
 TOOLS = [score_perfumes, normalize_scores, rerank_candidates]
 
 AGENT_SYSTEM = """\
@@ -130,18 +161,33 @@ def evaluate_node(state: dict) -> dict:
     if not candidates:
         return {"reranked": []}
 
+    if remaining(state) < MIN_EVALUATOR_BUDGET_S:
+        logger.warning("[evaluator] budget short — skipping LLM, ordering by rerank_score")
+        return {
+            "recommendations": _top_by_rerank_score(candidates),
+            "degradations": [EVALUATOR_SKIPPED],
+        }
+
     candidates_json = json.dumps(candidates)
     moods_str       = ", ".join(moods)
     accords_str     = ", ".join(accords)
 
-    agent = create_agent(llm, tools=TOOLS, system_prompt=AGENT_SYSTEM)
-    response = agent.invoke({"messages": [HumanMessage(
-        content=(
-            f"candidates_json: {candidates_json}\n"
-            f"moods: {moods_str}\n"
-            f"accords: {accords_str}"
-        )
-    )]})
+    agent = create_agent(get_llm(), tools=TOOLS, system_prompt=AGENT_SYSTEM)
+    try:
+        response = call_within(state, agent.invoke, {"messages": [HumanMessage(
+            content=(
+                f"candidates_json: {candidates_json}\n"
+                f"moods: {moods_str}\n"
+                f"accords: {accords_str}"
+            )
+        )]})
+    except DeadlineExceeded as e:
+        logger.warning("[evaluator] %s — ordering by rerank_score", e)
+        return {
+            "recommendations": _top_by_rerank_score(candidates),
+            "degradations": [EVALUATOR_SKIPPED],
+        }
+    record_llm_usage("evaluator", response["messages"])
 
     # Extract final JSON from last message
     last = response["messages"][-1].content
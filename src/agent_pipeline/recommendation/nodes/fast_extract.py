@@ -0,0 +1,129 @@
+"""
+Fast, LLM-free extraction fallbacks used when the request budget is short.
+
+- ExtractionCache   — small in-process LRU of successful LLM extractions
+- fast_extract_*    — keyword matching against a fixed mood / accord vocabulary
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 1024
+
+MOOD_VOCABULARY = {
+    "romantic", "mysterious", "confident", "nostalgic", "serene", "energetic",
+    "sultry", "sophisticated", "rebellious", "cozy", "ethereal", "playful",
+    "melancholic", "bold", "warm", "fresh", "calm", "dreamy", "elegant",
+    "sensual", "joyful", "happy", "sad", "relaxed", "peaceful", "adventurous",
+    "intimate", "dark", "bright", "cheerful", "moody", "gloomy", "luxurious",
+}
+
+ACCORD_VOCABULARY = {
+    "citrus", "woody", "floral", "white floral", "yellow floral", "fresh",
+    "fresh spicy", "warm spicy", "soft spicy", "sweet", "fruity", "powdery",
+    "aromatic", "amber", "musky", "vanilla", "rose", "leather", "oud", "earthy",
+    "green", "aquatic", "marine", "ozonic", "balsamic", "smoky", "tobacco",
+    "honey", "coffee", "cherry", "coconut", "lactonic", "tropical", "aldehydic",
+    "animalic", "iris", "violet", "lavender", "patchouli", "mossy", "herbal",
+    "salty", "cinnamon", "chocolate", "caramel", "almond", "nutty", "metallic",
+    "tuberose", "rum", "whiskey", "mineral", "soapy", "conifer", "citrusy",
+}
+
+# Scene / feeling words → accords they usually evoke
+ACCORD_ASSOCIATIONS = {
+    "rain":     ["green", "aquatic", "earthy"],
+    "rainy":    ["green", "aquatic", "earthy"],
+    "beach":    ["aquatic", "salty", "coconut"],
+    "sea":      ["marine", "aquatic", "salty"],
+    "ocean":    ["marine", "aquatic", "ozonic"],
+    "forest":   ["woody", "green", "mossy"],
+    "autumn":   ["woody", "warm spicy", "amber"],
+    "winter":   ["amber", "vanilla", "warm spicy"],
+    "spring":   ["floral", "green", "fresh"],
+    "summer":   ["citrus", "fresh", "fruity"],
+    "cozy":     ["vanilla", "amber", "sweet"],
+    "night":    ["amber", "musky", "smoky"],
+    "evening":  ["amber", "musky", "warm spicy"],
+    "garden":   ["floral", "green", "rose"],
+    "fire":     ["smoky", "woody", "warm spicy"],
+    "dessert":  ["sweet", "vanilla", "caramel"],
+    "clean":    ["soapy", "fresh", "musky"],
+}
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "in", "on", "at", "to", "for",
+    "with", "i", "im", "i'm", "me", "my", "we", "our", "you", "your", "it", "its",
+    "is", "am", "are", "was", "be", "feel", "feeling", "like", "want", "something",
+    "some", "very", "really", "just", "that", "this", "so", "as", "by", "from",
+}
+
+MAX_ITEMS = 7
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z][a-z'\-]*", text.lower())
+
+
+def _dedupe(items: list[str]) -> list[str]:
+    seen = set()
+    return [i for i in items if not (i in seen or seen.add(i))][:MAX_ITEMS]
+
+
+def fast_extract_moods(text: str) -> list[str]:
+    """Vocabulary moods found in the text, else its content words."""
+    tokens = _tokens(text)
+    moods = [t for t in tokens if t in MOOD_VOCABULARY]
+    if not moods:
+        moods = [t for t in tokens if t not in _STOPWORDS and len(t) > 2]
+    return _dedupe(moods)
+
+
+def fast_extract_accords(text: str) -> list[str]:
+    """Accords named in the text (incl. two-word accords) plus scene associations."""
+    tokens = _tokens(text)
+    bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    accords = [b for b in bigrams if b in ACCORD_VOCABULARY]
+    accords += [t for t in tokens if t in ACCORD_VOCABULARY]
+    for t in tokens:
+        accords.extend(ACCORD_ASSOCIATIONS.get(t, []))
+    return _dedupe(accords)
+
+
+def cache_key(state: dict) -> tuple:
+    """Extraction cache key of a graph input: an image by the digest the image
+    store computed, never by its URL (inline data URLs run to hundreds of KB)."""
+    if state["input_type"] == "image" and state.get("image_digest"):
+        return ("image", state["image_digest"])
+    return (state["input_type"], state["mood_input"])
+
+
+class ExtractionCache:
+    """Thread-safe LRU keyed on cache_key(); keys are stored as digests."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self._data: OrderedDict = OrderedDict()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(key) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        key = self._digest(key)
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return list(self._data[key])
+
+    def put(self, key, value: list[str]) -> None:
+        if not value:
+            return
+        key = self._digest(key)
+        with self._lock:
+            self._data[key] = list(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
@@ -0,0 +1,99 @@
+"""
+"More results" paging over a session's candidate pool.
+
+Ranks 1–5 are the evaluator's picks. Later ranks are built lazily, a block at
+a time: the pool candidates not yet ranked are LLM-scored (only those without
+a score — earlier candidates are never re-scored) and appended in order of
+
+    final_score = 0.7 * llm_score / 10 + 0.3 * rerank_score
+
+(absolute normalisation, so appending never reorders ranks already served).
+When the pool runs dry the next Milvus page is fetched with the same vector
+and gender filter via `offset`, reranked by accords and scored the same way.
+"""
+import asyncio
+import logging
+
+from admission import STAGES
+from nodes.evaluator import score_candidates
+from nodes.search import NPROBE, TOP_K, embed_query, search_vector
+from schemas import RecommendedPerfume
+from sessions import Session
+
+logger = logging.getLogger(__name__)
+
+MAX_OFFSET        = 200       # deepest rank served
+MAX_MILVUS_OFFSET = 16_000    # Milvus rejects offset + limit > 16384
+
+
+def _final_score(c: dict) -> float:
+    return 0.7 * c["llm_score"] / 10 + 0.3 * c.get("rerank_score", 0.0)
+
+
+async def _next_milvus_page(session: Session) -> list[dict]:
+    if not len(session.query_vector):    # session came from a result-cache hit
+        session.query_vector.extend(await embed_query(session.extracted_moods, session.extracted_accords))
+    async with STAGES["search"].aslot():
+        hits = await search_vector(
+            list(session.query_vector), session.extracted_accords, session.preferred_gender,
+            TOP_K, NPROBE, offset=session.milvus_offset,
+        )
+    session.milvus_offset += TOP_K
+    if session.milvus_offset >= MAX_MILVUS_OFFSET:
+        session.exhausted = True
+    known = {c["perfume_id"] for c in session.candidates} | {c["perfume_id"] for c in session.ranked}
+    fresh = [c for c in hits if c["perfume_id"] not in known]
+    if not hits:
+        session.exhausted = True
+    session.candidates.extend(fresh)
+    logger.info("[paginate] Milvus offset %d → %d new candidates", session.milvus_offset - TOP_K, len(fresh))
+    return fresh
+
+
+async def _extend_ranking(session: Session) -> bool:
+    """Append the next block of ranked candidates; False when nothing is left."""
+    ranked_ids = {c["perfume_id"] for c in session.ranked}
+    block = [c for c in session.candidates if c["perfume_id"] not in ranked_ids]
+    if not block:
+        if session.exhausted:
+            return False
+        block = await _next_milvus_page(session)   # already reranked by accords
+        if not block:
+            return not session.exhausted     # page held only known ids — try the next one
+
+    unscored = [c for c in block if "llm_score" not in c]
+    if unscored:
+        async with STAGES["evaluator"].aslot():
+            scores = await asyncio.to_thread(
+                score_candidates, unscored,
+                ", ".join(session.extracted_moods), ", ".join(session.extracted_accords),
+            )
+        for c, score in zip(unscored, scores):
+            c["llm_score"] = score
+
+    for c in block:
+        c["final_score"] = _final_score(c)
+    session.ranked.extend(sorted(block, key=lambda c: c["final_score"], reverse=True))
+    return True
+
+
+async def page(session: Session, offset: int, limit: int) -> tuple[list[dict], bool]:
+    """Recommendations at ranks [offset, offset + limit) and whether more may follow."""
+    async with session.lock:                 # one pager extends a session at a time
+        if not session.ranked:
+            session.ranked = [dict(r) for r in session.recommendations]
+            # a result-cache hit has no candidate pool: its served picks stand in for the first hits
+            session.milvus_offset = session.milvus_offset or len(session.candidates) or len(session.ranked)
+        while len(session.ranked) < offset + limit:
+            if not await _extend_ranking(session):
+                break
+        window = session.ranked[offset:offset + limit]
+        has_more = len(session.ranked) > offset + limit or not session.exhausted
+
+    recommendations = []
+    for c in window:
+        try:
+            recommendations.append(RecommendedPerfume.model_validate(c).model_dump())
+        except Exception as e:
+            logger.warning("[paginate] skipping invalid perfume %s: %s", c.get("name", "?"), e)
+    return recommendations, has_more
@@ -0,0 +1,90 @@
+"""
+Session refinement ("more like this but fresher").
+
+Reuses a stored session instead of rerunning the graph:
+  1. the tweak text is reduced to delta moods/accords locally (no LLM)
+  2. only the delta is embedded; the query vector becomes a normalised
+     blend of the stored vector and the delta
+  3. one Milvus search with the blended vector; its hits are merged into
+     the stored candidate pool and the pool is reranked by the merged accords
+  4. the LLM evaluator runs only when asked for — by default the pool's
+     rerank_score order is returned
+"""
+import asyncio
+import logging
+import math
+import os
+from array import array
+
+from admission import STAGES
+from nodes.evaluator import _top_by_rerank_score, evaluate_node
+from nodes.fast_extract import _dedupe, fast_extract_accords, fast_extract_moods
+from nodes.search import NPROBE, TOP_K, _rerank_by_extracted_accords, embed_query, search_vector
+from sessions import Session
+
+logger = logging.getLogger(__name__)
+
+DELTA_WEIGHT = float(os.getenv("REFINE_DELTA_WEIGHT", "0.35"))   # share of the tweak in the blended vector
+POOL_SIZE    = int(os.getenv("REFINE_POOL_SIZE", "50"))
+
+
+def _blend(base: list[float], delta: list[float], weight: float) -> list[float]:
+    mixed = [(1 - weight) * b + weight * d for b, d in zip(base, delta)]
+    norm = math.sqrt(sum(x * x for x in mixed)) or 1.0
+    return [x / norm for x in mixed]
+
+
+def _merge_pool(fresh: list[dict], pool: list[dict], weight: float) -> list[dict]:
+    """Fresh hits keep their scores against the blended vector. Pool-only
+    candidates were scored against the old vector; their similarity to the
+    delta is unknown, so it is taken as 0 — (1 - weight) * old score."""
+    merged = {c["perfume_id"]: dict(c) for c in fresh}
+    for c in pool:
+        if c["perfume_id"] not in merged:
+            merged[c["perfume_id"]] = {**c, "search_score": (1 - weight) * c["search_score"]}
+    return list(merged.values())
+
+
+async def refine(session: Session, text: str, evaluate: bool = False) -> Session:
+    """A new Session holding the refined moods/accords, vector, pool and recommendations."""
+    delta_moods   = fast_extract_moods(text)
+    delta_accords = fast_extract_accords(text)
+    moods   = _dedupe(delta_moods + session.extracted_moods)
+    accords = _dedupe(delta_accords + session.extracted_accords)
+
+    async with STAGES["search"].aslot():
+        if len(session.query_vector):
+            base  = list(session.query_vector)
+            delta = await embed_query(delta_moods, delta_accords)
+        else:   # session came from a result-cache hit — no stored vector
+            base, delta = await asyncio.gather(
+                embed_query(session.extracted_moods, session.extracted_accords),
+                embed_query(delta_moods, delta_accords),
+            )
+        vector = _blend(base, delta, DELTA_WEIGHT)
+        fresh  = await search_vector(vector, accords, session.preferred_gender, TOP_K, NPROBE)
+
+    pool = _merge_pool(fresh, session.candidates, DELTA_WEIGHT)
+    pool = _rerank_by_extracted_accords(pool, accords, top_k=POOL_SIZE)
+    logger.info("[refine] +moods %s +accords %s — pool %d (%d fresh)", delta_moods, delta_accords, len(pool), len(fresh))
+
+    if evaluate:
+        async with STAGES["evaluator"].aslot():
+            result = await asyncio.to_thread(evaluate_node, {
+                "candidates": pool[:TOP_K],
+                "extracted_moods": moods,
+                "extracted_accords": accords,
+            })
+        recommendations = result.get("recommendations", [])
+    else:
+        recommendations = _top_by_rerank_score(pool)
+
+    return Session(
+        extracted_moods=moods,
+        extracted_accords=accords,
+        preferred_gender=session.preferred_gender,
+        query_vector=array("f", vector),
+        candidates=pool,
+        recommendations=recommendations,
+        milvus_offset=TOP_K,                 # paging continues the blended-vector search
+    )
@@ -1,55 +1,169 @@
 import asyncio
 import json
 import logging
+import os
 import sys
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 
+import httpx
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
 
 from schemas import CandidatePerfume
+from deadline import remaining, SEARCH_REDUCED
+from metrics import mcp_timer
+from tracing import current_traceparent, start_span
 
 _MCP_SERVER = str(Path(__file__).resolve().parent / "search_mcp_server.py")
 
 logger = logging.getLogger(__name__)
 
-# ── Persistent MCP client (created once, reused across requests) ──────────────
-
-_mcp_client: MultiServerMCPClient | None = None
-_mcp_tools: dict | None = None
-_mcp_lock = asyncio.Lock()
-
-
-async def _get_mcp_tools() -> dict:
-    """Return the cached tool map, initialising the client on first call."""
-    global _mcp_client, _mcp_tools
-    if _mcp_tools is not None:
-        return _mcp_tools
-    async with _mcp_lock:
-        if _mcp_tools is not None:   # re-check after acquiring lock
-            return _mcp_tools
-        logger.info("[search] starting persistent MCP client …")
-        _mcp_client = MultiServerMCPClient({
-            "perfume-search": {
-                "command": sys.executable,
-                "args": [_MCP_SERVER],
-                "transport": "stdio",
-            }
-        })
-        await _mcp_client.__aenter__()
-        tools = await _mcp_client.get_tools()
-        _mcp_tools = {t.name: t for t in tools}
-        logger.info("[search] MCP client ready — tools: %s", list(_mcp_tools))
-    return _mcp_tools
+TOP_K            = 20
+NPROBE           = 16    # IVF clusters probed (collection has nlist=128)
+REDUCED_TOP_K    = 10
+REDUCED_NPROBE   = 4
+MIN_FULL_SEARCH_BUDGET_S = 3.0   # below this, run the reduced search
+
+# ── Persistent MCP sessions (opened once, reused across requests) ─────────────
+#
+# Default: a private stdio subprocess per API worker (one BGE-M3 copy each).
+# With SEARCH_SERVICE_URL set, every worker instead talks to one shared
+# per-host search service (search_mcp_server.py --transport streamable-http),
+# so host RAM scales with model count rather than worker count:
+#     SEARCH_SERVICE_URL=http://127.0.0.1:8765/mcp
+#     SEARCH_SERVICE_URL=unix:///run/perfume-search.sock
+# SEARCH_SERVICE_POOL_SIZE sessions are kept open to the service.
+
+SEARCH_SERVICE_URL = os.getenv("SEARCH_SERVICE_URL", "")
+SEARCH_POOL_SIZE   = int(os.getenv("SEARCH_SERVICE_POOL_SIZE", "4"))
+_SERVER_NAME       = "perfume-search"
+
+
+def _uds_client_factory(socket_path: str):
+    """httpx client factory that sends the MCP HTTP traffic over a Unix socket."""
+    def factory(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=socket_path),
+            headers=headers, timeout=timeout, auth=auth, follow_redirects=True,
+        )
+    return factory
+
+
+def _connection() -> dict:
+    if not SEARCH_SERVICE_URL:
+        return {
+            "command": sys.executable,
+            "args": [_MCP_SERVER],
+            "transport": "stdio",
+            # forward the full env (incl. TRACE_EXPORT_PATH) — stdio defaults to a minimal one
+            "env": dict(os.environ),
+        }
+    if SEARCH_SERVICE_URL.startswith("unix://"):
+        return {
+            "transport": "streamable_http",
+            "url": "http://localhost/mcp",
+            "httpx_client_factory": _uds_client_factory(SEARCH_SERVICE_URL[len("unix://"):]),
+        }
+    return {"transport": "streamable_http", "url": SEARCH_SERVICE_URL}
+
+
+class _SessionPool:
+    """`size` open MCP sessions, each with its own bound tool map.
+
+    Sessions are shared, not borrowed: an MCP ClientSession multiplexes
+    concurrent requests by id, so callers take the next session round-robin
+    and may overlap on it. Several sessions only spread load across
+    connections to a shared service.
+
+    The sessions are entered and exited by one owner task — the MCP transports
+    use anyio cancel scopes, which must be closed by the task that opened them.
+    """
+
+    def __init__(self, connection: dict, size: int):
+        self._connection = connection
+        self._size    = size
+        self._tool_maps: list[dict] = []
+        self._next    = 0
+        self._ready   = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._own_sessions())
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _own_sessions(self) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                client = MultiServerMCPClient({_SERVER_NAME: self._connection})
+                for _ in range(self._size):
+                    session = await stack.enter_async_context(client.session(_SERVER_NAME))
+                    tools = await load_mcp_tools(session)
+                    self._tool_maps.append({t.name: t for t in tools})
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            logger.error("[search] MCP sessions closed: %s", e)
+        finally:
+            self._ready.set()
+
+    def tools(self) -> dict:
+        """Tool map of the next session (round-robin)."""
+        by_name = self._tool_maps[self._next % len(self._tool_maps)]
+        self._next += 1
+        return by_name
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._task is not None:
+            await self._task
+
+
+_pool: _SessionPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def _get_pool() -> _SessionPool:
+    """Return the session pool, (re)opening it on first call or after the connection died."""
+    global _pool
+    if _pool is not None and _pool.alive:
+        return _pool
+    async with _pool_lock:
+        if _pool is not None and _pool.alive:   # re-check after acquiring lock
+            return _pool
+        # a stdio session is a subprocess (and a model copy) — one, shared, is enough per worker
+        size = SEARCH_POOL_SIZE if SEARCH_SERVICE_URL else 1
+        logger.info("[search] opening %d MCP session(s) to %s …", size, SEARCH_SERVICE_URL or "stdio subprocess")
+        pool = _SessionPool(_connection(), size)
+        await pool.start()
+        _pool = pool
+        logger.info("[search] MCP sessions ready")
+    return _pool
+
+
+@asynccontextmanager
+async def mcp_tools():
+    """Tool map (name -> tool) of a pooled MCP session, shared with concurrent callers."""
+    pool = await _get_pool()
+    yield pool.tools()
 
 
 async def close_mcp_client() -> None:
-    """Gracefully shut down the MCP subprocess (call from app lifespan teardown)."""
-    global _mcp_client, _mcp_tools
-    if _mcp_client is not None:
-        await _mcp_client.__aexit__(None, None, None)
-        _mcp_client = None
-        _mcp_tools = None
-        logger.info("[search] MCP client closed")
+    """Close the MCP sessions — and the stdio subprocess, if any (call from app lifespan teardown)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+        logger.info("[search] MCP sessions closed")
 
 
 def _parse_mcp_result(raw):
@@ -96,35 +210,142 @@ def _rerank_by_extracted_accords(candidates: list, extracted_accords: list, top_
     return sorted(candidates, key=lambda x: x["rerank_score"], reverse=True)[:top_k]
 
 
-async def _run_search(extracted_accords: list, extracted_moods: list, state) -> list:
-    by_name = await _get_mcp_tools()
-
-    # Step 1: Embed extracted accords into a query vector
-    raw_vector = await by_name["embed_query"].ainvoke({"extracted_moods": extracted_moods, "extracted_accords": extracted_accords})
-    query_vector = _parse_mcp_result(raw_vector)
-    print(f"[Step 1] query_vector: {len(query_vector)}-dim")
-
-    # Step 2: Search Milvus with the query vector
-    raw_candidates = await by_name["search_milvus"].ainvoke({"query_vector": query_vector, "preferred_gender": ""})
-    candidates_raw = _parse_mcp_result(raw_candidates)
+def _validate_candidates(candidates_raw: list) -> list:
+    if isinstance(candidates_raw, dict):     # a single hit comes back unwrapped
+        candidates_raw = [candidates_raw]
     candidates = []
     for c in candidates_raw:
         try:
             candidates.append(CandidatePerfume.model_validate(c).model_dump())
         except Exception as e:
             logger.warning("[search] skipping invalid candidate %s: %s", c.get("name", "?"), e)
-    state["candidates"] = candidates
-    print(f"[Step 2] candidates: {len(candidates)} results")
+    return candidates
+
+
+async def embed_query(extracted_moods: list, extracted_accords: list) -> list[float]:
+    """1024-dim BGE-M3 query vector for one (moods, accords) pair."""
+    async with mcp_tools() as by_name:
+        with mcp_timer("embed_query"), start_span("mcp.embed_query"):
+            raw_vector = await by_name["embed_query"].ainvoke({
+                "extracted_moods": extracted_moods,
+                "extracted_accords": extracted_accords,
+                "traceparent": current_traceparent(),
+            })
+    return _parse_mcp_result(raw_vector)
+
+
+async def search_vector(
+    query_vector: list[float],
+    extracted_accords: list,
+    preferred_gender: str = "",
+    top_k: int = TOP_K,
+    nprobe: int = NPROBE,
+    offset: int = 0,
+) -> list:
+    """Milvus search for a ready query vector, reranked by the extracted accords.
+    `offset` skips the best hits already fetched (next page)."""
+    async with mcp_tools() as by_name:
+        with mcp_timer("search_milvus"), start_span("mcp.search_milvus", top_k=top_k, nprobe=nprobe, offset=offset):
+            raw_candidates = await by_name["search_milvus"].ainvoke({
+                "query_vector": query_vector,
+                "preferred_gender": preferred_gender,
+                "top_k": top_k,
+                "nprobe": nprobe,
+                "offset": offset,
+                "traceparent": current_traceparent(),
+            })
+    candidates = _validate_candidates(_parse_mcp_result(raw_candidates))
+    logger.info("[search] candidates: %d results", len(candidates))
+    return _rerank_by_extracted_accords(candidates, extracted_accords, top_k=top_k)
+
 
-    # Step 3: Rerank by extracted accords
-    reranked = _rerank_by_extracted_accords(candidates, extracted_accords)
+async def _run_search(
+    extracted_accords: list,
+    extracted_moods: list,
+    state,
+    top_k: int = TOP_K,
+    nprobe: int = NPROBE,
+    preferred_gender: str = "",
+) -> list:
+    # Step 1: Embed extracted accords into a query vector
+    query_vector = await embed_query(extracted_moods, extracted_accords)
+    state["query_vector"] = query_vector
+    logger.info("[search] query_vector: %d-dim", len(query_vector))
+
+    # Step 2: Search Milvus with the query vector, rerank by extracted accords
+    reranked = await search_vector(query_vector, extracted_accords, preferred_gender, top_k, nprobe)
+    state["candidates"] = reranked
     return reranked
 
 
+async def search_batch(
+    queries: list[tuple[list, list]],
+    preferred_gender: str = "",
+    top_k: int = TOP_K,
+    nprobe: int = NPROBE,
+) -> list[list]:
+    """
+    Search many (extracted_moods, extracted_accords) queries that share a gender
+    filter: one batched embedding call and one multi-vector Milvus request.
+    Returns the reranked candidates of each query, in input order.
+    """
+    if not queries:
+        return []
+    async with mcp_tools() as by_name:
+        with mcp_timer("embed_queries"), start_span("mcp.embed_queries", nq=len(queries)):
+            raw_vectors = await by_name["embed_queries"].ainvoke({
+                "extracted_moods": [list(m) for m, _ in queries],
+                "extracted_accords": [list(a) for _, a in queries],
+                "traceparent": current_traceparent(),
+            })
+        vectors = _parse_mcp_result(raw_vectors)["vectors"]
+
+        with mcp_timer("search_milvus_batch"), start_span("mcp.search_milvus_batch", nq=len(queries), top_k=top_k):
+            raw_results = await by_name["search_milvus_batch"].ainvoke({
+                "query_vectors": vectors,
+                "preferred_gender": preferred_gender,
+                "top_k": top_k,
+                "nprobe": nprobe,
+                "traceparent": current_traceparent(),
+            })
+    results = _parse_mcp_result(raw_results)["results"]
+    logger.info("[search] batch of %d queries — %s results", len(queries), [len(r) for r in results])
+    return [
+        _rerank_by_extracted_accords(_validate_candidates(hits), accords, top_k=top_k)
+        for hits, (_, accords) in zip(results, queries)
+    ]
+
+
+async def warm_up() -> None:
+    """Spawn the MCP server, load the collection and run one dummy embed + search,
+    so the first real request does not pay for model load / collection load."""
+    async with mcp_tools() as by_name:       # opens the MCP session(s) / spawns the server
+        with mcp_timer("load_collection"):
+            state = _parse_mcp_result(await by_name["load_collection"].ainvoke({}))
+        logger.info("[search] warmup: collection %s", state)
+        with mcp_timer("embed_query"):
+            query_vector = _parse_mcp_result(await by_name["embed_query"].ainvoke({
+                "extracted_moods": ["calm"],
+                "extracted_accords": ["fresh"],
+            }))
+        with mcp_timer("search_milvus"):
+            await by_name["search_milvus"].ainvoke({"query_vector": query_vector, "top_k": 1, "nprobe": NPROBE})
+    logger.info("[search] warmup: embed + search ok")
+
+
 async def search_node(state):
+    top_k, nprobe, degradations = TOP_K, NPROBE, []
+    if remaining(state) < MIN_FULL_SEARCH_BUDGET_S:
+        top_k, nprobe = REDUCED_TOP_K, REDUCED_NPROBE
+        degradations.append(SEARCH_REDUCED)
+        logger.warning("[search] budget short — top_k=%d nprobe=%d", top_k, nprobe)
+
     candidates = await _run_search(
         extracted_moods=state["extracted_moods"],
         extracted_accords=state["extracted_accords"],
-        state=state
+        state=state,
+        top_k=top_k,
+        nprobe=nprobe,
+        preferred_gender=state.get("preferred_gender", ""),
     )
-    return {"candidates": candidates}
+    return {"candidates": candidates, "query_vector": state.get("query_vector", []), "degradations": degradations}
@@ -1,15 +1,31 @@
 """
 MCP server exposing perfume search tools:
 - load_user_history
-- embed_query
-- search_milvus
+- embed_query / embed_queries
+- search_milvus / search_milvus_batch
+- load_collection
 - rerank_by_past_accords
+
+Transports:
+    python search_mcp_server.py                                   # stdio, one per API worker
+    python search_mcp_server.py --transport streamable-http --port 8765
+    python search_mcp_server.py --transport streamable-http --uds /run/perfume-search.sock
+
+In HTTP mode one server (one BGE-M3 copy) serves every API worker on the host;
+point the workers at it with SEARCH_SERVICE_URL. Blocking tools run in worker
+threads so concurrent calls from different workers don't serialize.
+
+EMBED_BACKEND=onnx-int8 (or onnx) swaps the fp32 torch model for ONNX Runtime
+— export it once with embed_into_milvus/onnx_embedder.py --export.
 """
+import argparse
+import functools
 import re
 import sys
+import threading
 from pathlib import Path
 
-
+import anyio
 from mcp.server.fastmcp import FastMCP
 from pymilvus import MilvusClient
 
@@ -18,10 +34,14 @@ _agent_pipeline = _nodes_dir.parent.parent            # src/agent_pipeline/
 _src = _agent_pipeline.parent                         # src/
 sys.path.insert(0, str(_agent_pipeline))
 sys.path.insert(0, str(_src))
+sys.path.insert(0, str(_nodes_dir.parent))            # recommendation/
 
 from embed_into_milvus.utils import init_bge_embedder, embed_text_bge
+import tracing
+from tracing import start_span
 
 mcp = FastMCP("perfume-search")
+tracing.configure("perfume-search")
 
 MILVUS_URI = "http://localhost:19530"
 MILVUS_TOKEN = "root:Milvus"
@@ -34,47 +54,69 @@ GENDER_MAP = {
     "Unisex": "unisex",
 }
 
-embedder = init_bge_embedder()
+_embedder = None
+_embedder_lock = threading.Lock()
 
 
-@mcp.tool()
-def embed_query(extracted_moods: list[str], extracted_accords: list[str]) -> list[float]:
-    """Embed extracted mood accords into a 1024-dim query vector using BGE-M3."""
-    text_summary = f"Moods: {', '.join(extracted_moods) } Accords: {', '.join(extracted_accords)}"
-    return embed_text_bge(embedder, [text_summary])
+def get_embedder():
+    """BGE-M3 is loaded on the first embed (or warmup), not at import —
+    the server can answer the MCP handshake without waiting on the model."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = init_bge_embedder()
+    return _embedder
 
 
-@mcp.tool()
-def search_milvus(
-    query_vector: list[float],
-    preferred_gender: str = "",
-    top_k: int = 20,
-) -> list[dict]:
-    """
-    Search perfume_collection in Milvus using the query vector.
-    Filters by preferred_gender (also includes unisex). Returns top_k candidates.
-    """
-    client = MilvusClient(uri=MILVUS_URI, token=MILVUS_TOKEN)
-    client.using_database(DB_NAME)
+_milvus: MilvusClient | None = None
+_milvus_lock = threading.Lock()
+
 
+def get_milvus() -> MilvusClient:
+    """One shared Milvus connection for all tool calls."""
+    global _milvus
+    if _milvus is None:
+        with _milvus_lock:
+            if _milvus is None:
+                client = MilvusClient(uri=MILVUS_URI, token=MILVUS_TOKEN)
+                client.using_database(DB_NAME)
+                _milvus = client
+    return _milvus
+
+
+def _in_thread(fn):
+    """Run a blocking tool in a worker thread, keeping its signature for FastMCP."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+
+OUTPUT_FIELDS = ["id", "name", "brand", "description", "url", "gender", "main_accords"]
+
+
+def _query_summary(extracted_moods: list[str], extracted_accords: list[str]) -> str:
+    return f"Moods: {', '.join(extracted_moods) } Accords: {', '.join(extracted_accords)}"
+
+
+def _search_args(preferred_gender: str, nprobe: int, offset: int = 0) -> tuple[str, dict]:
     filter_expr = ""
     if preferred_gender:
         gender_val = preferred_gender
         filter_expr = f'gender == "{gender_val}" or gender == "unisex"'
 
-    results = client.search(
-        collection_name=COLLECTION_NAME,
-        data=[query_vector],
-        anns_field="moods_embedding",
-        search_params={"metric_type": "COSINE"},
-        limit=top_k,
-        filter=filter_expr or None,
-        output_fields=["id", "name", "brand", "description", "url", "gender", "main_accords"],
-    )
-
-    candidates = []
-    for hit in results[0]:
-        candidates.append({
+    search_params = {"metric_type": "COSINE"}
+    if nprobe > 0:
+        search_params["params"] = {"nprobe": nprobe}
+    if offset > 0:
+        search_params["offset"] = offset      # skip the hits already returned (paging)
+    return filter_expr, search_params
+
+
+def _serialize_hits(hits) -> list[dict]:
+    return [
+        {
             "perfume_id": hit["id"],
             "name": hit["entity"]["name"],
             "brand": hit["entity"]["brand"],
@@ -84,9 +126,123 @@ def search_milvus(
             "main_accords": [a.strip() for a in hit["entity"]["main_accords"].split(",")],
             "search_score": hit["distance"],
             "rerank_score": 0.0,
-        })
+        }
+        for hit in hits
+    ]
+
+
+@mcp.tool()
+@_in_thread
+def embed_query(
+    extracted_moods: list[str],
+    extracted_accords: list[str],
+    traceparent: str = "",
+) -> list[float]:
+    """Embed extracted mood accords into a 1024-dim query vector using BGE-M3."""
+    with start_span("embed_query", traceparent=traceparent):
+        text_summary = _query_summary(extracted_moods, extracted_accords)
+        with start_span("embedding", model="BAAI/bge-m3"):
+            return embed_text_bge(get_embedder(), [text_summary])
+
+
+@mcp.tool()
+@_in_thread
+def embed_queries(
+    extracted_moods: list[list[str]],
+    extracted_accords: list[list[str]],
+    traceparent: str = "",
+) -> dict:
+    """
+    Batched embed_query: one BGE-M3 forward pass for many (moods, accords) pairs.
+    Returns {"vectors": [[float, ...], ...]} in input order.
+    """
+    with start_span("embed_queries", traceparent=traceparent, nq=len(extracted_moods)):
+        summaries = [_query_summary(m, a) for m, a in zip(extracted_moods, extracted_accords)]
+        with start_span("embedding", model="BAAI/bge-m3"):
+            return {"vectors": get_embedder().embed_documents(summaries)}
+
+
+@mcp.tool()
+@_in_thread
+def search_milvus(
+    query_vector: list[float],
+    preferred_gender: str = "",
+    top_k: int = 20,
+    nprobe: int = 0,
+    traceparent: str = "",
+    offset: int = 0,
+) -> list[dict]:
+    """
+    Search perfume_collection in Milvus using the query vector.
+    Filters by preferred_gender (also includes unisex). Returns top_k candidates.
+    nprobe > 0 sets the number of IVF clusters probed (0 = server default).
+    offset > 0 skips that many best hits — the next page of the same search.
+    """
+    with start_span("search_milvus", traceparent=traceparent, top_k=top_k, nprobe=nprobe, offset=offset):
+        with start_span("milvus.connect"):
+            client = get_milvus()
+
+        filter_expr, search_params = _search_args(preferred_gender, nprobe, offset)
+
+        with start_span("milvus.search", collection=COLLECTION_NAME):
+            results = client.search(
+                collection_name=COLLECTION_NAME,
+                data=[query_vector],
+                anns_field="moods_embedding",
+                search_params=search_params,
+                limit=top_k,
+                filter=filter_expr or None,
+                output_fields=OUTPUT_FIELDS,
+            )
 
-    return candidates
+        with start_span("serialize") as span:
+            candidates = _serialize_hits(results[0])
+            if span is not None:
+                span.set("results", len(candidates))
+
+        return candidates
+
+
+@mcp.tool()
+@_in_thread
+def search_milvus_batch(
+    query_vectors: list[list[float]],
+    preferred_gender: str = "",
+    top_k: int = 20,
+    nprobe: int = 0,
+    traceparent: str = "",
+) -> dict:
+    """
+    Batched search_milvus: one multi-vector Milvus request (nq = len(query_vectors))
+    sharing one gender filter. Returns {"results": [[candidate, ...], ...]} in input order.
+    """
+    with start_span("search_milvus_batch", traceparent=traceparent, nq=len(query_vectors), top_k=top_k):
+        client = get_milvus()
+        filter_expr, search_params = _search_args(preferred_gender, nprobe)
+
+        with start_span("milvus.search", collection=COLLECTION_NAME, nq=len(query_vectors)):
+            results = client.search(
+                collection_name=COLLECTION_NAME,
+                data=query_vectors,
+                anns_field="moods_embedding",
+                search_params=search_params,
+                limit=top_k,
+                filter=filter_expr or None,
+                output_fields=OUTPUT_FIELDS,
+            )
+
+        with start_span("serialize"):
+            return {"results": [_serialize_hits(hits) for hits in results]}
+
+
+@mcp.tool()
+@_in_thread
+def load_collection(traceparent: str = "") -> str:
+    """Load perfume_collection into Milvus memory (no-op if already loaded); returns the load state."""
+    with start_span("load_collection", traceparent=traceparent, collection=COLLECTION_NAME):
+        client = get_milvus()
+        client.load_collection(COLLECTION_NAME)
+        return str(client.get_load_state(COLLECTION_NAME)["state"])
 
 
 @mcp.tool()
@@ -124,5 +280,27 @@ def extract_image_from_url(url: str) -> str:
     return f"https://www.fragrantica.com/mdimg/perfume-social-cards/en-p_c_{perfume_id}.jpeg"
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Perfume search MCP server")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--uds", help="Serve HTTP on this Unix socket instead of host:port")
+    parser.add_argument("--preload", action="store_true", help="Load BGE-M3 before accepting connections")
+    args = parser.parse_args()
+
+    if args.preload:
+        get_embedder()
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+    elif args.uds:
+        import uvicorn
+        uvicorn.run(mcp.streamable_http_app(), uds=args.uds, log_level="warning")
+    else:
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        mcp.run(transport="streamable-http")
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    main()
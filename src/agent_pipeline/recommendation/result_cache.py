@@ -0,0 +1,91 @@
+"""
+Post-extraction result cache.
+
+Everything after extraction (embedding, Milvus search, reranking, evaluation)
+depends only on the extracted moods/accords and the gender filter, so
+different raw inputs that reduce to the same signature can reuse one result.
+
+Entries are tagged with the collection version stamp written by the
+ingestion load stage; a bumped version invalidates every older entry.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))   # src/agent_pipeline/
+
+from embed_into_milvus.pipeline.version import VERSION_PATH, read_collection_version
+
+CACHE_SIZE  = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "3600"))
+
+
+def _canonical(items: list[str]) -> tuple:
+    return tuple(sorted({" ".join(str(i).lower().split()) for i in items if str(i).strip()}))
+
+
+def signature(moods: list[str], accords: list[str], gender: str = "") -> tuple:
+    """Order/case/whitespace-insensitive cache key."""
+    return _canonical(moods), _canonical(accords), (gender or "").strip().lower()
+
+
+class ResultCache:
+    """Thread-safe LRU + TTL cache of final recommendations, version-stamped."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl_s: float = CACHE_TTL_S):
+        self._data: OrderedDict = OrderedDict()   # key -> (version, expires_at, recommendations)
+        self._hits: dict[tuple, int] = {}
+        self._maxsize = maxsize
+        self._ttl_s   = ttl_s
+        self._lock    = threading.Lock()
+        self._version = ""
+        self._version_mtime = None
+
+    def _current_version(self) -> str:
+        # re-read the stamp only when the file changed
+        try:
+            mtime = VERSION_PATH.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._version_mtime:
+            self._version_mtime = mtime
+            self._version = read_collection_version()
+        return self._version
+
+    def get(self, key: tuple) -> list | None:
+        version = self._current_version()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            entry_version, expires_at, recommendations = entry
+            if entry_version != version or expires_at < time.monotonic():
+                del self._data[key]
+                self._hits.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            self._hits[key] = self._hits.get(key, 0) + 1
+            return [dict(r) for r in recommendations]
+
+    def put(self, key: tuple, recommendations: list) -> None:
+        if not recommendations:
+            return
+        version = self._current_version()
+        with self._lock:
+            self._data[key] = (version, time.monotonic() + self._ttl_s, [dict(r) for r in recommendations])
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._hits.pop(evicted, None)
+
+    def most_frequent(self, n: int) -> list[tuple]:
+        """The n signatures with the most hits (most recently inserted first on ties)."""
+        with self._lock:
+            keys = list(reversed(self._data))
+            return sorted(keys, key=lambda k: self._hits.get(k, 0), reverse=True)[:n]
+
+
+RESULT_CACHE = ResultCache()
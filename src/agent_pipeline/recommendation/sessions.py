@@ -0,0 +1,120 @@
+"""
+Refinement sessions.
+
+After a /recommend run the API keeps what a follow-up tweak needs — the
+extracted moods/accords, the query vector and the candidate pool — under a
+random session id returned on the result event. A refinement builds on that
+state and stores its outcome under a *new* id; paging appends to the session
+in place, so coalesced /recommend requests each get their own copy().
+
+Sessions live in process memory: an LRU bounded by both entry count and an
+estimate of bytes held, with a TTL.
+
+    SESSION_TTL_S, SESSION_MAX_ENTRIES, SESSION_MAX_BYTES
+"""
+import asyncio
+import dataclasses
+import json
+import os
+import secrets
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+SESSION_TTL_S       = float(os.getenv("SESSION_TTL_S", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_BYTES   = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+@dataclass
+class Session:
+    extracted_moods:   list[str]
+    extracted_accords: list[str]
+    preferred_gender:  str = ""
+    query_vector:      array = field(default_factory=lambda: array("f"))   # float32 — 4 KB per vector
+    candidates:        list[dict] = field(default_factory=list)            # the pool refinements rerank
+    recommendations:   list[dict] = field(default_factory=list)
+    # "more results" paging — ranked grows as pages are scored; see nodes/paginate.py
+    ranked:            list[dict] = field(default_factory=list)
+    milvus_offset:     int = 0                  # Milvus hits fetched so far
+    exhausted:         bool = False             # Milvus has no further hits
+    lock:              asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    def copy(self) -> "Session":
+        """An independent session with the same state (own lists, own lock)."""
+        return dataclasses.replace(
+            self,
+            extracted_moods=list(self.extracted_moods), extracted_accords=list(self.extracted_accords),
+            query_vector=array("f", self.query_vector), candidates=list(self.candidates),
+            recommendations=list(self.recommendations), ranked=list(self.ranked),
+            lock=asyncio.Lock(),
+        )
+
+    def nbytes(self) -> int:
+        """Rough memory footprint, used for the store's byte cap."""
+        return (
+            self.query_vector.itemsize * len(self.query_vector)
+            + len(json.dumps(self.candidates)) + len(json.dumps(self.recommendations))
+            + len(json.dumps(self.ranked))
+            + 64 * (len(self.extracted_moods) + len(self.extracted_accords))
+        )
+
+
+class SessionStore:
+    """Thread-safe LRU + TTL store of Sessions, capped by count and bytes."""
+
+    def __init__(self, ttl_s: float = SESSION_TTL_S, max_entries: int = SESSION_MAX_ENTRIES,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self._data: OrderedDict = OrderedDict()   # id -> (expires_at, nbytes, Session)
+        self._ttl_s       = ttl_s
+        self._max_entries = max_entries
+        self._max_bytes   = max_bytes
+        self._bytes       = 0
+        self._lock        = threading.Lock()
+
+    def put(self, session: Session) -> str:
+        session_id = secrets.token_urlsafe(16)
+        size = session.nbytes()
+        with self._lock:
+            self._data[session_id] = (time.monotonic() + self._ttl_s, size, session)
+            self._bytes += size
+            while self._data and (len(self._data) > self._max_entries or self._bytes > self._max_bytes):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+        return session_id
+
+    def resize(self, session_id: str) -> None:
+        """Re-account a session that grew in place (paging appends to its pool)."""
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return
+            expires_at, size, session = entry
+            new_size = session.nbytes()
+            self._data[session_id] = (expires_at, new_size, session)
+            self._bytes += new_size - size
+            while len(self._data) > 1 and self._bytes > self._max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get(self, session_id: str) -> Session | None:
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            expires_at, size, session = entry
+            if expires_at < time.monotonic():
+                del self._data[session_id]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(session_id)
+            return session
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes}
+
+
+SESSIONS = SessionStore()
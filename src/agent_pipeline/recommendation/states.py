@@ -1,4 +1,5 @@
-from typing import TypedDict, List
+import operator
+from typing import Annotated, TypedDict, List
 
 
 # ---------------------------------------------------------------------------
@@ -8,6 +9,9 @@ from typing import TypedDict, List
 class RecommendationInputState(TypedDict):
     input_type: str          # "text" | "image"
     mood_input: str          # free-text mood description OR path to image file
+    image_digest: str        # sha256 of the stored image — extraction cache key (optional)
+    deadline_at: float       # time.monotonic() deadline for the whole request (optional)
+    preferred_gender: str    # "men" | "women" | "" — search filter (optional)
 
 
 # ---------------------------------------------------------------------------
@@ -29,18 +33,29 @@ class RecommendationWorkingState(TypedDict):
     # --- from input ---
     input_type: str
     mood_input: str
+    image_digest: str
+    deadline_at: float
+    preferred_gender: str
 
     # --- after mood extraction ---
     extracted_accords: List[str]
     extracted_moods: List[str]
 
+    # --- post-extraction result cache ---
+    cache_hit: bool
+    recommendations: List[dict]
+
     # --- after Milvus search ---
+    query_vector: List[float]      # BGE-M3 embedding of the extracted moods/accords
     candidates: List[dict]         # top-20 raw results from Milvus
 
     # --- retry control ---
     retry_count: int
     user_intent_summary: str
 
+    # --- latency budget ---
+    degradations: Annotated[List[str], operator.add]   # appended by any node that degraded
+
 
 # ---------------------------------------------------------------------------
 # Output — what the graph returns to the caller
@@ -48,3 +63,4 @@ class RecommendationWorkingState(TypedDict):
 
 class RecommendationOutputState(TypedDict):
     recommendations: List[RecommendedPerfume]
+    degradations: List[str]
@@ -0,0 +1,213 @@
+"""
+Minimal span tracing that crosses the MCP stdio boundary.
+
+The API process opens a root span per request and a child span per graph
+node and MCP tool call. The current span's W3C `traceparent` is passed as an
+extra tool argument, so spans recorded inside search_mcp_server.py
+(embedding, Milvus I/O, serialization) join the same trace.
+
+Finished spans go to the configured exporter:
+  - JsonFileExporter  — one OTLP/JSON `resourceSpans` document per line,
+                        shared by both processes (TRACE_EXPORT_PATH)
+  - InMemoryExporter  — keeps spans in a list, for tests
+With no exporter configured every call is a cheap no-op.
+"""
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SCOPE_NAME = "perfume-recommender"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: str = ""):
+        self.trace_id       = trace_id
+        self.span_id        = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.name           = name
+        self.start_ns       = time.time_ns()
+        self.end_ns         = 0
+        self.attributes: dict = {}
+        self.error          = ""
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_s(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        span = {
+            "traceId":           self.trace_id,
+            "spanId":            self.span_id,
+            "name":              self.name,
+            "kind":              1,   # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano":   str(self.end_ns),
+            "attributes":        [{"key": k, "value": value(v)} for k, v in self.attributes.items()],
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.error:
+            span["status"] = {"code": 2, "message": self.error}   # STATUS_CODE_ERROR
+        return span
+
+
+# ── Exporters ─────────────────────────────────────────────────────────────────
+
+class InMemoryExporter:
+    """Collects finished spans in memory (tests)."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span, service: str) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def by_name(self, name: str) -> list[Span]:
+        with self._lock:
+            return [s for s in self.spans if s.name == name]
+
+
+class JsonFileExporter:
+    """Appends one OTLP/JSON document per span; safe to share between processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, span: Span, service: str) -> None:
+        doc = {"resourceSpans": [{
+            "resource":   {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [span.to_otlp()]}],
+        }]}
+        line = (json.dumps(doc) + "\n").encode("utf-8")
+        # single O_APPEND write keeps lines from both processes intact
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def read_spans(path: str) -> list[dict]:
+    """Flatten a JsonFileExporter file into a list of OTLP span dicts."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for rs in json.loads(line)["resourceSpans"]:
+                service = rs["resource"]["attributes"][0]["value"]["stringValue"]
+                for ss in rs["scopeSpans"]:
+                    for span in ss["spans"]:
+                        spans.append({**span, "service": service})
+    return spans
+
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+
+_exporter = None
+_service  = "recommendation-api"
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def configure(service: str, exporter=None) -> None:
+    """Set the service name and exporter; defaults to TRACE_EXPORT_PATH if set."""
+    global _exporter, _service
+    _service = service
+    if exporter is None and os.getenv("TRACE_EXPORT_PATH"):
+        exporter = JsonFileExporter(os.environ["TRACE_EXPORT_PATH"])
+    _exporter = exporter
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def current_traceparent() -> str:
+    """traceparent of the active span, or "" when tracing is off."""
+    span = _current_span.get()
+    return span.traceparent if span is not None else ""
+
+
+def _parse_traceparent(traceparent: str) -> tuple[str, str]:
+    parts = (traceparent or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return "", ""
+
+
+@contextmanager
+def start_span(name: str, traceparent: str = "", **attributes):
+    """
+    Open a span as a child of the active span — or of `traceparent` when given
+    (remote parent) — and export it on exit. Yields None when tracing is off.
+    """
+    if _exporter is None:
+        yield None
+        return
+
+    trace_id, parent_id = _parse_traceparent(traceparent)
+    if not trace_id:
+        parent = _current_span.get()
+        trace_id  = parent.trace_id if parent else secrets.token_hex(16)
+        parent_id = parent.span_id if parent else ""
+
+    span = Span(name, trace_id, parent_id)
+    for k, v in attributes.items():
+        span.set(k, v)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        _exporter.export(span, _service)
+
+
+def traced(name: str):
+    """Decorator wrapping a (sync or async) function in a span."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+configure(_service)
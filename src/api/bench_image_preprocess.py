@@ -0,0 +1,128 @@
+"""
+Benchmark image preprocessing per size class.
+
+For each class a photo-like JPEG (gradient + sensor noise + EXIF) is generated,
+then sent down both paths the API can take:
+    raw   — original bytes → base64 data URL
+    prep  — encode() (downscale, strip, re-encode) → base64 data URL
+and the payload size and latency are reported. With --vlm the payload is also
+sent to the mood-extraction model, so the latency column is end-to-end.
+
+Usage:
+    python bench_image_preprocess.py
+    python bench_image_preprocess.py --repeat 10 --format webp --max-side 768
+    python bench_image_preprocess.py --images ~/photos --vlm
+"""
+import argparse
+import base64
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "agent_pipeline/recommendation"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from image_preprocess import FORMATS, MAX_OUTPUT_BYTES, MAX_SIDE, encode
+
+SIZE_CLASSES = {
+    "small":  (640, 480),
+    "medium": (1600, 1200),
+    "phone":  (4032, 3024),      # 12 MP
+    "large":  (6000, 4000),      # 24 MP
+}
+
+
+def _synthetic_photo(width: int, height: int) -> bytes:
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise    = Image.effect_noise((width, height), 40)
+    img = Image.merge("RGB", (gradient, noise, gradient.rotate(90).resize((width, height))))
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"        # Make
+    exif[0x0112] = 1                 # Orientation
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92, exif=exif)
+    return buf.getvalue()
+
+
+def _size_class(width: int, height: int) -> str:
+    pixels = width * height
+    for name, (w, h) in SIZE_CLASSES.items():
+        if pixels <= w * h:
+            return name
+    return "large"
+
+
+def _load_images(directory: Path) -> dict[str, list[bytes]]:
+    from PIL import Image
+
+    classes: dict[str, list[bytes]] = {}
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in (".jpg", ".jpeg", ".png", ".webp"):
+            continue
+        data = path.read_bytes()
+        with Image.open(io.BytesIO(data)) as img:
+            classes.setdefault(_size_class(*img.size), []).append(data)
+    return classes
+
+
+def _data_url(data: bytes, content_type: str) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _call_vlm(url: str) -> None:
+    from nodes.mood_extractor import SYSTEM_PROMPT, form_user_content, get_llm
+    from langchain_core.messages import SystemMessage
+
+    get_llm().invoke([SystemMessage(content=SYSTEM_PROMPT)] + form_user_content({"image_url": url}))
+
+
+def _measure(images: list[bytes], repeat: int, args, prep: bool) -> tuple[float, float]:
+    """Median latency (s) and mean payload bytes for one path."""
+    content_type = FORMATS[args.format][1] if prep else "image/jpeg"
+    latencies, sizes = [], []
+    for data in images:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            payload = encode(data, args.max_side, args.max_bytes, args.format) if prep else data
+            url = _data_url(payload, content_type)
+            if args.vlm:
+                _call_vlm(url)
+            latencies.append(time.perf_counter() - start)
+        sizes.append(len(payload))
+    return statistics.median(latencies), statistics.mean(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image preprocessing benchmark")
+    parser.add_argument("--images", type=Path, help="Directory of real images (default: synthetic)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-side", type=int, default=MAX_SIDE)
+    parser.add_argument("--max-bytes", type=int, default=MAX_OUTPUT_BYTES)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="jpeg")
+    parser.add_argument("--vlm", action="store_true", help="Include the vision-model call (end-to-end)")
+    args = parser.parse_args()
+
+    if args.images:
+        classes = _load_images(args.images)
+    else:
+        classes = {name: [_synthetic_photo(w, h)] for name, (w, h) in SIZE_CLASSES.items()}
+    repeat = 1 if args.vlm else args.repeat
+
+    print(f"{'class':<8}{'raw KB':>10}{'prep KB':>10}{'saved':>8}{'raw ms':>10}{'prep ms':>10}")
+    for name in SIZE_CLASSES:
+        images = classes.get(name)
+        if not images:
+            continue
+        raw_s, raw_b   = _measure(images, repeat, args, prep=False)
+        prep_s, prep_b = _measure(images, repeat, args, prep=True)
+        saved = 1 - prep_b / raw_b if raw_b else 0.0
+        print(f"{name:<8}{raw_b / 1024:>10.0f}{prep_b / 1024:>10.0f}{saved:>8.0%}"
+              f"{raw_s * 1000:>10.1f}{prep_s * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
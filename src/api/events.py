@@ -2,7 +2,7 @@
 API-layer Pydantic schemas for request validation and SSE response structure.
 """
 from enum import Enum
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 
 from pydantic import BaseModel, field_validator, model_validator
 
@@ -10,6 +10,11 @@ from pydantic import BaseModel, field_validator, model_validator
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
 MAX_IMAGE_BYTES     = 10 * 1024 * 1024   # 10 MB
 MAX_TEXT_LENGTH     = 2000
+MAX_BUDGET_MS       = 120_000
+ALLOWED_GENDERS     = {"", "men", "women", "unisex"}
+MAX_BATCH_SIZE      = 1000
+MAX_BATCH_CONCURRENCY = 32
+MAX_PAGE_SIZE       = 20
 
 
 class InputType(str, Enum):
@@ -34,6 +39,69 @@ class RecommendRequest(BaseModel):
         return self
 
 
+class BatchItem(BaseModel):
+    id:               Optional[str] = None   # caller's key, echoed on the result line
+    text:             str
+    preferred_gender: str = ""
+
+    @field_validator("text")
+    @classmethod
+    def cap_text_length(cls, v):
+        if not v.strip():
+            raise ValueError("text must not be empty")
+        return v[:MAX_TEXT_LENGTH]
+
+    @field_validator("preferred_gender")
+    @classmethod
+    def known_gender(cls, v):
+        v = v.strip().lower()
+        if v not in ALLOWED_GENDERS:
+            raise ValueError(f"preferred_gender must be one of {sorted(ALLOWED_GENDERS)}")
+        return v
+
+
+class BatchRequest(BaseModel):
+    inputs:      List[BatchItem]
+    concurrency: int = 4                    # evaluations in flight for this batch
+
+    @field_validator("inputs")
+    @classmethod
+    def batch_size(cls, v):
+        if not 0 < len(v) <= MAX_BATCH_SIZE:
+            raise ValueError(f"inputs must hold 1 to {MAX_BATCH_SIZE} items")
+        return v
+
+    @field_validator("concurrency")
+    @classmethod
+    def bounded_concurrency(cls, v):
+        if not 0 < v <= MAX_BATCH_CONCURRENCY:
+            raise ValueError(f"concurrency must be in [1, {MAX_BATCH_CONCURRENCY}]")
+        return v
+
+
+# ── NDJSON line of /recommend/batch ───────────────────────────────────────────
+
+class BatchResultLine(BaseModel):
+    index:           int                    # position in BatchRequest.inputs
+    id:              Optional[str] = None
+    moods:           List[str] = []
+    accords:         List[str] = []
+    recommendations: List[dict] = []
+    degradations:    List[str] = []
+    cached:          bool = False
+    error:           Optional[str] = None
+    retry_after:     Optional[int] = None
+
+
+# ── /recommend/more response ──────────────────────────────────────────────────
+
+class PageResponse(BaseModel):
+    session_id:      str
+    offset:          int                    # rank (0-based) of the first recommendation
+    recommendations: List[dict]
+    has_more:        bool
+
+
 # ── SSE event payloads ────────────────────────────────────────────────────────
 
 class MoodsEvent(BaseModel):
@@ -63,6 +131,17 @@ class AccordsEvent(BaseModel):
 class ResultEvent(BaseModel):
     type:            Literal["result"] = "result"
     recommendations: List[dict]
+    degradations:    List[str] = []    # latency-budget shortcuts taken, e.g. "evaluator_skipped"
+    cached:          bool = False      # served from the post-extraction result cache
+    session_id:      Optional[str] = None   # pass to /recommend/refine to tweak this result
+
+
+class TimingsEvent(BaseModel):
+    type:      Literal["timings"] = "timings"
+    total_s:   float
+    nodes:     Dict[str, float]              # graph node -> seconds
+    mcp_tools: Dict[str, float]              # MCP tool -> seconds
+    tokens:    Dict[str, Dict[str, int]]     # node -> {"input": n, "output": n}
 
 
 class DoneEvent(BaseModel):
@@ -70,5 +149,6 @@ class DoneEvent(BaseModel):
 
 
 class ErrorEvent(BaseModel):
-    type:    Literal["error"] = "error"
-    message: str
+    type:        Literal["error"] = "error"
+    message:     str
+    retry_after: Optional[int] = None   # seconds, set when the server is overloaded
@@ -0,0 +1,151 @@
+"""
+Image preprocessing before the vision model.
+
+Phone photos arrive at 3–12 MP and several MB; the VLM gains nothing from
+that resolution. Each stored upload is decoded, EXIF-rotated, downscaled so
+its longest side is at most IMAGE_MAX_SIDE, and re-encoded (JPEG or WebP)
+without metadata, lowering quality — then size — until it fits
+IMAGE_MAX_OUTPUT_BYTES.
+
+The PIL work runs in an executor (threads by default, processes with
+IMAGE_PREPROCESS_EXECUTOR=process) so it never blocks the event loop.
+Derived images are content-addressed on (source digest, settings) and kept in
+the image store, so a repeated upload is only processed once.
+
+    IMAGE_MAX_SIDE, IMAGE_MAX_OUTPUT_BYTES, IMAGE_OUTPUT_FORMAT (jpeg|webp),
+    IMAGE_PREPROCESS_EXECUTOR (thread|process), IMAGE_PREPROCESS_WORKERS,
+    IMAGE_PREPROCESS (set to 0 to hand the original to the model)
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from image_store import EXTENSIONS, IMAGE_STORE_DIR, StoredImage
+from metrics import REGISTRY
+
+ENABLED          = os.getenv("IMAGE_PREPROCESS", "1") != "0"
+MAX_SIDE         = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+MAX_OUTPUT_BYTES = int(os.getenv("IMAGE_MAX_OUTPUT_BYTES", str(300 * 1024)))
+OUTPUT_FORMAT    = os.getenv("IMAGE_OUTPUT_FORMAT", "jpeg").lower()
+EXECUTOR_KIND    = os.getenv("IMAGE_PREPROCESS_EXECUTOR", "thread")
+WORKERS          = int(os.getenv("IMAGE_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+MAX_PIXELS   = 50_000_000            # refuse decompression bombs before decoding
+QUALITIES    = (85, 75, 65, 55, 45)
+SHRINK_STEP  = 0.75                  # scale applied when even the lowest quality is too big
+MIN_SIDE     = 256
+
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+PREPROCESS_LATENCY = REGISTRY.histogram(
+    "recommend_image_preprocess_seconds", "Time spent downscaling/re-encoding an upload.")
+BYTES_SAVED = REGISTRY.counter(
+    "recommend_image_bytes_saved_total", "Upload bytes not sent to the vision model after preprocessing.")
+
+_executor: Executor | None = None
+
+
+def encode(data: bytes, max_side: int = MAX_SIDE, max_bytes: int = MAX_OUTPUT_BYTES,
+           fmt: str = OUTPUT_FORMAT) -> bytes:
+    """Decode `data`, downscale, strip metadata and re-encode under `max_bytes`.
+    Pure function of its arguments — safe to run in a worker process."""
+    from PIL import Image, ImageOps       # heavy; only needed once an image arrives
+
+    pil_format, _ = FORMATS[fmt]
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS           # our limit, not PIL's default (also set in worker processes)
+    img = Image.open(io.BytesIO(data))
+    if img.width * img.height > MAX_PIXELS:
+        raise ValueError(f"image has {img.width}x{img.height} pixels")
+    if img.format == "JPEG":
+        img.draft("RGB", (max_side, max_side))   # let libjpeg decode at a reduced scale
+    img = ImageOps.exif_transpose(img)           # bake in orientation before EXIF is dropped
+    if img.mode != "RGB":
+        img = img.convert("RGB")                 # also flattens alpha / palette / first GIF frame
+
+    side = max_side
+    while True:
+        if max(img.size) > side:
+            img.thumbnail((side, side), Image.LANCZOS)
+        for quality in QUALITIES:
+            buf = io.BytesIO()
+            img.save(buf, format=pil_format, quality=quality, optimize=True)   # no exif= → stripped
+            if buf.tell() <= max_bytes:
+                return buf.getvalue()
+        if side <= MIN_SIDE:
+            return buf.getvalue()                # smallest we go — accept going over budget
+        side = max(MIN_SIDE, int(max(img.size) * SHRINK_STEP))
+
+
+def _encode_file(src: str, dst: str, max_side: int, max_bytes: int, fmt: str) -> int:
+    # file in, file out — only paths cross the process boundary
+    out = encode(Path(src).read_bytes(), max_side, max_bytes, fmt)
+    # unique temp name: concurrent uploads of the same image share `dst`
+    fd, tmp = tempfile.mkstemp(dir=Path(dst).parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+        os.replace(tmp, dst)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return len(out)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if EXECUTOR_KIND == "process":
+            _executor = ProcessPoolExecutor(max_workers=WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="image-preprocess")
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def variant_digest(image: StoredImage, max_side: int = MAX_SIDE, max_bytes: int = MAX_OUTPUT_BYTES,
+                   fmt: str = OUTPUT_FORMAT) -> str:
+    return hashlib.sha256(f"{image.digest}:{max_side}:{max_bytes}:{fmt}".encode()).hexdigest()
+
+
+async def preprocess(image: StoredImage) -> StoredImage:
+    """The model-ready variant of a stored upload (created on first use)."""
+    if not ENABLED:
+        return image
+    _, content_type = FORMATS[OUTPUT_FORMAT]
+    digest = variant_digest(image)
+    path   = IMAGE_STORE_DIR / f"{digest}{EXTENSIONS[content_type]}"
+
+    if not path.exists():
+        from PIL import Image
+        start = time.perf_counter()
+        loop  = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                _get_executor(), _encode_file,
+                str(image.path), str(path), MAX_SIDE, MAX_OUTPUT_BYTES, OUTPUT_FORMAT,
+            )
+        # PIL raises UnidentifiedImageError(OSError) on bad data, DecompressionBombError
+        # (neither OSError nor ValueError) when the dimensions exceed MAX_IMAGE_PIXELS
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise HTTPException(status_code=415, detail=f"Could not decode image: {e}")
+        PREPROCESS_LATENCY.observe(time.perf_counter() - start)
+
+    size = path.stat().st_size
+    BYTES_SAVED.inc(max(0, image.size - size))
+    return StoredImage(digest, path, content_type, size)
@@ -0,0 +1,147 @@
+"""
+Local content-addressed image store for /recommend image uploads.
+
+Uploads are streamed to disk in chunks (never held whole in memory), checked
+against ALLOWED_IMAGE_TYPES / MAX_IMAGE_BYTES, and stored as
+`<sha256><ext>` so identical images are kept once.
+
+How the vision model receives the image is selected by IMAGE_BACKEND:
+    inline  — base64 data URL built from the stored file (default, no network hop)
+    local   — served by this app at  PUBLIC_BASE_URL/images/<name>
+    imgbb   — uploaded to imgbb (previous behaviour, needs IMGBB_API_KEY)
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+from fastapi import HTTPException, UploadFile
+
+from events import ALLOWED_IMAGE_TYPES, MAX_IMAGE_BYTES
+
+IMAGE_STORE_DIR = Path(os.getenv(
+    "IMAGE_STORE_DIR",
+    Path(__file__).resolve().parents[2] / "datasets" / "uploads",
+))
+IMAGE_BACKEND   = os.getenv("IMAGE_BACKEND", "inline")
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+CHUNK_BYTES     = 64 * 1024
+
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png":  ".png",
+    "image/webp": ".webp",
+    "image/gif":  ".gif",
+}
+CONTENT_TYPES = {ext: ctype for ctype, ext in EXTENSIONS.items()}
+
+_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|webp|gif)$")
+
+
+@dataclass
+class StoredImage:
+    digest:       str
+    path:         Path
+    content_type: str
+    size:         int
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+def _sniff(head: bytes) -> str | None:
+    """Content type from magic bytes — the client-declared type is not trusted."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+
+async def save_upload(upload: UploadFile) -> StoredImage:
+    """Stream an upload into the store, enforcing type and size limits."""
+    if upload.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported image type: {upload.content_type}")
+
+    IMAGE_STORE_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size   = 0
+    head   = b""
+    fd, tmp_name = tempfile.mkstemp(dir=IMAGE_STORE_DIR, suffix=".part")
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload.read(CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+
+        content_type = _sniff(head)
+        if content_type is None or content_type not in ALLOWED_IMAGE_TYPES:
+            raise HTTPException(status_code=415, detail="Upload is not a supported image")
+
+        hexdigest = digest.hexdigest()
+        path = IMAGE_STORE_DIR / f"{hexdigest}{EXTENSIONS[content_type]}"
+        if path.exists():
+            tmp.unlink()            # already stored — dedupe
+        else:
+            os.replace(tmp, path)
+        return StoredImage(hexdigest, path, content_type, size)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def resolve(name: str) -> Path:
+    """Path of a stored image by file name; 404 for anything else (no traversal)."""
+    if not _NAME_RE.match(name):
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = IMAGE_STORE_DIR / name
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Image not found")
+    return path
+
+
+def _data_url(image: StoredImage) -> str:
+    b64 = base64.b64encode(image.path.read_bytes()).decode("ascii")
+    return f"data:{image.content_type};base64,{b64}"
+
+
+async def _upload_to_imgbb(image: StoredImage) -> str:
+    """Upload a stored image to imgbb and return the public URL."""
+    api_key = os.getenv("IMGBB_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="IMGBB_API_KEY not set in environment")
+    async with httpx.AsyncClient() as client:
+        with open(image.path, "rb") as f:
+            resp = await client.post(
+                "https://api.imgbb.com/1/upload",
+                params={"key": api_key},
+                files={"image": (image.name, f, image.content_type)},
+                timeout=30,
+            )
+        resp.raise_for_status()
+        return resp.json()["data"]["url"]
+
+
+async def model_url(image: StoredImage) -> str:
+    """URL handed to the vision model, according to IMAGE_BACKEND."""
+    if IMAGE_BACKEND == "imgbb":
+        return await _upload_to_imgbb(image)
+    if IMAGE_BACKEND == "local":
+        return f"{PUBLIC_BASE_URL}/images/{image.name}"
+    return await asyncio.to_thread(_data_url, image)
@@ -1,15 +1,16 @@
-import base64
+import asyncio
 import json
-import os
+from array import array
 import sys
+import threading
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 
-import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
 load_dotenv(Path(__file__).resolve().parents[2] / ".env")
 
@@ -17,17 +18,49 @@ load_dotenv(Path(__file__).resolve().parents[2] / ".env")
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "agent_pipeline/recommendation"))
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # src/
 
-from graph import build_graph
-from nodes.search import close_mcp_client
+# Only light modules at import time — the graph (LangChain, LangGraph, LLM
+# clients) is built on first use or by warmup; see get_graph()
+from admission import REQUESTS, Overloaded, check_capacity
+from deadline import deadline_from_budget
+from metrics import REGISTRY, finish_request, start_request
+from sessions import SESSIONS, Session
+from tracing import start_span
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))  # src/api/
-from events import AccordsEvent, DoneEvent, ErrorEvent, MoodsEvent, ResultEvent
+from events import (
+    ALLOWED_GENDERS,
+    MAX_BUDGET_MS,
+    MAX_PAGE_SIZE,
+    AccordsEvent,
+    BatchRequest,
+    BatchResultLine,
+    DoneEvent,
+    ErrorEvent,
+    MoodsEvent,
+    PageResponse,
+    ResultEvent,
+    TimingsEvent,
+)
+from image_preprocess import preprocess
+from image_preprocess import shutdown as shutdown_preprocess
+from image_store import CONTENT_TYPES, model_url, resolve, save_upload
+from singleflight import SingleFlight, coalesce_key
+import warmup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    yield                        # startup — MCP client is lazy-initialized on first request
-    await close_mcp_client()     # shutdown — terminate the MCP subprocess cleanly
+    # startup — optional warmup in the background; /ready flips once it is done
+    # (without it, the MCP client is lazy-initialized on the first request)
+    warmup_task = asyncio.create_task(warmup.run(get_graph)) if warmup.ENABLED else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    warmup.save_hot_signatures()
+    search = sys.modules.get("nodes.search")   # never imported → no MCP subprocess to stop
+    if search is not None:
+        await search.close_mcp_client()        # shutdown — terminate the MCP subprocess cleanly
+    shutdown_preprocess()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -39,72 +72,271 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-graph = build_graph()
+_graph = None
+_graph_lock = threading.Lock()
+_flights = SingleFlight()
+
+
+def get_graph():
+    """The compiled recommendation graph, built (and its heavy deps imported) on first call."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                from graph import build_graph
+                _graph = build_graph()
+    return _graph
 
 
-async def _upload_to_imgbb(image_bytes: bytes) -> str:
-    """Upload image bytes to imgbb and return the public URL."""
-    api_key = os.getenv("IMGBB_API_KEY")
-    print(f"IMGBB_API_KEY: {api_key}")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="IMGBB_API_KEY not set in environment")
-    b64 = base64.b64encode(image_bytes).decode("utf-8")
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://api.imgbb.com/1/upload",
-            params={"key": api_key},
-            data={"image": b64},
-            timeout=30,
-        )
-        resp.raise_for_status()
-        return resp.json()["data"]["url"]
+def _overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 
 def _sse(payload: dict) -> str:
     return f"data: {json.dumps(payload)}\n\n"
 
 
+def _own_session(event: str) -> str:
+    """A coalesced follower's result event, pointing at its own copy of the
+    leader's session — paging mutates a session, so clients can't share one."""
+    payload = json.loads(event[len("data: "):])
+    if not payload.get("session_id"):
+        return event
+    session = SESSIONS.get(payload["session_id"])
+    payload["session_id"] = SESSIONS.put(session.copy()) if session is not None else None
+    return _sse(payload)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of per-node latency and LLM token histograms."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe — 503 until startup warmup has finished."""
+    status = warmup.READINESS.as_dict()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/images/{name}")
+async def get_image(name: str):
+    """Serve an uploaded image from the local content-addressed store."""
+    path = resolve(name)
+    return FileResponse(path, media_type=CONTENT_TYPES[path.suffix])
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(request: BatchRequest):
+    """Many text inputs in one call — one NDJSON line per input, streamed as each finishes."""
+    if not REQUESTS.try_acquire():
+        raise _overloaded(Overloaded(REQUESTS.stage))
+
+    async def generate():
+        try:
+            await asyncio.to_thread(get_graph)       # node modules loaded once, off the loop
+            from batch import recommend_batch as run_batch
+
+            items = [item.model_dump() for item in request.inputs]
+            with start_span("recommend.batch", size=len(items)):
+                async for line in run_batch(items, request.concurrency):
+                    yield BatchResultLine(**line).model_dump_json() + "\n"
+        finally:
+            REQUESTS.release()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.post("/recommend/more")
+async def more_results(
+    session_id: str = Form(...),
+    offset: int = Form(default=5),
+    limit: int = Form(default=5),
+):
+    """Ranks offset+1 … offset+limit of a previous result, from its cached candidate
+    pool — extended with the next Milvus page and scored incrementally when it runs dry."""
+    session = SESSIONS.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"limit must be in [1, {MAX_PAGE_SIZE}]")
+    await asyncio.to_thread(get_graph)           # node modules loaded once, off the loop
+    from nodes.paginate import MAX_OFFSET, page
+    if not 0 <= offset <= MAX_OFFSET:
+        raise HTTPException(status_code=422, detail=f"offset must be in [0, {MAX_OFFSET}]")
+    if not REQUESTS.try_acquire():
+        raise _overloaded(Overloaded(REQUESTS.stage))
+
+    try:
+        with start_span("recommend.more", offset=offset, limit=limit):
+            recommendations, has_more = await page(session, offset, limit)
+    except Overloaded as e:
+        raise _overloaded(e)
+    finally:
+        REQUESTS.release()
+    SESSIONS.resize(session_id)
+    return PageResponse(
+        session_id=session_id, offset=offset, recommendations=recommendations, has_more=has_more,
+    ).model_dump()
+
+
+@app.post("/recommend/refine")
+async def refine_recommendation(
+    session_id: str = Form(...),
+    text: str = Form(...),
+    evaluate: bool = Form(default=False),
+    timings: bool = Form(default=False),
+):
+    """Tweak a previous result ("more like this but fresher") from its stored session
+    instead of rerunning the graph. The result event carries a new session_id."""
+    if not text.strip():
+        raise HTTPException(status_code=422, detail="text must not be empty")
+    session = SESSIONS.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    if not REQUESTS.try_acquire():
+        raise _overloaded(Overloaded(REQUESTS.stage))
+
+    async def generate():
+        request_timings = start_request()
+        try:
+            await asyncio.to_thread(get_graph)       # node modules loaded once, off the loop
+            from nodes.refine import refine
+
+            with start_span("recommend.refine", evaluate=evaluate):
+                refined = await refine(session, text[:2000], evaluate=evaluate)
+            if refined.extracted_moods:
+                yield _sse(MoodsEvent(moods=refined.extracted_moods).model_dump())
+            if refined.extracted_accords:
+                yield _sse(AccordsEvent(accords=refined.extracted_accords).model_dump())
+            yield _sse(ResultEvent(
+                recommendations=refined.recommendations, session_id=SESSIONS.put(refined),
+            ).model_dump())
+            if timings:
+                yield _sse(TimingsEvent(**request_timings.as_dict()).model_dump())
+            yield _sse(DoneEvent().model_dump())
+        except Overloaded as e:
+            yield _sse(ErrorEvent(message=str(e), retry_after=e.retry_after).model_dump())
+        except Exception as e:
+            yield _sse(ErrorEvent(message=str(e)).model_dump())
+        finally:
+            finish_request(request_timings)
+            REQUESTS.release()
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
 @app.post("/recommend")
 async def recommend(
     input_type: str = Form(...),
     text: str = Form(default=""),
     image: UploadFile = File(default=None),
+    budget_ms: Optional[int] = Form(default=None),
+    timings: bool = Form(default=False),
+    preferred_gender: str = Form(default=""),
 ):
     # Validate text input
     if input_type == "text" and not text.strip():
         raise HTTPException(status_code=422, detail="text must not be empty when input_type is 'text'")
+    if budget_ms is not None and not (0 < budget_ms <= MAX_BUDGET_MS):
+        raise HTTPException(status_code=422, detail=f"budget_ms must be in (0, {MAX_BUDGET_MS}]")
+    preferred_gender = preferred_gender.strip().lower()
+    if preferred_gender not in ALLOWED_GENDERS:
+        raise HTTPException(status_code=422, detail=f"preferred_gender must be one of {sorted(ALLOWED_GENDERS)}")
 
-    if input_type == "image" and image:
-        image_bytes = await image.read()
-        image_url = await _upload_to_imgbb(image_bytes)
-        graph_input = {"input_type": "image", "mood_input": image_url}
-    else:
-        graph_input = {"input_type": "text", "mood_input": text[:2000]}
+    # The budget covers the whole request, including the image handling below
+    deadline_at = deadline_from_budget(budget_ms / 1000 if budget_ms else None)
+
+    # Stream the upload to the local store (size/type limits enforced, deduped by hash)
+    stored_image = await save_upload(image) if input_type == "image" and image else None
+    mood_input   = stored_image.digest if stored_image is not None else text[:2000]
+
+    # Single-flight — identical in-flight requests share one graph execution
+    key = coalesce_key(
+        "image" if stored_image is not None else "text", mood_input, budget_ms, timings, preferred_gender,
+    )
+    flight = _flights.get(key)
+    if flight is not None:
+        return StreamingResponse(flight.subscribe(_own_session), media_type="text/event-stream")
+
+    # Admission control — reject fast instead of queueing into timeouts
+    if not REQUESTS.try_acquire():
+        raise _overloaded(Overloaded(REQUESTS.stage))
+    try:
+        check_capacity()
+    except Overloaded as e:
+        REQUESTS.release()
+        raise _overloaded(e)
 
     async def generate():
+        degradations = []
+        session = Session(extracted_moods=[], extracted_accords=[], preferred_gender=preferred_gender)
+        request_timings = start_request()
         try:
-            async for chunk in graph.astream(graph_input):
-                # extract_mood node finished — stream moods immediately
-                if "extract_mood" in chunk:
-                    moods = chunk["extract_mood"].get("extracted_moods", [])
-                    if moods:
-                        yield _sse(MoodsEvent(moods=moods).model_dump())
-
-                # extract_accord node finished
-                if "extract_accord" in chunk:
-                    accords = chunk["extract_accord"].get("extracted_accords", [])
-                    if accords:
-                        yield _sse(AccordsEvent(accords=accords).model_dump())
-
-                # evaluator finished — stream final recommendations
-                if "evaluator" in chunk:
-                    recs = chunk["evaluator"].get("recommendations", [])
-                    yield _sse(ResultEvent(recommendations=recs).model_dump())
+            if stored_image is not None:
+                # downscale + strip metadata off the event loop, then hand it to the VLM
+                model_image = await preprocess(stored_image)
+                graph_input = {"input_type": "image", "mood_input": await model_url(model_image),
+                               "image_digest": model_image.digest}
+            else:
+                graph_input = {"input_type": "text", "mood_input": mood_input}
+            graph_input["deadline_at"] = deadline_at
+            graph_input["preferred_gender"] = preferred_gender
 
-            yield _sse(DoneEvent().model_dump())
+            graph = get_graph() if _graph is not None else await asyncio.to_thread(get_graph)
+            with start_span("recommend", input_type=graph_input["input_type"]):
+                async for chunk in graph.astream(graph_input):
+                    for update in chunk.values():
+                        degradations.extend((update or {}).get("degradations", []))
+
+                    # extract_mood node finished — stream moods immediately
+                    if "extract_mood" in chunk:
+                        moods = chunk["extract_mood"].get("extracted_moods", [])
+                        session.extracted_moods = moods
+                        if moods:
+                            yield _sse(MoodsEvent(moods=moods).model_dump())
+
+                    # extract_accord node finished
+                    if "extract_accord" in chunk:
+                        accords = chunk["extract_accord"].get("extracted_accords", [])
+                        session.extracted_accords = accords
+                        if accords:
+                            yield _sse(AccordsEvent(accords=accords).model_dump())
+
+                    # search finished — keep the vector and pool for refinements
+                    if "search" in chunk:
+                        session.query_vector = array("f", chunk["search"].get("query_vector", []))
+                        session.candidates   = chunk["search"].get("candidates", [])
+
+                    # result cache hit — the graph skipped search/evaluator
+                    if "cache_lookup" in chunk and chunk["cache_lookup"].get("cache_hit"):
+                        session.recommendations = chunk["cache_lookup"].get("recommendations", [])
+                        yield _sse(ResultEvent(
+                            recommendations=session.recommendations, degradations=degradations,
+                            cached=True, session_id=SESSIONS.put(session),
+                        ).model_dump())
+
+                    # evaluator finished — stream final recommendations
+                    if "evaluator" in chunk:
+                        session.recommendations = chunk["evaluator"].get("recommendations", [])
+                        yield _sse(ResultEvent(
+                            recommendations=session.recommendations, degradations=degradations,
+                            session_id=SESSIONS.put(session),
+                        ).model_dump())
+
+                if timings:
+                    yield _sse(TimingsEvent(**request_timings.as_dict()).model_dump())
+                yield _sse(DoneEvent().model_dump())
+        except Overloaded as e:
+            yield _sse(ErrorEvent(message=str(e), retry_after=e.retry_after).model_dump())
+        except HTTPException as e:
+            yield _sse(ErrorEvent(message=str(e.detail)).model_dump())
         except Exception as e:
             yield _sse(ErrorEvent(message=str(e)).model_dump())
         finally:
-            pass
+            finish_request(request_timings)
+            REQUESTS.release()
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    flight = _flights.start(key, generate)
+    return StreamingResponse(flight.subscribe(), media_type="text/event-stream")
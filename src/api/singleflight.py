@@ -0,0 +1,96 @@
+"""
+Single-flight coalescing of identical in-flight /recommend requests.
+
+The first request for a key (the leader) starts one graph execution in a
+background task; its SSE events are recorded on a Flight. Every request with
+the same key that arrives while the flight is running subscribes to it and
+gets the already-emitted events replayed, then the live ones — each passed
+through the subscriber's own `rewrite`, if any, for per-client fields such
+as the session id. The execution
+is detached from any one client, so a leader disconnecting does not cancel
+the followers' stream. Finished flights are dropped — later requests start a
+fresh run.
+"""
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def coalesce_key(*parts) -> str:
+    """Stable key over the request's normalized inputs."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = " ".join(part.lower().split()).encode("utf-8")   # case/whitespace-insensitive
+        elif not isinstance(part, bytes):
+            part = repr(part).encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class Flight:
+    """One shared execution and the events it has emitted so far."""
+
+    def __init__(self):
+        self.events: list[str] = []
+        self.done     = False
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.Condition()
+
+    async def _publish(self, event: str) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def _finish(self) -> None:
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self, rewrite: Callable[[str], str] | None = None) -> AsyncIterator[str]:
+        """Replay emitted events, then follow live ones until the flight ends."""
+        self.subscribers += 1
+        idx = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: idx < len(self.events) or self.done)
+                pending = self.events[idx:]
+                done    = self.done
+            for event in pending:
+                yield rewrite(event) if rewrite is not None else event
+            idx += len(pending)
+            if done and idx >= len(self.events):
+                return
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: dict[str, Flight] = {}
+
+    def get(self, key: str) -> Flight | None:
+        """The running flight for `key`, if any — the caller becomes a follower."""
+        return self._flights.get(key)
+
+    def start(self, key: str, produce: Callable[[], AsyncIterator[str]]) -> Flight:
+        """Run `produce()` once in the background and share its events under `key`."""
+        flight = Flight()
+        self._flights[key] = flight
+
+        async def run():
+            try:
+                async for event in produce():
+                    await flight._publish(event)
+            except Exception:
+                logger.exception("[singleflight] producer failed for %s", key[:12])
+            finally:
+                self._flights.pop(key, None)
+                await flight._finish()
+                logger.info("[singleflight] %s done — %d subscriber(s)", key[:12], flight.subscribers)
+
+        flight.task = asyncio.create_task(run())   # keep a reference so it isn't GC'd
+        return flight
@@ -0,0 +1,125 @@
+"""
+Startup warmup and readiness for the API process.
+
+Without warmup the MCP subprocess, BGE-M3 load and Milvus collection load all
+land on the first user request. With WARMUP=1 the lifespan starts `run()` in
+the background: it spawns the search server, loads the collection, runs a
+dummy embed + search and — with WARMUP_REPLAY_TOP_N > 0 — replays the hottest
+mood/accord signatures saved by the previous process, repopulating the result
+cache. `/ready` reports 503 until that finishes, so a rolling deploy never
+routes traffic to a cold instance.
+
+    WARMUP                 1 to enable (default 0 — ready immediately)
+    WARMUP_REPLAY_TOP_N    signatures to replay / save on shutdown (default 0)
+    WARMUP_QUERIES_PATH    where hot signatures are persisted between processes
+    WARMUP_RETRY_S         delay between attempts when the search stack is down
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from result_cache import RESULT_CACHE
+
+logger = logging.getLogger(__name__)
+
+ENABLED       = os.getenv("WARMUP", "0") == "1"
+REPLAY_TOP_N  = int(os.getenv("WARMUP_REPLAY_TOP_N", "0"))
+QUERIES_PATH  = Path(os.getenv(
+    "WARMUP_QUERIES_PATH",
+    Path(__file__).resolve().parents[2] / "datasets" / ".warmup_queries.json",
+))
+RETRY_S       = float(os.getenv("WARMUP_RETRY_S", "5"))
+
+
+class Readiness:
+    """Warmup progress as reported by /ready."""
+
+    def __init__(self):
+        self.ready    = not ENABLED
+        self.phase    = "disabled" if not ENABLED else "pending"
+        self.error    = ""
+        self.replayed = 0
+        self.seconds  = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "ready":    self.ready,
+            "phase":    self.phase,
+            "error":    self.error,
+            "replayed": self.replayed,
+            "seconds":  round(self.seconds, 3),
+        }
+
+
+READINESS = Readiness()
+
+
+def load_hot_signatures(path: Path = QUERIES_PATH) -> list[tuple]:
+    try:
+        rows = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return []
+    return [(tuple(moods), tuple(accords), gender) for moods, accords, gender in rows]
+
+
+def save_hot_signatures(n: int = REPLAY_TOP_N, path: Path = QUERIES_PATH) -> None:
+    """Persist the most frequent cache signatures for the next process to replay."""
+    if n <= 0:
+        return
+    signatures = RESULT_CACHE.most_frequent(n)
+    if not signatures:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps([[list(m), list(a), g] for m, a, g in signatures]))
+    os.replace(tmp, path)
+    logger.info("[warmup] saved %d hot signatures", len(signatures))
+
+
+async def _replay(signature: tuple) -> None:
+    from graph import cache_store
+    from nodes.evaluator import evaluate_node
+    from nodes.search import search_node
+
+    moods, accords, gender = signature
+    state = {"extracted_moods": list(moods), "extracted_accords": list(accords), "preferred_gender": gender}
+    state.update(await search_node(state))
+    state.update(await asyncio.to_thread(evaluate_node, state))
+    cache_store(state)
+
+
+async def run(get_graph: Callable) -> None:
+    """Build the graph, warm the search stack (retrying until it is up), then replay hot queries."""
+    start = time.monotonic()
+    READINESS.phase = "graph"
+    await asyncio.to_thread(get_graph)       # heavy imports (LangChain, LangGraph, node modules)
+
+    from nodes.search import warm_up
+    READINESS.phase = "search"
+    while True:
+        try:
+            await warm_up()
+            break
+        except Exception as e:
+            READINESS.error = str(e)
+            logger.warning("[warmup] search stack not ready (%s) — retrying in %.0fs", e, RETRY_S)
+            await asyncio.sleep(RETRY_S)
+    READINESS.error = ""
+
+    if REPLAY_TOP_N > 0:
+        READINESS.phase = "replay"
+        for signature in load_hot_signatures()[:REPLAY_TOP_N]:
+            try:
+                await _replay(signature)
+                READINESS.replayed += 1
+            except Exception as e:
+                logger.warning("[warmup] replay of %s failed: %s", signature, e)
+
+    READINESS.seconds = time.monotonic() - start
+    READINESS.phase   = "done"
+    READINESS.ready   = True
+    logger.info("[warmup] ready in %.1fs (%d queries replayed)", READINESS.seconds, READINESS.replayed)
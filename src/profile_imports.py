@@ -0,0 +1,101 @@
+"""
+Import-time profile of each process entry point.
+
+Runs every entry point's import in a fresh interpreter under `-X importtime`,
+then reports the cold-start wall time and the top-level packages that account
+for most of the import time (self time summed per package, so nothing is
+double-counted). `graph` is not an entry point of its own — it is what the API
+defers to the first request / warmup — and is listed so the deferred cost
+stays visible.
+
+    api        src/api/main.py                        (uvicorn main:app)
+    mcp        recommendation/nodes/search_mcp_server.py
+    pipeline   embed_into_milvus/run_pipeline.py
+    graph      recommendation/graph.py                (deferred by the API)
+
+Usage:
+    python profile_imports.py
+    python profile_imports.py api mcp --top 15 --runs 3
+    python profile_imports.py --max-seconds api=1.5 --max-seconds mcp=2   # exit 1 on regression
+"""
+import argparse
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent
+
+ENTRY_POINTS = {
+    "api":      (SRC / "api", "main"),
+    "mcp":      (SRC / "agent_pipeline/recommendation/nodes", "search_mcp_server"),
+    "pipeline": (SRC / "agent_pipeline/embed_into_milvus", "run_pipeline"),
+    "graph":    (SRC / "agent_pipeline/recommendation", "graph"),
+}
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def profile(name: str) -> dict:
+    """Import one entry point in a fresh interpreter; wall time + per-package self time."""
+    directory, module = ENTRY_POINTS[name]
+    code = f"import sys; sys.path.insert(0, {str(directory)!r}); import {module}"
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=directory, capture_output=True, text=True,
+    )
+    wall_s = time.perf_counter() - start
+
+    per_package: dict[str, int] = defaultdict(int)
+    other = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            per_package[m.group(4).split(".")[0]] += int(m.group(1))
+        elif not line.startswith("import time:"):
+            other.append(line)
+    return {
+        "wall_s":      wall_s,
+        "import_s":    sum(per_package.values()) / 1e6,
+        "per_package": per_package,
+        "error":       other[-1] if proc.returncode != 0 and other else "",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile per entry point")
+    parser.add_argument("entry_points", nargs="*", metavar="ENTRY_POINT",
+                        help=f"Any of {', '.join(ENTRY_POINTS)} (default: all)")
+    parser.add_argument("--top", type=int, default=10, help="Offenders listed per entry point")
+    parser.add_argument("--runs", type=int, default=1, help="Best-of-N (first run also pays disk cache misses)")
+    parser.add_argument("--max-seconds", action="append", default=[], metavar="NAME=S",
+                        help="Fail if an entry point's cold start exceeds S seconds")
+    args = parser.parse_args()
+    unknown = set(args.entry_points) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"unknown entry point(s): {', '.join(sorted(unknown))}")
+    limits = {k: float(v) for k, v in (item.split("=", 1) for item in args.max_seconds)}
+
+    failed = []
+    for name in args.entry_points or ENTRY_POINTS:
+        result = min((profile(name) for _ in range(args.runs)), key=lambda r: r["wall_s"])
+        print(f"\n{name}: cold start {result['wall_s']:.2f}s (imports {result['import_s']:.2f}s)")
+        if result["error"]:
+            print(f"  import failed: {result['error']}")
+            failed.append(f"{name} failed to import")
+        ranked = sorted(result["per_package"].items(), key=lambda kv: kv[1], reverse=True)
+        for package, us in ranked[:args.top]:
+            print(f"  {us / 1e6:>8.3f}s  {package}")
+        if name in limits and result["wall_s"] > limits[name]:
+            failed.append(f"{name} {result['wall_s']:.2f}s > {limits[name]:.2f}s")
+
+    if failed:
+        print("\nCold-start check failed: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Columnar perfume catalog (Parquet or Arrow IPC).
+
+The catalog holds the same perfumes as fragrantica_perfumes.json /
+perfumes_with_moods.jsonl in a typed, columnar file, so each stage reads only
+the columns it needs and nothing is re-parsed from text. Field names follow
+pipeline/transform.py's output; where transform joins lists into strings the
+catalog keeps list<string> columns:
+
+    name, brand, gender, description, url : string
+    year_released                         : int32
+    top_notes, middle_notes, base_notes   : list<string>
+    main_accords, moods                   : list<string>   (moods empty until extracted)
+
+Readers hand back the nested dicts the rest of the code already uses
+(`notes: {top, middle, base}`), so they drop in where JSON was read —
+streaming_reader.iter_records() dispatches here for .parquet / .arrow paths.
+
+    *.parquet   zstd-compressed, row groups of ROW_GROUP_ROWS; memory-mapped reads
+    *.arrow     Arrow IPC file; memory-mapped, zero-copy reads
+
+CLI:
+    python catalog.py import ../../datasets/fragrantica_perfumes.json ../../datasets/fragrantica_perfumes.parquet
+    python catalog.py export ../../datasets/perfumes.parquet ../../datasets/perfumes_with_moods.jsonl
+    python catalog.py info ../../datasets/perfumes.parquet
+"""
+import argparse
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from streaming_reader import dumps, is_catalog, iter_records
+
+ROW_GROUP_ROWS   = 10_000
+
+_strings = pa.list_(pa.string())
+
+SCHEMA = pa.schema([
+    pa.field("name",          pa.string()),
+    pa.field("brand",         pa.string()),
+    pa.field("gender",        pa.string()),
+    pa.field("description",   pa.string()),
+    pa.field("url",           pa.string()),
+    pa.field("year_released", pa.int32()),
+    pa.field("top_notes",     _strings),
+    pa.field("middle_notes",  _strings),
+    pa.field("base_notes",    _strings),
+    pa.field("main_accords",  _strings),
+    pa.field("moods",         _strings),
+])
+
+_NOTE_COLUMNS = {"top_notes": "top", "middle_notes": "middle", "base_notes": "base"}
+
+
+def _to_row(perfume: dict) -> dict:
+    notes = perfume.get("notes") or {}
+    row = {f.name: perfume.get(f.name) for f in SCHEMA if f.name not in _NOTE_COLUMNS}
+    for column, key in _NOTE_COLUMNS.items():
+        row[column] = notes.get(key) or []
+    row["main_accords"] = row["main_accords"] or []
+    row["moods"] = row["moods"] or []
+    return row
+
+
+def _to_perfume(row: dict) -> dict:
+    notes = {key: row.pop(column) or [] for column, key in _NOTE_COLUMNS.items() if column in row}
+    if notes:
+        row["notes"] = notes
+    return row
+
+
+def _batches(perfumes: Iterable[dict], rows: int) -> Iterator[pa.RecordBatch]:
+    chunk = []
+    for perfume in perfumes:
+        chunk.append(_to_row(perfume))
+        if len(chunk) == rows:
+            yield pa.RecordBatch.from_pylist(chunk, schema=SCHEMA)
+            chunk = []
+    if chunk:
+        yield pa.RecordBatch.from_pylist(chunk, schema=SCHEMA)
+
+
+def write_catalog(perfumes: Iterable[dict], path: str | Path, rows_per_group: int = ROW_GROUP_ROWS) -> int:
+    """Stream perfume dicts into a catalog file (written atomically); returns the row count."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    written = 0
+    if str(path).endswith(".arrow"):
+        with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, SCHEMA) as writer:
+            for batch in _batches(perfumes, rows_per_group):
+                writer.write_batch(batch)
+                written += batch.num_rows
+    else:
+        with pq.ParquetWriter(str(tmp), SCHEMA, compression="zstd") as writer:
+            for batch in _batches(perfumes, rows_per_group):
+                writer.write_batch(batch, row_group_size=rows_per_group)
+                written += batch.num_rows
+    os.replace(tmp, path)
+    return written
+
+
+def read_table(path: str | Path, columns: list[str] | None = None) -> pa.Table:
+    """The catalog (or the projected columns) as a memory-mapped Arrow table."""
+    if str(path).endswith(".arrow"):
+        table = ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(str(path), columns=columns, memory_map=True)
+
+
+def read_catalog(path: str | Path, columns: list[str] | None = None) -> Iterator[dict]:
+    """Perfume dicts (nested `notes`) a row group at a time; `columns` projects."""
+    if str(path).endswith(".arrow"):
+        reader = ipc.open_file(pa.memory_map(str(path), "r"))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        if columns:
+            batches = (b.select(columns) for b in batches)
+    else:
+        batches = pq.ParquetFile(str(path), memory_map=True).iter_batches(columns=columns)
+    for batch in batches:
+        for row in batch.to_pylist():
+            yield _to_perfume(row)
+
+
+def count_rows(path: str | Path) -> int:
+    """Row count from file metadata — no data read."""
+    if str(path).endswith(".arrow"):
+        reader = ipc.open_file(pa.memory_map(str(path), "r"))
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return pq.ParquetFile(str(path)).metadata.num_rows
+
+
+def replace_column(path: str | Path, column: str, fn: Callable[[list], list]) -> None:
+    """Rewrite one column through `fn` (values in, values out); other columns are copied as Arrow data."""
+    table = read_table(path)
+    index = table.schema.get_field_index(column)
+    values = pa.array(fn(table.column(column).to_pylist()), type=table.schema.field(column).type)
+    table = table.set_column(index, table.schema.field(column), values)
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    if str(path).endswith(".arrow"):
+        with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=ROW_GROUP_ROWS)
+    else:
+        pq.write_table(table, str(tmp), compression="zstd", row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp, path)
+
+
+def import_records(src: str | Path, dst: str | Path) -> int:
+    """JSONL / JSON array → catalog."""
+    if is_catalog(src):
+        raise ValueError(f"{src} is already a catalog")
+    return write_catalog(iter_records(src), dst)
+
+
+def export_jsonl(src: str | Path, dst: str | Path, columns: list[str] | None = None) -> int:
+    """Catalog → JSONL in the nested layout the JSON-based tools expect."""
+    written = 0
+    with open(dst, "w", encoding="utf-8") as f:
+        for perfume in read_catalog(src, columns):
+            f.write(dumps(perfume) + "\n")
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfume catalog conversion")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="JSONL / JSON array → .parquet / .arrow")
+    imp.add_argument("src")
+    imp.add_argument("dst")
+    exp = sub.add_parser("export", help=".parquet / .arrow → JSONL")
+    exp.add_argument("src")
+    exp.add_argument("dst")
+    exp.add_argument("--columns", nargs="+", default=None)
+    info = sub.add_parser("info", help="Schema and row count")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"✓ Wrote {import_records(args.src, args.dst)} perfumes to {args.dst}")
+    elif args.command == "export":
+        print(f"✓ Wrote {export_jsonl(args.src, args.dst, args.columns)} perfumes to {args.dst}")
+    else:
+        print(read_table(args.path).schema)
+        print(f"{count_rows(args.path)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,266 +1,268 @@
-import pandas as pd
+"""
+Build the perfume catalog from the two Fragrantica CSV dumps.
+
+fra_cleaned.csv (CSV1: structured notes, brand, year) and fra_perfumes.csv
+(CSV2: description, main accords) are outer-joined on `url` and turned into
+one perfume dict per row. Fields are parsed a column at a time with pandas
+string ops; the regex note recovery for CSV2-only rows (notes embedded in the
+description) runs in chunks across a process pool. Gender labels are
+normalized on the way (see normalize_data.GENDER_MAP), so the output needs no
+second pass.
+
+Writes fragrantica_perfumes.json and, when pyarrow is installed, the columnar
+fragrantica_perfumes.parquet (see catalog.py).
+
+Usage:
+    python extract_json_from_csv.py
+    python extract_json_from_csv.py --workers 8 --no-catalog
+    python extract_json_from_csv.py --csv1 fra_cleaned.csv --csv2 fra_perfumes.csv --output perfumes.json
+"""
+import argparse
+import ast
 import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from normalize_data import GENDER_MAP
+
+DATASETS = Path(__file__).resolve().parents[2] / "datasets"
+
+NOTES_CHUNK = 2_000     # descriptions per worker task
+
+FIELDS = ("name", "brand", "gender", "description", "notes", "main_accords", "year_released", "url")
+
+ACCORD_COLUMNS = ["Main Accords", "mainaccord1", "mainaccord2", "mainaccord3", "mainaccord4", "mainaccord5"]
+
+# "Top notes are X, Y and Z; middle notes are A, B and C; base notes are D, E and F"
+# Also handles variations like "Top note is X" or "Top notes: X, Y"
+TOP_RE    = re.compile(r'[Tt]op notes?\s+(?:are|is|:)\s+([^;\.]+?)(?:;|\.|\smiddle)')
+MIDDLE_RE = re.compile(r'[Mm]iddle notes?\s+(?:are|is|:)\s+([^;\.]+?)(?:;|\.|\sbase)')
+BASE_RE   = re.compile(r'[Bb]ase notes?\s+(?:are|is|:)\s+([^;\.]+?)(?:\.|$)')
+AND_RE    = re.compile(r'\s+and\s+')
+
+GENDER_SUFFIX = r'for\s+(?:women|men|women\s+and\s+men|unisex)'
+BRAND_RE      = r'(.+?)\s+(' + GENDER_SUFFIX + r')'
 
-def extract_notes_from_description(description):
-    """Extract top, middle, and base notes from description text"""
-    notes = {
-        "top": [],
-        "middle": [],
-        "base": []
-    }
-    
-    if pd.isna(description) or not str(description).strip():
-        return notes
-    
-    desc_str = str(description)
-    
-    # Pattern to match: "Top notes are X, Y and Z; middle notes are A, B and C; base notes are D, E and F"
-    # Also handles variations like "Top note is X" or "Top notes: X, Y"
-    
-    # Extract top notes
-    top_pattern = r'[Tt]op notes?\s+(?:are|is|:)\s+([^;\.]+?)(?:;|\.|\smiddle)'
-    top_match = re.search(top_pattern, desc_str)
-    if top_match:
-        top_notes_str = top_match.group(1)
-        notes["top"] = parse_notes_from_text(top_notes_str)
-    
-    # Extract middle notes
-    middle_pattern = r'[Mm]iddle notes?\s+(?:are|is|:)\s+([^;\.]+?)(?:;|\.|\sbase)'
-    middle_match = re.search(middle_pattern, desc_str)
-    if middle_match:
-        middle_notes_str = middle_match.group(1)
-        notes["middle"] = parse_notes_from_text(middle_notes_str)
-    
-    # Extract base notes
-    base_pattern = r'[Bb]ase notes?\s+(?:are|is|:)\s+([^;\.]+?)(?:\.|$)'
-    base_match = re.search(base_pattern, desc_str)
-    if base_match:
-        base_notes_str = base_match.group(1)
-        notes["base"] = parse_notes_from_text(base_notes_str)
-    
-    return notes
+
+# ── scalar helpers ────────────────────────────────────────────────────────────
 
 def parse_notes_from_text(notes_text):
     """Parse notes from natural language text (handles 'and', commas, etc.)"""
     if not notes_text:
         return []
-    
-    # Replace ' and ' with ', ' for uniform splitting
-    notes_text = re.sub(r'\s+and\s+', ', ', notes_text)
-    
-    # Split by comma and clean
-    notes = [note.strip() for note in notes_text.split(',') if note.strip()]
-    
+    notes_text = AND_RE.sub(', ', notes_text)
+    return [note.strip() for note in notes_text.split(',') if note.strip()]
+
+
+def extract_notes_from_description(description):
+    """Extract top, middle, and base notes from description text"""
+    notes = {"top": [], "middle": [], "base": []}
+    if description is None or not str(description).strip():
+        return notes
+    desc_str = str(description)
+    for key, pattern in (("top", TOP_RE), ("middle", MIDDLE_RE), ("base", BASE_RE)):
+        match = pattern.search(desc_str)
+        if match:
+            notes[key] = parse_notes_from_text(match.group(1))
     return notes
 
-def parse_notes(notes_string):
-    """Parse comma-separated notes string into a list"""
-    if pd.isna(notes_string) or str(notes_string).strip() == '' or str(notes_string).lower() == 'unknown':
+
+def _extract_notes_chunk(descriptions):
+    return [extract_notes_from_description(d) for d in descriptions]
+
+
+def extract_notes_batch(descriptions, workers=1, chunk_size=NOTES_CHUNK):
+    """extract_notes_from_description over a list, chunked across `workers` processes."""
+    if workers <= 1 or len(descriptions) <= chunk_size:
+        return _extract_notes_chunk(descriptions)
+    chunks = [descriptions[i:i + chunk_size] for i in range(0, len(descriptions), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [notes for chunk in pool.map(_extract_notes_chunk, chunks) for notes in chunk]
+
+
+def parse_accord_source(source):
+    """Accords from one cell: a list literal ("['woody', 'amber']") or a single name."""
+    if source is None or not source:
         return []
-    return [note.strip() for note in str(notes_string).split(',') if note.strip()]
-
-def parse_main_accords(*accord_sources):
-    """Parse main accords from multiple sources and combine them"""
-    accords = []
-    
-    for source in accord_sources:
-        if pd.isna(source) or not str(source).strip():
-            continue
-            
-        source_str = str(source).strip()
-        
-        # If it's a string representation of a list
-        if source_str.startswith('[') and source_str.endswith(']'):
-            try:
-                parsed = eval(source_str)
-                accords.extend(parsed)
-            except:
-                pass
-        # If it's a regular string, add it
-        elif source_str and source_str.lower() != 'none':
-            accords.append(source_str)
-    
-    # Remove duplicates while preserving order
+    if source.startswith('[') and source.endswith(']'):
+        try:
+            return list(ast.literal_eval(source))
+        except (ValueError, SyntaxError, TypeError):
+            return []
+    if source.lower() != 'none':
+        return [source]
+    return []
+
+
+def _dedupe(accords):
+    """Drop empty and repeated accords, preserving order."""
     seen = set()
-    unique_accords = []
+    unique = []
     for accord in accords:
         if accord and accord not in seen:
             seen.add(accord)
-            unique_accords.append(accord)
-    
-    return unique_accords
-
-def extract_brand_from_name(name):
-    """Extract brand from name field (last word before 'for')"""
-    if pd.isna(name):
-        return None
-    
-    name_str = str(name).strip()
-    match = re.search(r'(.+?)\s+(for\s+(?:women|men|women\s+and\s+men|unisex))', name_str)
-    if match:
-        before_gender = match.group(1).strip()
-        parts = before_gender.split()
-        if len(parts) > 1:
-            return parts[-1]
-    return None
-
-def row_to_perfume_json(row):
-    """Convert a merged dataframe row to the desired JSON structure"""
-    
-    # Check if this record is only in CSV2
-    is_csv2_only = pd.isna(row.get('Perfume'))
-    
-    # Name: prefer Perfume from CSV1, fallback to Name from CSV2
-    name = None
-    if pd.notna(row.get('Perfume')):
-        name = str(row['Perfume']).strip()
-    elif pd.notna(row.get('Name')):
-        # Clean the name from CSV2
-        name_str = str(row['Name']).strip()
-        name = re.sub(r'for\s+(?:women|men|women\s+and\s+men|unisex)', '', name_str).strip()
-        # Also remove the brand if present
-        brand_in_name = extract_brand_from_name(row.get('Name'))
-        if brand_in_name:
-            name = name.replace(brand_in_name, '').strip()
-    
-    # Brand: from CSV1, or extract from Name in CSV2, can be null
-    brand = None
-    if pd.notna(row.get('Brand')):
-        brand = str(row['Brand']).strip()
-    elif is_csv2_only and pd.notna(row.get('Name')):
-        brand = extract_brand_from_name(row.get('Name'))
-    
-    # Gender: prefer CSV1, fallback to CSV2
-    gender = None
-    if pd.notna(row.get('Gender_x')):  # Gender from CSV1
-        gender = str(row['Gender_x']).strip()
-    elif pd.notna(row.get('Gender_y')):  # Gender from CSV2
-        gender = str(row['Gender_y']).strip()
-    
-    # Description: from CSV2
-    description = str(row['Description']).strip() if pd.notna(row.get('Description')) else None
-    
-    # Notes: from CSV1, or extract from description if CSV2 only
-    if not is_csv2_only:
-        notes = {
-            "top": parse_notes(row.get('Top')),
-            "middle": parse_notes(row.get('Middle')),
-            "base": parse_notes(row.get('Base'))
-        }
-    else:
-        # Extract notes from description for CSV2-only records
-        notes = extract_notes_from_description(description)
-    
-    # Main accords: combine from both sources
-    main_accords = parse_main_accords(
-        row.get('Main Accords'),
-        row.get('mainaccord1'),
-        row.get('mainaccord2'),
-        row.get('mainaccord3'),
-        row.get('mainaccord4'),
-        row.get('mainaccord5')
+            unique.append(accord)
+    return unique
+
+
+# ── column-wise parsing ───────────────────────────────────────────────────────
+
+def _clean(df, column):
+    """Stripped string values of `column`, NaN where missing (or absent from the frame)."""
+    if column not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="object")
+    series = df[column]
+    return series.astype(str).str.strip().where(series.notna())
+
+
+def _values(series):
+    """Series → list with missing values as None."""
+    return [None if pd.isna(v) else v for v in series]
+
+
+def _parse_notes_column(df, column):
+    """Comma-separated notes per cell → lists; blank / 'unknown' → []."""
+    cleaned = _clean(df, column).fillna("")
+    cleaned = cleaned.mask(cleaned.str.lower() == "unknown", "")
+    return [[n.strip() for n in cell.split(",") if n.strip()] for cell in cleaned]
+
+
+def _brand_from_names(names):
+    """Brand from a CSV2 name: the last word before 'for women/men/...' (when there are several)."""
+    before = names.str.extract(BRAND_RE, expand=False)[0].str.strip()
+    words = before.str.split()
+    return words.str[-1].where(words.str.len() > 1)
+
+
+def _main_accords(df):
+    per_row = [[] for _ in range(len(df))]
+    for column in ACCORD_COLUMNS:
+        for accords, source in zip(per_row, _values(_clean(df, column))):
+            accords.extend(parse_accord_source(source))
+    return [_dedupe(accords) for accords in per_row]
+
+
+def _year(df):
+    if "Year" not in df.columns:
+        return [None] * len(df)
+    return [None if pd.isna(y) else int(y) for y in pd.to_numeric(df["Year"], errors="coerce")]
+
+
+def perfumes_from_frame(df, workers=1):
+    """Perfume dicts for every row of the merged frame that has main accords."""
+    csv2_only = df["Perfume"].isna()
+
+    # Name: prefer Perfume from CSV1, else CSV2's Name without the gender suffix and brand
+    csv2_names  = _clean(df, "Name")
+    csv2_brands = _brand_from_names(csv2_names)
+    stripped    = csv2_names.str.replace(GENDER_SUFFIX, "", regex=True).str.strip()
+    csv2_names  = pd.Series(
+        [n if pd.isna(n) or pd.isna(b) else n.replace(b, "").strip() for n, b in zip(stripped, csv2_brands)],
+        index=df.index, dtype="object",
     )
-    if len(main_accords) == 0:
-        return {}
-    
-    # Year: from CSV1
-    year_released = None
-    if pd.notna(row.get('Year')):
-        year_str = row['Year']
-        year_released = int(year_str)
-    
-    # URL
-    url = str(row['url']).strip() if pd.notna(row.get('url')) else None
-    
-    return {
-        "name": name,
-        "brand": brand,
-        "gender": gender,
-        "description": description,
-        "notes": notes,
-        "main_accords": main_accords,
-        "year_released": year_released,
-        "url": url
-    }
-
-# Main execution
-print("Reading CSV files...")
-print("-" * 80)
-
-# Read CSV1 (semicolon-separated)
-df1 = pd.read_csv('../../datasets/fragrantica/fra_cleaned.csv', sep=';', encoding='latin-1')
-print(f"CSV1 shape: {df1.shape}")
-print(f"CSV1 columns: {list(df1.columns)}")
-
-# Read CSV2 (comma-separated)
-df2 = pd.read_csv('../../datasets/fragrantica/fra_perfumes.csv', encoding='latin-1')
-print(f"\nCSV2 shape: {df2.shape}")
-print(f"CSV2 columns: {list(df2.columns)}")
-
-# Check for URL column
-if 'url' not in df1.columns or 'url' not in df2.columns:
-    print("\nError: 'url' column not found in one or both CSVs")
-    exit(1)
-
-# Perform outer join on URL to keep all records from both CSVs
-print("\nPerforming outer join on 'url' column...")
-df_merged = pd.merge(df1, df2, on='url', how='outer', suffixes=('_x', '_y'))
-
-print(f"Merged dataframe shape: {df_merged.shape}")
-
-# Statistics
-only_csv1 = df_merged[df_merged['Name'].isna()]
-only_csv2 = df_merged[df_merged['Perfume'].isna()]
-both = df_merged[df_merged['Name'].notna() & df_merged['Perfume'].notna()]
-
-print(f"\nJoin Statistics:")
-print(f"  - Records in both CSVs: {len(both)}")
-print(f"  - Records only in CSV1: {len(only_csv1)}")
-print(f"  - Records only in CSV2: {len(only_csv2)}")
-print(f"  - Total unique records: {len(df_merged)}")
-
-# Convert to JSON
-print("\nConverting to JSON format...")
-print("-" * 80)
-
-perfumes = []
-for idx, row in df_merged.iterrows():
-    perfume = row_to_perfume_json(row)
-    if perfume == {}:
-        continue
-    perfumes.append(perfume)
-
-# Save to JSON
-output_file = '../../datasets/fragrantica_perfumes.json'
-with open(output_file, 'w', encoding='utf-8') as json_file:
-    json.dump(perfumes, json_file, indent=2, ensure_ascii=False)
-
-print(f"✓ Created {output_file} with {len(perfumes)} perfumes")
-
-# Display sample outputs
-print("\n" + "=" * 80)
-print("Sample perfume (from both CSVs):")
-print("=" * 80)
-if len(both) > 0:
-    sample_idx = both.index[0]
-    print(json.dumps(perfumes[sample_idx], indent=2, ensure_ascii=False))
-
-if len(only_csv1) > 0:
-    print("\n" + "=" * 80)
-    print("Sample perfume (CSV1 only):")
-    print("=" * 80)
-    sample_idx = only_csv1.index[0]
-    print(json.dumps(perfumes[sample_idx], indent=2, ensure_ascii=False))
-
-if len(only_csv2) > 0:
-    print("\n" + "=" * 80)
-    print("Sample perfume (CSV2 only - with extracted notes):")
-    print("=" * 80)
-    sample_idx = only_csv2.index[0]
-    print(json.dumps(perfumes[sample_idx], indent=2, ensure_ascii=False))
-
-# Optional: Save the merged dataframe as CSV for inspection
-print(f"\n✓ Also saved merged dataframe to 'merged_dataframe.csv' for inspection")
-
-print("\n✓ Processing complete!")
\ No newline at end of file
+    name = _clean(df, "Perfume").fillna(csv2_names)
+
+    # Brand: from CSV1, or recovered from the name for CSV2-only rows
+    brand = _clean(df, "Brand").fillna(csv2_brands.where(csv2_only))
+
+    # Gender: prefer CSV1, fall back to CSV2, normalized to men / women / unisex
+    gender = _clean(df, "Gender_x").fillna(_clean(df, "Gender_y")).replace(GENDER_MAP)
+
+    description = _clean(df, "Description")
+    url         = _clean(df, "url")
+
+    # Notes: CSV1 columns, or recovered from the description for CSV2-only rows
+    tops    = _parse_notes_column(df, "Top")
+    middles = _parse_notes_column(df, "Middle")
+    bases   = _parse_notes_column(df, "Base")
+    only2   = csv2_only.to_numpy().nonzero()[0]
+    recovered = extract_notes_batch([description.iat[i] if pd.notna(description.iat[i]) else None for i in only2],
+                                    workers=workers)
+    notes = [{"top": t, "middle": m, "base": b} for t, m, b in zip(tops, middles, bases)]
+    for i, n in zip(only2, recovered):
+        notes[i] = n
+
+    columns = zip(_values(name), _values(brand), _values(gender), _values(description),
+                  notes, _main_accords(df), _year(df), _values(url))
+    return [dict(zip(FIELDS, row)) for row in columns if row[5]]   # no main accords → dropped
+
+
+def load_merged(csv1_path, csv2_path):
+    """Read both CSVs and outer-join them on url."""
+    df1 = pd.read_csv(csv1_path, sep=';', encoding='latin-1')     # semicolon-separated
+    df2 = pd.read_csv(csv2_path, encoding='latin-1')
+    print(f"CSV1 shape: {df1.shape}")
+    print(f"CSV2 shape: {df2.shape}")
+    if 'url' not in df1.columns or 'url' not in df2.columns:
+        raise ValueError("'url' column not found in one or both CSVs")
+    return pd.merge(df1, df2, on='url', how='outer', suffixes=('_x', '_y'))
+
+
+def build_catalog(csv1_path, csv2_path, workers=1):
+    """Merged frame → (perfume dicts, {url: 'both' | 'csv1' | 'csv2'})."""
+    df = load_merged(csv1_path, csv2_path)
+    in1, in2 = df['Perfume'].notna(), df['Name'].notna()
+    print(f"\nJoin Statistics:")
+    print(f"  - Records in both CSVs: {int((in1 & in2).sum())}")
+    print(f"  - Records only in CSV1: {int((in1 & ~in2).sum())}")
+    print(f"  - Records only in CSV2: {int((~in1 & in2).sum())}")
+    print(f"  - Total unique records: {len(df)}")
+
+    sources = dict(zip(df['url'], ["both" if a and b else "csv1" if a else "csv2" for a, b in zip(in1, in2)]))
+    return perfumes_from_frame(df, workers=workers), sources
+
+
+def _print_samples(perfumes, sources):
+    for source, title in (("both", "from both CSVs"), ("csv1", "CSV1 only"),
+                          ("csv2", "CSV2 only - with extracted notes")):
+        sample = next((p for p in perfumes if sources.get(p["url"]) == source), None)
+        if sample is None:
+            continue
+        print("\n" + "=" * 80)
+        print(f"Sample perfume ({title}):")
+        print("=" * 80)
+        print(json.dumps(sample, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fragrantica CSVs → perfume JSON + catalog")
+    parser.add_argument("--csv1", default=str(DATASETS / "fragrantica" / "fra_cleaned.csv"))
+    parser.add_argument("--csv2", default=str(DATASETS / "fragrantica" / "fra_perfumes.csv"))
+    parser.add_argument("--output", default=str(DATASETS / "fragrantica_perfumes.json"))
+    parser.add_argument("--catalog", default=str(DATASETS / "fragrantica_perfumes.parquet"),
+                        help=".parquet or .arrow catalog path (needs pyarrow)")
+    parser.add_argument("--no-catalog", action="store_true", help="Write only the JSON output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes for the description note extraction")
+    parser.add_argument("--no-samples", action="store_true")
+    args = parser.parse_args()
+
+    print("Reading CSV files...")
+    print("-" * 80)
+    perfumes, sources = build_catalog(args.csv1, args.csv2, workers=args.workers)
+
+    with open(args.output, 'w', encoding='utf-8') as json_file:
+        json.dump(perfumes, json_file, indent=2, ensure_ascii=False)
+    print(f"\n✓ Created {args.output} with {len(perfumes)} perfumes")
+
+    if not args.no_catalog:
+        try:
+            from catalog import write_catalog
+        except ImportError:
+            print("pyarrow not installed — skipping the catalog (or pass --no-catalog)")
+        else:
+            write_catalog(perfumes, args.catalog)
+            print(f"✓ Created {args.catalog}")
+
+    if not args.no_samples:
+        _print_samples(perfumes, sources)
+
+    print("\n✓ Processing complete!")
+
+
+if __name__ == "__main__":
+    main()
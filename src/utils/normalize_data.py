@@ -1,4 +1,11 @@
 import json
+import os
+
+GENDER_MAP = {
+    "for men": "men",
+    "for women": "women",
+    "for women and men": "unisex",
+}
 
 def get_unique_gender_types(data):
     unique_gender_types = set()
@@ -10,16 +17,23 @@ def get_unique_gender_types(data):
 
 def normalize_gender_types(data):
     for perfume in data:
-        if perfume["gender"] == "for men":
-            perfume["gender"] = "men"
-        elif perfume["gender"] == "for women":
-            perfume["gender"] = "women"
-        elif perfume["gender"] == "for women and men":
-            perfume["gender"] = "unisex"
+        perfume["gender"] = GENDER_MAP.get(perfume["gender"], perfume["gender"])
     return data
 
+
+def normalize_catalog_gender(path):
+    """Rewrite only the gender column of a Parquet/Arrow catalog."""
+    from catalog import replace_column
+    replace_column(path, "gender", lambda values: [GENDER_MAP.get(g, g) for g in values])
+
+
 if __name__ == "__main__":
     JSON_PATH = "../../datasets/fragrantica_perfumes.json"
+    CATALOG_PATH = "../../datasets/fragrantica_perfumes.parquet"
+
+    if os.path.exists(CATALOG_PATH):
+        normalize_catalog_gender(CATALOG_PATH)
+        print(f"Normalized gender column in {CATALOG_PATH}")
 
     with open(JSON_PATH, "r", encoding="utf-8") as json_file:
         data = json.load(json_file)
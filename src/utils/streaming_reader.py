@@ -0,0 +1,216 @@
+"""
+Streaming readers for the pipeline's JSON inputs.
+
+    iter_jsonl(path)        (lineno, record) per line of a JSONL file, one pass
+    iter_json_array(path)   items of a top-level JSON array, without loading it whole
+    iter_records(path)      any of these, or a columnar catalog, by suffix
+
+Parsing uses orjson when it is installed (several times faster than json)
+and the stdlib otherwise. Progress is reported as bytes consumed via an
+optional `progress(nbytes)` callback (e.g. tqdm(unit="B").update), so callers
+don't need a pre-pass to know the total — it is os.path.getsize(path).
+
+Large JSONL files (>= PARALLEL_MIN_BYTES) can be parsed in parallel:
+`iter_jsonl(path, workers=N)` splits the file into newline-aligned byte
+ranges parsed by a process pool; records still come out in file order.
+"""
+import codecs
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator
+
+try:
+    import orjson
+except ImportError:          # optional fast backend
+    orjson = None
+
+CATALOG_SUFFIXES   = (".parquet", ".arrow")   # see catalog.py
+CHUNK_BYTES        = 8 * 1024 * 1024
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+ErrorHandler = Callable[[int, Exception], None]
+
+
+def loads(data: bytes | str):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dumps(obj) -> str:
+    """One-line JSON, non-ASCII kept as is."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _raise(lineno: int, e: Exception) -> None:
+    raise ValueError(f"line {lineno}: {e}") from e
+
+
+# ── JSONL ─────────────────────────────────────────────────────────────────────
+
+def _parse_lines(lines: list[bytes], first_lineno: int, on_error: ErrorHandler) -> Iterator[tuple[int, dict]]:
+    for lineno, line in enumerate(lines, start=first_lineno):
+        if not line.strip():
+            continue
+        try:
+            yield lineno, loads(line)
+        except ValueError as e:          # orjson.JSONDecodeError and json.JSONDecodeError both subclass it
+            on_error(lineno, e)
+
+
+def _parse_range(path: str, start: int, end: int) -> tuple[int, list, list]:
+    """Worker: parse lines in [start, end); returns (line count, (i, record), (i, error))."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).split(b"\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    records, errors = [], []
+    for i, record in _parse_lines(lines, 0, lambda i, e: errors.append((i, str(e)))):
+        records.append((i, record))
+    return len(lines), records, errors
+
+
+def _ranges(path: str, size: int, chunk_bytes: int) -> Iterator[tuple[int, int]]:
+    """Newline-aligned byte ranges covering the file."""
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(size, start + chunk_bytes))
+            f.readline()                     # run on to the end of the line
+            end = min(size, f.tell()) if start + chunk_bytes < size else size
+            yield start, end
+            start = end
+
+
+def _iter_jsonl_parallel(path: str, size: int, workers: int, on_error: ErrorHandler,
+                         progress: Callable[[int], None] | None, chunk_bytes: int) -> Iterator[tuple[int, dict]]:
+    lineno = 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        ranges = _ranges(path, size, chunk_bytes)
+
+        def submit_next() -> bool:
+            r = next(ranges, None)
+            if r is None:
+                return False
+            pending.append((r, pool.submit(_parse_range, path, *r)))
+            return True
+
+        for _ in range(2 * workers):         # bounded read-ahead keeps memory flat
+            if not submit_next():
+                break
+        while pending:
+            (start, end), future = pending.popleft()
+            n_lines, records, errors = future.result()
+            submit_next()
+            for i, message in errors:
+                on_error(lineno + i, ValueError(message))
+            for i, record in records:
+                yield lineno + i, record
+            lineno += n_lines
+            if progress is not None:
+                progress(end - start)
+
+
+def iter_jsonl(
+    path: str | Path,
+    on_error: ErrorHandler = _raise,
+    progress: Callable[[int], None] | None = None,
+    workers: int = 1,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> Iterator[tuple[int, dict]]:
+    """Yield (line number, record) for every non-blank line.
+
+    Unparseable lines go to `on_error(lineno, exc)` — by default a ValueError
+    is raised. `progress` receives bytes consumed as the file is read.
+    """
+    path = str(path)
+    size = os.path.getsize(path)
+    if workers > 1 and size >= PARALLEL_MIN_BYTES:
+        yield from _iter_jsonl_parallel(path, size, workers, on_error, progress, chunk_bytes)
+        return
+
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f, start=1):
+            if progress is not None:
+                progress(len(line))
+            if not line.strip():
+                continue
+            try:
+                record = loads(line)
+            except ValueError as e:
+                on_error(lineno, e)
+                continue
+            yield lineno, record
+
+
+# ── JSON arrays ───────────────────────────────────────────────────────────────
+
+def iter_json_array(
+    path: str | Path,
+    progress: Callable[[int], None] | None = None,
+    chunk_bytes: int = 1024 * 1024,
+) -> Iterator:
+    """Yield the items of a file holding one top-level JSON array, reading it in chunks."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, started, eof = "", 0, False, False
+
+    with open(path, "rb") as f:
+        def fill() -> None:
+            nonlocal buf, pos, eof
+            data = f.read(chunk_bytes)
+            if progress is not None and data:
+                progress(len(data))
+            eof = not data
+            buf = buf[pos:] + utf8.decode(data, final=eof)
+            pos = 0
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of file inside the JSON array")
+                fill()
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: expected a top-level JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()                       # item straddles the chunk boundary
+                continue
+            if end == len(buf) and not eof:   # a number may continue in the next chunk
+                fill()
+                continue
+            pos = end
+            yield item
+
+
+def is_catalog(path: str | Path) -> bool:
+    return str(path).endswith(CATALOG_SUFFIXES)
+
+
+def iter_records(path: str | Path, columns: list[str] | None = None, **kwargs) -> Iterator[dict]:
+    """Records of a .jsonl file, a .json array file or a .parquet / .arrow catalog
+    (`columns` projects catalog reads; JSON inputs always yield whole records)."""
+    if is_catalog(path):
+        from catalog import read_catalog     # pyarrow — only needed for catalog inputs
+        yield from read_catalog(path, columns)
+    elif str(path).endswith(".jsonl"):
+        for _, record in iter_jsonl(path, **kwargs):
+            yield record
+    else:
+        yield from iter_json_array(path, **kwargs)